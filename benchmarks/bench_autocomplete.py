@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Measures latency of a single shell completion request (one TAB press) of a
+program with many lazily registered commands - both served from commands
+manifest (which is built upfront, completion never writes it) and without the
+manifest (falling back to importing the completed command).
+
+Usage::
+
+    $ python benchmarks/bench_autocomplete.py [--commands 300] [--runs 20]
+
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+
+COMMAND_MODULE = '''
+from monolith.cli import BaseCommand, arg
+
+
+class Command(BaseCommand):
+    help = 'Command number %(index)d'
+    args = [
+        arg('-f', '--force', action='store_true'),
+        arg('--mode', choices=['fast', 'slow']),
+        arg('target', choices=['alpha', 'beta', 'gamma']),
+    ]
+'''
+
+PROGRAM = '''
+import os
+from monolith.cli import CompletionCommand
+from monolith.cli import LazyCommand
+from monolith.cli import SimpleExecutionManager
+
+
+class Manager(SimpleExecutionManager):
+    manifest_path = os.path.join(os.path.dirname(__file__), 'manifest.json')
+
+
+def get_manager():
+    commands = dict(('command-%%d' %% index,
+        LazyCommand('benchcommands.command%%d.Command' %% index))
+        for index in range(%(count)d))
+    commands['completion'] = CompletionCommand
+    return Manager('prog', commands)
+
+
+def main():
+    get_manager().execute()
+
+
+if __name__ == '__main__':
+    main()
+'''
+
+
+def create_program(directory, count):
+    package = os.path.join(directory, 'benchcommands')
+    os.mkdir(package)
+    open(os.path.join(package, '__init__.py'), 'w').close()
+    for index in range(count):
+        path = os.path.join(package, 'command%d.py' % index)
+        with open(path, 'w') as fout:
+            fout.write(COMMAND_MODULE % {'index': index})
+    path = os.path.join(directory, 'prog.py')
+    with open(path, 'w') as fout:
+        fout.write(PROGRAM % {'count': count})
+    return path
+
+
+def measure(argv, env, runs):
+    timings = []
+    for run in range(runs):
+        start = time.time()
+        subprocess.call(argv, env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        timings.append((time.time() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.9)]
+
+
+def check_completion(argv, env):
+    output = subprocess.Popen(argv, env=env,
+        stdout=subprocess.PIPE).communicate()[0]
+    assert output.strip() == b'fast', output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--commands', type=int, default=300)
+    parser.add_argument('--runs', type=int, default=20)
+    namespace = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        program = create_program(directory, namespace.commands)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join((directory, root)),
+            PROG_AUTO_COMPLETE='1', COMP_WORDS='prog command-1 --mode f',
+            COMP_CWORD='3')
+        # installed programs run from cached bytecode, so it's written at the
+        # first (not measured) run
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        argv = [sys.executable, program]
+        manifest_paths = [os.path.join(directory, name) for name in (
+            'manifest.json', 'manifest-help.json')]
+
+        subprocess.check_call([sys.executable, '-c', 'import prog; '
+            'prog.get_manager().get_manifest(update=True)'], env=env)
+        assert all(os.path.exists(path) for path in manifest_paths)
+        check_completion(argv, env)
+        interpreter = measure([sys.executable, '-c', 'pass'], env,
+            namespace.runs)
+        manifest = measure(argv, env, namespace.runs)
+
+        for path in manifest_paths:
+            os.unlink(path)
+        check_completion(argv, env)
+        fallback = measure(argv, env, namespace.runs)
+        assert not any(os.path.exists(path) for path in manifest_paths)
+
+        print('commands: %d' % namespace.commands)
+        print('interpreter startup:           median %.1f ms, p90 %.1f ms' %
+            interpreter)
+        print('completion (manifest):         median %.1f ms, p90 %.1f ms' %
+            manifest)
+        print('completion (without manifest): median %.1f ms, p90 %.1f ms' %
+            fallback)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the framework's hot paths: process startup, building parsers,
+running commands, completion, per-label overhead of label commands and memory
+used by registered commands.
+
+Usage::
+
+    $ python benchmarks/bench_framework.py [--quick] [--output FILE]
+        [--compare FILE] [--threshold 0.25] [benchmark ...]
+
+Results (lower is better for all of them) are printed and, with ``--output``,
+saved as JSON. Given ``--compare`` with previously saved results, changes are
+reported and the script exits with status ``1`` if any benchmark got slower
+(or bigger) by more than ``--threshold`` (a fraction).
+"""
+from __future__ import print_function
+import io
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from monolith import get_version
+from monolith.cli import BaseCommand
+from monolith.cli import CompletionCommand
+from monolith.cli import ExecutionManager
+from monolith.cli import LabelCommand
+from monolith.cli import arg
+from monolith.cli.fastparser import FastParser
+
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark command'
+    args = [
+        arg('-f', '--force', action='store_true'),
+        arg('--mode', choices=['fast', 'slow']),
+        arg('target', nargs='?'),
+    ]
+
+    def handle(self, namespace):
+        pass
+
+
+class NoopLabelCommand(LabelCommand):
+
+    def handle_label(self, label, namespace):
+        pass
+
+
+def get_manager(count, parser_cls=None):
+    manager = ExecutionManager(['prog'], stdout=io.StringIO(),
+        stderr=io.StringIO())
+    if parser_cls is not None:
+        manager.parser_cls = parser_cls
+    for index in range(count):
+        manager.register('command-%d' % index, Command)
+    manager.register('labels', NoopLabelCommand)
+    manager.register('completion', CompletionCommand)
+    return manager
+
+
+def measure(func, min_time=0.2, repeat=5):
+    """
+    Returns the best (minimal) time of a single ``func`` call, in seconds.
+    Number of calls per round is chosen so that a round takes at least
+    ``min_time`` seconds. The first (warm up) call is not measured.
+    """
+    func()
+    number = 1
+    while True:
+        start = clock()
+        for i in range(number):
+            func()
+        elapsed = clock() - start
+        if elapsed >= min_time or number >= 10 ** 6:
+            break
+        number *= 10
+    best = elapsed / number
+    for i in range(repeat - 1):
+        start = clock()
+        for i in range(number):
+            func()
+        best = min(best, (clock() - start) / number)
+    return best
+
+
+def bench_startup(options):
+    """
+    Cold process running ``examples/git.py add foo``, in milliseconds
+    (median).
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    argv = [sys.executable, os.path.join(ROOT, 'examples', 'git.py'), 'add',
+        'foo']
+    timings = []
+    for run in range(options.runs):
+        start = clock()
+        subprocess.check_call(argv, env=env, stdout=subprocess.PIPE)
+        timings.append((clock() - start) * 1000)
+    timings.sort()
+    return {'startup.git_add': (timings[len(timings) // 2], 'ms')}
+
+
+def bench_get_parser(options):
+    """
+    Building main parser with N registered commands, in milliseconds.
+    """
+    results = {}
+    for count in options.sizes:
+        manager = get_manager(count)
+        seconds = measure(manager.get_parser, options.min_time,
+            options.repeat)
+        results['get_parser.%d' % count] = (seconds * 1000, 'ms')
+    return results
+
+
+def bench_call_command(options):
+    """
+    Running a command with cached parser (100 and 1000 registered commands),
+    in microseconds per call.
+    """
+    results = {}
+    for count in (100, 1000):
+        manager = get_manager(count)
+
+        def call():
+            manager.call_command('command-1', '--mode', 'fast', 'foo')
+
+        seconds = measure(call, options.min_time, options.repeat)
+        results['call_command.%d' % count] = (seconds * 10 ** 6, 'us')
+    return results
+
+
+def bench_parse_args(options):
+    """
+    Parsing a short command line and 10000 labels with argparse based
+    parser and with :class:`monolith.cli.fastparser.FastParser`, in
+    microseconds.
+    """
+    results = {}
+    argvs = [
+        ('short', ['command-1', '--mode', 'fast', '-f', 'foo']),
+        ('labels', ['labels'] + ['label-%d' % index for index in
+            range(10000)]),
+    ]
+    for name, parser_cls in (('argparse', None), ('fast', FastParser)):
+        manager = get_manager(100, parser_cls)
+        parser = manager.get_cached_parser()
+        for argv_name, argv in argvs:
+            seconds = measure(lambda: manager.parse_args(parser, argv),
+                options.min_time, options.repeat)
+            results['parse_args.%s.%s' % (argv_name, name)] = (
+                seconds * 10 ** 6, 'us')
+    return results
+
+
+def bench_autocomplete(options):
+    """
+    In-process ``autocomplete`` of command names and of command options (100
+    registered commands), in microseconds per request. See
+    ``bench_autocomplete.py`` for the latency of a whole process.
+    """
+    manager = get_manager(100)
+    manager.completion = True
+    manager.completion_env_var_name = 'PROG_AUTO_COMPLETE'
+    results = {}
+    requests = [
+        ('autocomplete.names', 'prog command-1', '1'),
+        ('autocomplete.options', 'prog command-1 --mode f', '3'),
+    ]
+    environ = os.environ.copy()
+    try:
+        for name, words, cword in requests:
+            os.environ.update(PROG_AUTO_COMPLETE='1', COMP_WORDS=words,
+                COMP_CWORD=cword)
+
+            def complete():
+                try:
+                    manager.autocomplete()
+                except SystemExit:
+                    pass
+
+            seconds = measure(complete, options.min_time, options.repeat)
+            results[name] = (seconds * 10 ** 6, 'us')
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+    return results
+
+
+def bench_labels(options):
+    """
+    Overhead of :class:`LabelCommand` per handled label, in microseconds.
+    """
+    manager = get_manager(0)
+    labels = ['label-%d' % index for index in range(10000)]
+
+    def call():
+        manager.call_command('labels', *labels)
+
+    seconds = measure(call, options.min_time, options.repeat)
+    return {'label_overhead': (seconds / len(labels) * 10 ** 6, 'us')}
+
+
+def bench_memory(options):
+    """
+    Memory allocated per registered command, in bytes - by registration only
+    and together with building the parser.
+    """
+    import tracemalloc
+
+    count = 1000
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        manager = get_manager(count)
+        registered = tracemalloc.take_snapshot()
+        parser = manager.get_parser()
+        built = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    def size(snapshot):
+        return sum(stat.size_diff for stat in snapshot.compare_to(before,
+            'filename'))
+
+    return {
+        'memory.register': (size(registered) / float(count), 'B'),
+        'memory.register_and_parser': (size(built) / float(count), 'B'),
+    }
+
+
+BENCHMARKS = [
+    ('startup', bench_startup),
+    ('get_parser', bench_get_parser),
+    ('call_command', bench_call_command),
+    ('parse_args', bench_parse_args),
+    ('autocomplete', bench_autocomplete),
+    ('labels', bench_labels),
+    ('memory', bench_memory),
+]
+
+
+def run(names, options):
+    results = {}
+    for name, bench in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for key, (value, unit) in sorted(bench(options).items()):
+            results[key] = {'value': value, 'unit': unit}
+            print('%-32s %12.2f %s' % (key, value, unit))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints changes against ``baseline`` results and returns names of
+    benchmarks which regressed by more than ``threshold``.
+    """
+    regressions = []
+    print('\n%-32s %12s %12s %8s' % ('benchmark', 'baseline', 'current',
+        'change'))
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        old = baseline[key]['value']
+        new = results[key]['value']
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print('%-32s %12.2f %12.2f %+7.1f%%%s' % (key, old, new,
+            change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+        help='Benchmarks to run (all by default): %s.' % ', '.join(
+            name for name, bench in BENCHMARKS))
+    parser.add_argument('--quick', action='store_true',
+        help='Fewer runs and smaller sizes (results are less stable).')
+    parser.add_argument('--output', metavar='FILE',
+        help='Save results as JSON to FILE.')
+    parser.add_argument('--compare', metavar='FILE',
+        help='Compare results with ones saved at FILE.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+        help='Allowed slowdown when comparing (fraction, default: 0.25).')
+    options = parser.parse_args()
+    unknown = set(options.benchmarks) - set(name for name, bench in BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmark(s): %s' % ', '.join(sorted(unknown)))
+    options.sizes = [10, 100, 1000, 10000]
+    options.runs = 10
+    options.min_time = 0.2
+    options.repeat = 5
+    if options.quick:
+        options.sizes = [10, 100]
+        options.runs = 3
+        options.min_time = 0.01
+        options.repeat = 1
+
+    results = run(options.benchmarks, options)
+    if options.output:
+        with open(options.output, 'w') as fout:
+            json.dump({
+                'monolith': get_version(),
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'results': results,
+            }, fout, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as fin:
+            baseline = json.load(fin)['results']
+        if compare(results, baseline, options.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
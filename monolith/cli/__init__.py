@@ -1,12 +1,46 @@
-from .base import BaseCommand
-from .base import CommandError
-from .base import ExecutionManager
-from .base import SimpleExecutionManager
-from .base import LabelCommand
-from .base import Parser
-from .base import SingleLabelCommand
-from .base import arg
-from .completion import CompletionCommand
+import sys
+
+from monolith.utils import timings
+
+with timings.phase('import', module=__name__):
+    from .base import BaseCommand
+    from .base import CommandError
+    from .base import CommandGroup
+    from .base import ExecutionManager
+    from .base import SimpleExecutionManager
+    from .base import LabelCommand
+    from .base import LazyCommand
+    from .base import Parser
+    from .base import SingleLabelCommand
+    from .base import arg
+
+
+# modules imported only by programs using them; before Python 3.7 (no module
+# level __getattr__) they are importable from their modules only, except for
+# CompletionCommand which was always available here
+lazy_attributes = {
+    'BundleCommand': 'bundle',
+    'CacheCommand': 'caching',
+    'CompletionCommand': 'completion',
+    'EntryPointExecutionManager': 'entrypoints',
+    'PackageExecutionManager': 'scanning',
+    'ServerCommand': 'server',
+    'ShellCommand': 'shell',
+    'cacheable': 'caching',
+}
+
+if sys.version_info < (3, 7):
+    from .completion import CompletionCommand
+    lazy_attributes = {'CompletionCommand': 'completion'}
+else:
+    def __getattr__(name):
+        if name in lazy_attributes:
+            import importlib
+            module = importlib.import_module('.' + lazy_attributes[name],
+                __name__)
+            return getattr(module, name)
+        raise AttributeError('module %r has no attribute %r' % (__name__,
+            name))
 
 
 __all__ = [
@@ -16,8 +50,8 @@ __all__ = [
     'Parser',
     'BaseCommand',
     'CommandError',
+    'CommandGroup',
     'LabelCommand',
+    'LazyCommand',
     'SingleLabelCommand',
-    'CompletionCommand',
-]
-
+] + sorted(lazy_attributes)
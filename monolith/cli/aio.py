@@ -0,0 +1,81 @@
+"""
+Support for commands implemented with ``asyncio`` (Python 3.5+).
+"""
+import asyncio
+
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import LabelCommand
+
+
+class AsyncBaseCommand(BaseCommand):
+    """
+    Base class for commands with asynchronous ``handle``. Such commands are run
+    by :meth:`ExecutionManager.run_command` at manager's event loop or are
+    awaited by :meth:`ExecutionManager.acall_command`.
+    """
+
+    async def handle(self, namespace):
+        """
+        Handles given ``namespace`` and executes command. Should be overridden
+        at subclass.
+        """
+        raise NotImplementedError
+
+
+class AsyncLabelCommand(AsyncBaseCommand, LabelCommand):
+    """
+    Label command with asynchronous ``handle_label``. Labels are handled
+    concurrently.
+
+    **Extra attributes**:
+
+    - ``concurrency``: Maximum number of labels handled at once. Defaults to
+      ``10``.
+    """
+    concurrency = 10
+
+    async def handle(self, namespace):
+        """
+        Handles given ``namespace`` by awaiting ``handle_label`` for each given
+        *label* - at most *concurrency* labels at once.
+        """
+        labels = iter(self.get_labels(namespace))
+
+        async def worker():
+            for label in labels:
+                await self.handle_label(label, namespace)
+
+        workers = [asyncio.ensure_future(worker()) for i in
+            range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        self.handle_no_labels(namespace)
+
+    async def handle_label(self, label, namespace):
+        """
+        Handles single *label*. Should be overridden at subclass.
+        """
+        raise NotImplementedError
+
+
+async def acall_command(manager, cmd, *argv):
+    """
+    Runs a command of the given ``manager`` (see
+    :meth:`ExecutionManager.acall_command`). Command is run the same way as
+    by :meth:`ExecutionManager.run_command` but awaitable returned by its
+    handler is awaited at the running event loop and
+    :class:`monolith.cli.CommandError` is raised to the caller.
+    """
+    namespace = manager.parse_command(cmd, argv)
+    with manager.handling(namespace) as replayed:
+        if replayed:
+            return
+        result = namespace.func(namespace)
+        if hasattr(result, '__await__'):
+            await result
+        else:
+            manager.write_records(namespace, result)
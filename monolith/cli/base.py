@@ -1,17 +1,35 @@
 import os
 import sys
+import bisect
 import argparse
+import contextlib
 from collections import namedtuple
+from monolith.compat import Iterator
 from monolith.compat import OrderedDict
+from monolith.compat import basestring
 from monolith.compat import unicode
 from monolith.cli.exceptions import AlreadyRegistered
 from monolith.cli.exceptions import CommandError
+from monolith.utils import timings
 from monolith.utils.imports import get_class
 
 
 Argument = namedtuple('Argument', 'args kwargs')
 
 
+def get_names_with_prefix(names, prefix):
+    """
+    Returns names starting with given ``prefix`` out of sorted list of
+    ``names``. Only matching names are visited.
+    """
+    matches = []
+    for index in range(bisect.bisect_left(names, prefix), len(names)):
+        if not names[index].startswith(prefix):
+            break
+        matches.append(names[index])
+    return matches
+
+
 def arg(*args, **kwargs):
     """
     Returns *Argument* namedtuple in format: ``(args, kwargs)``. In example::
@@ -32,19 +50,132 @@ class Parser(argparse.ArgumentParser):
     """
     def __init__(self, *args, **kwargs):
         self.stream = kwargs.pop('stream', sys.stderr)
+        self.deferred = None
         super(Parser, self).__init__(*args, **kwargs)
 
+    def defer(self, callback):
+        """
+        Defers populating this parser until it is actually needed (i.e. to
+        parse arguments or to format help). Given ``callback`` would be called
+        once, with this parser as the only argument.
+        """
+        self.deferred = callback
+
+    def populate(self):
+        """
+        Calls deferred callback (if any was set with :meth:`defer`).
+        """
+        if self.deferred is not None:
+            callback, self.deferred = self.deferred, None
+            callback(self)
+
+    def parse_known_args(self, args=None, namespace=None):
+        self.populate()
+        return super(Parser, self).parse_known_args(args, namespace)
+
+    def format_usage(self):
+        self.populate()
+        return super(Parser, self).format_usage()
+
+    def format_help(self):
+        self.populate()
+        return super(Parser, self).format_help()
+
     def _print_message(self, message, file=None):
         if file is None:
             file = self.stream
         super(Parser, self)._print_message(unicode(message), file)
 
 
+class LazyCommand(object):
+    """
+    Registry entry for a command given as a dotted path to its class. Command
+    class is imported (and command instantiated) only when it is actually
+    needed - i.e. when it is chosen to be run or when
+    :meth:`ExecutionManager.get_commands` is called.
+
+    **Attributes**
+
+    - ``class_path``: Dotted path to the command class.
+    - ``help``: Static help description for this command, used to list it
+      without importing. Defaults to empty string.
+    """
+
+    def __init__(self, class_path, help=''):
+        self.class_path = class_path
+        self.help = help
+
+    def __repr__(self):
+        return '<LazyCommand: %s>' % self.class_path
+
+    def get_class(self):
+        """
+        Imports and returns command class.
+        """
+        return get_class(self.class_path)
+
+
 class ExecutionManager(object):
+    """
+    Entry point of the command line application. Holds registry of commands
+    and dispatches execution to them.
+
+    **Attributes**
+
+    - ``usage``: Usage text of the main parser. Defaults to ``None``.
+    - ``parser_cls``: Class used to build parsers. Defaults to
+      :class:`Parser`.
+    - ``lazy_parser``: If ``True``, only subparser of the command requested at
+      the arguments is fully built - other commands are registered as stubs
+      populated only if needed. Note that ``setup_parser`` of the stub commands
+      is not called, so they should not rely on it to add global arguments.
+      Defaults to ``False``.
+    - ``parser_caching``: If ``True``, parsers built by :meth:`call_command`
+      and :meth:`execute` are reused by subsequent calls (see
+      :meth:`get_cached_parser`). Defaults to ``True``.
+    - ``batch``: If ``True``, global ``--batch FILE`` option is available. It
+      runs command lines read from the given file (or from standard input if
+      ``-`` is given), see :meth:`run_batch`. Defaults to ``False``.
+    - ``profiling``: If ``True``, global ``--profile[=FILE]`` option is
+      available. It runs parsing and command under profiler, writes
+      statistics (in *pstats* format) to ``FILE`` and reports time spent at
+      the framework and at the command's handler. Profiling can also be
+      requested with ``MONOLITH_PROFILE`` environment variable set to ``FILE``
+      (or to ``1``), in which case registration of commands (done when the
+      manager is created, before the option is seen) is profiled and reported
+      too. Defaults to ``False``.
+    - ``manifest_path``: Path of the commands manifest file (see
+      :meth:`get_manifest`). If set, help and completion are served from the
+      manifest without importing commands. Defaults to ``None`` (no manifest).
+    - ``abbreviations``: If ``True``, commands can be requested with any
+      unambiguous prefix of their names (i.e. ``com`` for ``commit``, unless
+      another command starts with ``com``). Defaults to ``False``.
+    - ``result_cache_path``: Directory of the result cache of *cacheable*
+      commands. Defaults to ``None``, in which case it's
+      ``$XDG_CACHE_HOME/monolith/results-<prog>``
+      (``~/.cache/monolith/...``).
+    - ``result_cache_size``: Maximal number of cached results. Defaults to
+      ``256``.
+    - ``pipeline_separator``: If set, arguments given to :meth:`execute`
+      (and lines of batch files and of the shell) are split with it into
+      stages of an in-process pipeline (see :meth:`pipeline`). Defaults to
+      ``None``.
+    """
     usage = None
     completion = False
     completion_env_var_name = ''
+    completion_server_path = None
+    completion_server_idle_timeout = 600
     parser_cls = Parser
+    lazy_parser = False
+    parser_caching = True
+    batch = False
+    profiling = False
+    manifest_path = None
+    abbreviations = False
+    result_cache_path = None
+    result_cache_size = 256
+    pipeline_separator = None
 
     def __init__(self, argv=None, stderr=None, stdout=None):
         if argv is None:
@@ -52,10 +183,26 @@ class ExecutionManager(object):
         self.prog_name = os.path.basename(argv[0])
         self.argv = argv[1:]
         self.registry = {}
+        self.command_names = []
+        self.parser_cache = {}
+        self.event_loop = None
         self.stderr = stderr or sys.stderr
         self.stdout = stdout or sys.stdout
+        self.registry_profile = None
 
-        for name, Command in self.get_commands_to_register().items():
+        if os.environ.get('MONOLITH_PROFILE'):
+            from monolith.cli.profiling import profile_registration
+            self.registry_profile = profile_registration(self)
+        else:
+            self.register_commands()
+
+    def register_commands(self):
+        """
+        Registers commands returned by :meth:`get_commands_to_register`.
+        """
+        with timings.phase('get_commands_to_register'):
+            commands = self.get_commands_to_register()
+        for name, Command in commands.items():
             self.register(name, Command)
 
     def get_usage(self):
@@ -64,25 +211,272 @@ class ExecutionManager(object):
         """
         return self.usage
 
-    def get_parser(self):
+    def get_parser(self, argv=None):
         """
         Returns :class:`monolith.cli.Parser` instance for this
         *ExecutionManager*.
+
+        :param argv: arguments the parser is going to be used for. If given
+          and *lazy_parser* is enabled, only subparser of the requested command
+          is fully built.
+        """
+        with timings.phase('get_parser'):
+            selected = None
+            if self.lazy_parser and argv is not None:
+                selected = self.get_requested_command_name(argv)
+            parser = self.parser_cls(prog=self.prog_name,
+                usage=self.get_usage(), stream=self.stderr)
+            for argument in self.get_global_args():
+                parser.add_argument(*argument.args, **argument.kwargs)
+            subparsers = parser.add_subparsers(
+                title='subcommands',
+            )
+            for name, command in self.registry.items():
+                cmdparser = subparsers.add_parser(name, help=command.help)
+                if isinstance(command, (LazyCommand, CommandGroup)) or (
+                        selected is not None and name != selected):
+                    cmdparser.defer(self.get_subparser_populator(parser, name))
+                else:
+                    self.populate_subparser(parser, cmdparser, name)
+
+        return parser
+
+    def get_global_args(self):
+        """
+        Returns list of :class:`Argument` instances for the main parser.
         """
-        parser = self.parser_cls(prog=self.prog_name, usage=self.get_usage(),
-            stream=self.stderr)
-        subparsers = parser.add_subparsers(
-            title='subcommands',
-        )
-        for name, command in self.registry.items():
-            cmdparser = subparsers.add_parser(name, help=command.help)
+        args = []
+        if self.profiling:
+            args.append(arg('--profile', nargs='?', metavar='FILE',
+                help='Profile execution and write statistics to FILE '
+                '(defaults to PROG.prof). Must be given as --profile=FILE. '
+                'Registration of commands is included only if profiling is '
+                'requested with MONOLITH_PROFILE environment variable.'))
+        if self.batch:
+            args.append(arg('--batch', metavar='FILE', dest='batch_file',
+                help='Run command lines read from FILE ("-" for standard '
+                'input), one per line.'))
+        return args
+
+    def get_cached_parser(self, argv=None):
+        """
+        Returns parser for given ``argv`` (see :meth:`get_parser`), reusing
+        previously built one if possible. Cached parsers are dropped whenever
+        the registry changes (see :meth:`register`) and cached parser is
+        rebuilt if arguments of the command requested at ``argv`` (or of any
+        command set up at the registry, if none is requested) change.
+        """
+        if not self.parser_caching:
+            return self.get_parser(argv)
+        name = None
+        if argv is not None:
+            name = self.get_requested_command_name(argv)
+        key = (self.get_usage(), name if self.lazy_parser else None)
+        cached = self.parser_cache.get(key)
+        if cached is None or not self.is_parser_current(cached[0], name):
+            # arguments of set up commands are read once parser is built so
+            # that lazy commands populated while building are included
+            parser = self.get_parser(argv)
+            cached = self.parser_cache[key] = (self.get_registry_args(), parser)
+        return cached[1]
+
+    def is_parser_current(self, args, name=None):
+        """
+        Returns ``True`` if arguments of the command ``name`` (or of all
+        commands set up at the registry if ``name`` is ``None``) are the same
+        as at ``args`` snapshot (see :meth:`get_registry_args`) taken when
+        parser was built. Command which was lazy when parser was built has its
+        subparser populated only once needed, so it's current - its arguments
+        are added to ``args`` once it's set up, to be compared next time.
+        """
+        if name is None:
+            return args == self.get_registry_args()
+        command = self.registry.get(name)
+        if command is None or isinstance(command, LazyCommand):
+            return True
+        if name not in args:
+            args[name] = list(command.get_args())
+            return True
+        return args[name] == list(command.get_args())
+
+    def get_registry_args(self):
+        """
+        Returns dictionary mapping names of the commands which are set up at
+        the registry to lists of their arguments.
+        """
+        return dict((name, list(command.get_args())) for name, command in
+            self.registry.items() if not isinstance(command, LazyCommand))
+
+    def parse_args(self, parser, args=None):
+        """
+        Parses given ``args`` with ``parser`` and returns new namespace. Mutable
+        values (i.e. default lists) are copied so that they are never shared
+        between calls using the same parser.
+        """
+        import copy
+
+        with timings.phase('parse_args'):
+            namespace = parser.parse_args(args, argparse.Namespace())
+        for key, value in vars(namespace).items():
+            if isinstance(value, (list, dict, set)):
+                setattr(namespace, key, copy.copy(value))
+        return namespace
+
+    def get_manifest_path(self):
+        """
+        Returns path of the commands manifest file. By default it returns
+        *manifest_path*.
+        """
+        return self.manifest_path
+
+    def get_manifest(self, update=False):
+        """
+        Returns :class:`monolith.cli.manifest.Manifest` describing registered
+        commands or ``None`` if no manifest path is set or manifest is missing
+        or stale.
+
+        :param update: If ``True``, missing or stale manifest would be built
+          (which imports all commands) and written to disk. Help and
+          completion never do that - they use fresh manifest only and take
+          the usual path otherwise.
+        """
+        path = self.get_manifest_path()
+        if not path:
+            return None
+        from monolith.cli.manifest import Manifest
+        manifest = Manifest.load(path)
+        if manifest is not None and manifest.is_fresh(self):
+            return manifest
+        if not update:
+            return None
+        manifest = Manifest.build(self)
+        try:
+            manifest.save(path)
+        except (IOError, OSError):
+            pass
+        return manifest
+
+    def execute_from_manifest(self, argv):
+        """
+        Prints help requested with given ``argv`` (``--help`` or
+        ``<command> --help``) using commands manifest and exits. Returns
+        without doing anything if the request cannot be answered from manifest.
+        """
+        if not argv or argv[-1] not in ('-h', '--help') or len(argv) > 2:
+            return
+        if len(argv) == 2 and argv[0] not in self.registry:
+            return
+        manifest = self.get_manifest()
+        if manifest is None:
+            return
+        text = manifest.get_help(argv[0] if len(argv) == 2 else None)
+        if text is None:
+            return
+        sys.stdout.write(text)
+        sys.exit(0)
+
+    def get_requested_command_name(self, argv):
+        """
+        Returns name of the registered command requested at given ``argv``
+        (first positional argument) or ``None`` if no command was requested.
+        """
+        for value in argv:
+            if not value.startswith('-'):
+                return self.resolve_command_name(value)
+        return None
+
+    def get_command_names(self, prefix=''):
+        """
+        Returns sorted names of registered commands (starting with
+        ``prefix``, if given). Names are looked up at index maintained by
+        :meth:`register`, so the cost depends on the number of matching names
+        rather than on the size of the registry.
+        """
+        if len(self.command_names) != len(self.registry):
+            # registry was changed directly
+            self.command_names = sorted(self.registry)
+        if not prefix:
+            return list(self.command_names)
+        return get_names_with_prefix(self.command_names, prefix)
+
+    def resolve_command_name(self, name):
+        """
+        Returns name of the registered command requested as ``name`` or
+        ``None`` if there is no such command. If *abbreviations* are enabled,
+        ``name`` may be an unambiguous prefix of command's name.
+        """
+        if name in self.registry:
+            return name
+        if self.abbreviations and name:
+            names = self.get_command_names(name)
+            if len(names) == 1:
+                return names[0]
+        return None
+
+    def expand_command_name(self, args):
+        """
+        Returns copy of ``args`` with abbreviated command name (see
+        *abbreviations*) replaced by the full name. Names of commands chosen
+        at command groups are expanded by their sub-managers.
+        """
+        args = list(args)
+        for index, value in enumerate(args):
+            if not value.startswith('-'):
+                if self.abbreviations:
+                    args[index] = self.resolve_command_name(value) or value
+                rest = args[index + 1:]
+                if any(not value.startswith('-') for value in rest):
+                    group = self.get_command_group(args[index])
+                    if group is not None:
+                        args[index + 1:] = group.get_manager(
+                            ).expand_command_name(rest)
+                break
+        return args
+
+    def get_command_group(self, name, manifest=None):
+        """
+        Returns :class:`CommandGroup` registered as ``name`` or ``None`` if
+        it's not a group. Lazily registered command is imported to find out
+        (unless given ``manifest`` tells it's not a group) and set up if it
+        turns out to be a group.
+        """
+        command = self.registry.get(name)
+        if isinstance(command, LazyCommand):
+            if manifest is not None and not (manifest.get_command(name) or
+                    {}).get('group'):
+                return None
+            Command = command.get_class()
+            if not (isinstance(Command, type) and issubclass(Command,
+                    CommandGroup)):
+                return None
+            command = self.setup_command(name, Command)
+        return command if isinstance(command, CommandGroup) else None
+
+    def get_subparser_populator(self, parser, name):
+        """
+        Returns callback which would populate subparser of the command
+        registered as ``name`` once it is needed.
+        """
+        def populator(cmdparser):
+            self.populate_subparser(parser, cmdparser, name)
+        return populator
+
+    def populate_subparser(self, parser, cmdparser, name):
+        """
+        Adds arguments of the command registered as ``name`` to the given
+        ``cmdparser`` and calls command's ``setup_parser``.
+        """
+        with timings.phase('subparser', command=name):
+            command = self.get_command(name)
             for argument in command.get_args():
                 cmdparser.add_argument(*argument.args, **argument.kwargs)
+            if getattr(command, 'cacheable', False):
+                cmdparser.add_argument('--no-cache', action='store_true',
+                    default=False, help='Run the command even if its result '
+                    'is cached.')
             command.setup_parser(parser, cmdparser)
             cmdparser.set_defaults(func=command.handle)
 
-        return parser
-
     def register(self, name, Command, force=False):
         """
         Registers given ``Command`` (as given ``name``) at this
@@ -91,7 +485,9 @@ class ExecutionManager(object):
         :param name: name in the registry under which given ``Command``
           should be stored.
         :param Command: should be subclass of
-          :class:``monolith.cli.base.BaseCommand``
+          :class:``monolith.cli.base.BaseCommand``, dotted path to such class
+          or :class:`LazyCommand` instance. In the last two cases command
+          class would be imported only once the command is needed.
         :param force: Forces registration if set to ``True`` - even if another
           command was already registered, it would be overridden and no
           execption would be raised. Defaults to ``False``.
@@ -101,18 +497,49 @@ class ExecutionManager(object):
         """
         if not force and name in self.registry:
             raise AlreadyRegistered('Command %r is already registered' % name)
+        self.parser_cache.clear()
+        if name not in self.registry:
+            bisect.insort(self.command_names, name)
+        with timings.phase('register', command=name):
+            if isinstance(Command, basestring):
+                Command = LazyCommand(Command)
+            if isinstance(Command, LazyCommand):
+                self.registry[name] = Command
+            else:
+                self.setup_command(name, Command)
+
+    def setup_command(self, name, Command):
+        """
+        Instantiates given ``Command``, stores it at the registry as ``name``
+        and calls command's ``post_register`` hook. Returns command instance.
+        """
         command = Command(self.prog_name, self.stdout)
         command.manager = self
         self.registry[name] = command
-        command.post_register(self)
+        with timings.phase('post_register', command=name):
+            command.post_register(self)
+        return command
+
+    def get_command(self, name):
+        """
+        Returns command registered as ``name``. If it was registered lazily,
+        command class is imported and command is set up first.
+
+        :raises KeyError: If no command is registered as ``name``.
+        """
+        command = self.registry[name]
+        if isinstance(command, LazyCommand):
+            command = self.setup_command(name, command.get_class())
+        return command
 
     def get_commands(self):
         """
-        Returns commands stored in the registry (sorted by name).
+        Returns commands stored in the registry (sorted by name). Lazily
+        registered commands are set up first.
         """
         commands = OrderedDict()
-        for cmd in sorted(self.registry.keys()):
-            commands[cmd] = self.registry[cmd]
+        for cmd in self.get_command_names():
+            commands[cmd] = self.get_command(cmd)
         return commands
 
     def get_commands_to_register(self):
@@ -129,10 +556,49 @@ class ExecutionManager(object):
         :param cmd: command to run (key at the registry)
         :param argv: arguments that would be passed to the command
         """
-        parser = self.get_parser()
-        args = [cmd] + list(argv)
-        namespace = parser.parse_args(args)
-        self.run_command(namespace)
+        self.run_command(self.parse_command(cmd, argv))
+
+    def parse_command(self, cmd, argv):
+        """
+        Returns namespace parsed from the (possibly abbreviated) command name
+        ``cmd`` and its arguments ``argv``.
+        """
+        args = self.expand_command_name([cmd] + list(argv))
+        parser = self.get_cached_parser(args)
+        return self.parse_args(parser, args)
+
+    def pipeline(self, *stages):
+        """
+        Runs pipeline of commands in-process (see
+        :mod:`monolith.cli.pipeline`)::
+
+            manager.pipeline(['list-hosts', '--all'], ['check'])
+
+        :param stages: lists of arguments, each starting with the command name
+        """
+        from monolith.cli.pipeline import run_pipeline
+        run_pipeline(self, [list(stage) for stage in stages])
+
+    def get_pipeline_stages(self, args):
+        """
+        Returns list of pipeline stages given at ``args`` or ``None`` if
+        ``args`` is not a pipeline (see *pipeline_separator*).
+        """
+        if self.pipeline_separator is None or \
+                self.pipeline_separator not in args:
+            return None
+        from monolith.cli.pipeline import split_pipeline
+        return split_pipeline(args, self.pipeline_separator)
+
+    def acall_command(self, cmd, *argv):
+        """
+        Awaitable version of :meth:`call_command` - asynchronous commands are
+        awaited at the running event loop instead of at manager's own loop.
+        :class:`monolith.cli.CommandError` raised by the command is propagated
+        to the caller instead of exiting. Requires Python 3.5+.
+        """
+        from monolith.cli.aio import acall_command
+        return acall_command(self, cmd, *argv)
 
     def execute(self, argv=None):
         """
@@ -140,18 +606,217 @@ class ExecutionManager(object):
         """
         if self.completion:
             self.autocomplete()
-        parser = self.get_parser()
-        namespace = parser.parse_args(argv)
+        args = sys.argv[1:] if argv is None else list(argv)
+        profile_path = self.get_profile_path(args)
+        args = self.expand_command_name(args)
+        if profile_path is not None:
+            from monolith.cli.profiling import execute_profiled
+            execute_profiled(self, args, profile_path)
+            return
+        stages = self.get_pipeline_stages(args)
+        if stages is not None:
+            self.pipeline(*stages)
+            return
+        self.execute_from_manifest(args)
+        parser = self.get_cached_parser(args)
+        namespace = self.parse_args(parser, args)
+        self.dispatch(namespace)
+
+    def dispatch(self, namespace):
+        """
+        Runs batch or command requested at parsed ``namespace``.
+        """
+        if getattr(namespace, 'batch_file', None):
+            if namespace.batch_file == '-':
+                statuses = self.run_batch(sys.stdin)
+            else:
+                with open(namespace.batch_file) as stream:
+                    statuses = self.run_batch(stream)
+            sys.exit(1 if any(status for lineno, status in statuses) else 0)
         if hasattr(namespace, 'func'):
             self.run_command(namespace)
 
+    def get_profile_path(self, args):
+        """
+        Returns path of the profile statistics file if profiling was requested
+        (with ``MONOLITH_PROFILE`` environment variable or, if *profiling* is
+        enabled, with ``--profile[=FILE]`` global option) or ``None``. The
+        option is removed from given ``args`` list.
+        """
+        default = '%s.prof' % self.prog_name
+        path = os.environ.get('MONOLITH_PROFILE') or None
+        if path == '1':
+            path = default
+        if not self.profiling:
+            return path
+        for index, value in enumerate(args):
+            if value == '--profile':
+                del args[index]
+                return default
+            elif value.startswith('--profile='):
+                del args[index]
+                return value[len('--profile='):] or default
+            elif not value.startswith('-'):
+                break
+        return path
+
+    def run_args(self, args):
+        """
+        Runs command for given ``args`` (list of arguments, without program
+        name) and returns its exit status instead of exiting. Unexpected
+        exceptions are reported (with traceback) to ``self.stderr`` and result
+        in exit status ``1``.
+        """
+        try:
+            stages = self.get_pipeline_stages(args)
+            if stages is not None:
+                self.pipeline(*stages)
+                return 0
+            args = self.expand_command_name(args)
+            parser = self.get_cached_parser(args)
+            namespace = self.parse_args(parser, args)
+            if hasattr(namespace, 'func'):
+                self.run_command(namespace)
+        except SystemExit as err:
+            if err.code is None:
+                return 0
+            if isinstance(err.code, int):
+                return err.code
+            return 1
+        except Exception:
+            import traceback
+            self.stderr.write(unicode(traceback.format_exc()))
+            return 1
+        return 0
+
+    def shell(self, stdin=None, stdout=None, intro=None):
+        """
+        Runs interactive shell (see :class:`monolith.cli.shell.Shell`) reading
+        command lines from ``stdin`` (defaults to standard input, with line
+        editing and completion if *readline* is available) until it's left.
+        Returns exit status of the last command.
+        """
+        from monolith.cli.shell import run_shell
+        return run_shell(self, stdin, stdout, intro)
+
+    def run_batch(self, stream):
+        """
+        Runs commands read from the given ``stream`` - one command line (shell
+        quoted arguments, without program name) per line. Empty lines and
+        comments are skipped. Failures (including lines which cannot be split,
+        reported with exit status ``2``) are reported to ``self.stderr`` and
+        execution continues with the next line; summary is written at the end.
+
+        Returns list of ``(line number, exit status)`` tuples.
+        """
+        import shlex
+
+        statuses = []
+        for lineno, line in enumerate(stream, 1):
+            try:
+                args = shlex.split(line, comments=True)
+            except ValueError as err:
+                self.stderr.write(unicode('%s: line %d: %s\n' % (
+                    self.prog_name, lineno, err)))
+                status = 2
+            else:
+                if not args:
+                    continue
+                status = self.run_args(args)
+            statuses.append((lineno, status))
+            if status:
+                self.stderr.write(unicode('%s: line %d: exit status %d\n' % (
+                    self.prog_name, lineno, status)))
+        failed = len([status for lineno, status in statuses if status])
+        self.stderr.write(unicode('%s: %d command(s) run, %d failed\n' % (
+            self.prog_name, len(statuses), failed)))
+        return statuses
+
     def run_command(self, namespace):
+        """
+        Runs command's handler stored at ``namespace``. If handler returns an
+        awaitable (i.e. it's a coroutine function), it's run until complete at
+        manager's event loop (see :meth:`get_event_loop`). If it returns an
+        iterator (i.e. generator of pipeline records), records are written to
+        command's ``stdout``, one per line. Results of *cacheable* commands
+        are taken from the result cache if possible (see
+        :mod:`monolith.cli.caching`), unless command is a downstream stage of
+        a pipeline.
+        """
         try:
-            namespace.func(namespace)
+            with self.handling(namespace) as replayed:
+                if not replayed:
+                    self.call_handler(namespace)
         except CommandError as err:
             sys.stderr.write('ERROR: %s\n' % err.message)
             sys.exit(err.code)
 
+    @contextlib.contextmanager
+    def handling(self, namespace):
+        """
+        Returns context manager wrapping a call of command's handler stored
+        at ``namespace``: it measures ``handle`` timings phase, flushes
+        buffered output at exit and, for *cacheable* commands, stores the
+        result at the result cache. Yields ``True`` if the result has been
+        replayed from the cache, in which case handler must not be called.
+        Shared by :meth:`run_command` and :meth:`acall_command`.
+        """
+        command = getattr(namespace.func, '__self__', None)
+        cached = getattr(command, 'cacheable', False) and not getattr(
+            namespace, 'no_cache', False) and getattr(namespace,
+            'pipeline_input', None) is None
+        try:
+            with timings.phase('handle', handler=getattr(namespace.func,
+                    '__qualname__', None)):
+                if cached:
+                    from monolith.cli.caching import cached_result
+                    with cached_result(self, command, namespace) as replayed:
+                        yield replayed
+                else:
+                    yield False
+        finally:
+            self.flush_output(namespace)
+
+    def call_handler(self, namespace):
+        """
+        Calls command's handler stored at ``namespace``, awaiting it if
+        needed and writing records it yields.
+        """
+        result = namespace.func(namespace)
+        if hasattr(result, '__await__'):
+            self.get_event_loop().run_until_complete(result)
+        else:
+            self.write_records(namespace, result)
+
+    def write_records(self, namespace, result):
+        """
+        Writes records to command's ``stdout``, one per line, if ``result``
+        of handler stored at ``namespace`` is an iterator.
+        """
+        if isinstance(result, Iterator):
+            stdout = getattr(namespace.func, '__self__', self).stdout
+            for record in result:
+                stdout.write(unicode('%s\n' % (record,)))
+
+    def flush_output(self, namespace):
+        """
+        Flushes buffered output of the command which handler is stored at
+        ``namespace``.
+        """
+        command = getattr(namespace.func, '__self__', None)
+        if getattr(command, 'buffered_output', False):
+            command.stdout.flush()
+
+    def get_event_loop(self):
+        """
+        Returns event loop used to run asynchronous commands. The same loop is
+        used for all commands run by this manager.
+        """
+        if self.event_loop is None:
+            import asyncio
+            self.event_loop = asyncio.new_event_loop()
+        return self.event_loop
+
     def autocomplete(self):
         """
         If *completion* is enabled, this method would write to ``self.stdout``
@@ -161,22 +826,77 @@ class ExecutionManager(object):
             return
         cwords = os.environ['COMP_WORDS'].split()[1:]
         cword = int(os.environ['COMP_CWORD'])
+        self.stdout.write(unicode(' '.join(self.get_completions(cwords,
+            cword))))
+        if self.completion_server_path:
+            from monolith.cli.completion_server import spawn_completion_server
+            spawn_completion_server(self, self.completion_server_path,
+                self.completion_server_idle_timeout)
+
+        sys.exit(1)
+
+    def get_completions(self, cwords, cword):
+        """
+        Returns list of completion words.
+
+        :param cwords: words typed so far (without program name).
+        :param cword: index of the completed word (where ``1`` points at the
+          first element of ``cwords``).
+        """
         try:
             current = cwords[cword-1]
         except IndexError:
             current = ''
-        cmd_names = self.get_commands().keys()
-
-        if current:
-            self.stdout.write(unicode(' '.join(
-                [name for name in cmd_names if name.startswith(current)])))
+        if cword < 1:
+            return []
+        if cword == 1:
+            if not current:
+                return []
+            manifest = self.get_manifest()
+            if manifest is not None:
+                return get_names_with_prefix(manifest.get_command_names(),
+                    current)
+            return self.get_command_names(current)
+        name = self.resolve_command_name(cwords[0])
+        if name is None:
+            return []
+        manifest = self.get_manifest()
+        group = self.get_command_group(name, manifest if isinstance(
+            self.registry[name], LazyCommand) else None)
+        if group is not None:
+            return group.get_manager().get_completions(cwords[1:], cword - 1)
+        table = self.get_completion_table(name, manifest)
+        if table is None:
+            return []
+        from monolith.cli.completion import complete_arguments
+        return complete_arguments(table, cwords[1:cword-1], current)
 
-        sys.exit(1)
+    def get_completion_table(self, name, manifest=None):
+        """
+        Returns completion table (see
+        :func:`monolith.cli.completion.get_completion_table`) of the command
+        registered as ``name`` or ``None`` if there is no such command. Table
+        is taken from the given commands ``manifest`` (already loaded by the
+        caller, see :meth:`get_manifest`) if possible.
+        """
+        name = self.resolve_command_name(name)
+        if name is None:
+            return None
+        if manifest is not None:
+            return manifest.get_command(name)['completion']
+        from monolith.cli.completion import get_completion_table
+        from monolith.cli.manifest import get_action_spec
+        from monolith.cli.manifest import get_subparsers_action
+        parser = self.get_cached_parser([name])
+        cmdparser = get_subparsers_action(parser).choices[name]
+        cmdparser.populate()
+        return get_completion_table([get_action_spec(action) for action in
+            cmdparser._actions])
 
 
 class SimpleExecutionManager(ExecutionManager):
 
-    def __init__(self, program, commands):
+    def __init__(self, program, commands, lazy=False):
         """
         :param program: name of the program under which commands would be
           executed (usually name of the program).
@@ -187,18 +907,32 @@ class SimpleExecutionManager(ExecutionManager):
               {
                   'subcommand1': SomeCommand,
                   'subcommand2': 'myprogram.commands.another.AnotherCommand',
+                  'subcommand3': LazyCommand('myprogram.commands.Third',
+                      help='Third command'),
               }
+
+        :param lazy: If ``True``, commands given as strings would be imported
+          only once they are needed (see :class:`LazyCommand`). Defaults to
+          ``False``.
         """
         self.simple_commands = commands
+        self.lazy = lazy
         super(SimpleExecutionManager, self).__init__([program])
 
     def get_commands_to_register(self):
         """
         Returns dictionary with commands given during construction. If value is
-        a string, it would be converted into proper class pointer.
+        a string, it would be converted into proper class pointer (or into
+        :class:`LazyCommand` if manager is *lazy*).
         """
-        return dict((key, get_class(value)) for key, value in
-            self.simple_commands.items())
+        commands = {}
+        for key, value in self.simple_commands.items():
+            if self.lazy and isinstance(value, basestring):
+                value = LazyCommand(value)
+            elif not isinstance(value, LazyCommand):
+                value = get_class(value)
+            commands[key] = value
+        return commands
 
 
 class BaseCommand(object):
@@ -213,13 +947,38 @@ class BaseCommand(object):
       command is run. Defaults to ``None``.
     - ``stdout``: File-like object. Command should write to it. Defaults to
       ``sys.stdout``.
+    - ``buffered_output``: If ``True``, ``stdout`` is wrapped with
+      :class:`monolith.cli.output.BufferedOutput` which writes output in large
+      batches (or line by line if ``stdout`` is a terminal). Output is flushed
+      once command is run by the manager (even if it fails). Defaults to
+      ``False``.
+    - ``output_buffer_size``: Number of characters collected before buffered
+      output is flushed. Defaults to ``65536``.
+    - ``output_flush_interval``: Number of seconds after which buffered
+      output is flushed. Defaults to ``1.0``.
+    - ``cacheable``: If ``True``, output written to ``stdout`` and exit status
+      of the command are cached (see :mod:`monolith.cli.caching`) and
+      ``--no-cache`` option is added. Only commands which results depend on
+      arguments and working directory alone should be cacheable. Defaults to
+      ``False``.
+    - ``cache_ttl``: Number of seconds cached result is valid for. Defaults
+      to ``300``.
     """
     help = ''
     args = []
+    buffered_output = False
+    output_buffer_size = 64 * 1024
+    output_flush_interval = 1.0
+    cacheable = False
+    cache_ttl = 300
 
     def __init__(self, prog_name=None, stdout=None):
         self.prog_name = prog_name or ''
         self.stdout = stdout or sys.stdout
+        if self.buffered_output:
+            from monolith.cli.output import get_buffered_output
+            self.stdout = get_buffered_output(self.stdout,
+                self.output_buffer_size, self.output_flush_interval)
 
     def get_args(self):
         """
@@ -264,25 +1023,129 @@ class LabelCommand(BaseCommand):
 
     - ``labels_required``: If ``True``, at least one *label* is required,
       otherwise no positional arguments could be given. Defaults to ``True``.
+    - ``parallel``: If ``True``, ``-j/--jobs N`` argument is available and
+      labels are handled by ``N`` workers. Output of each label is captured
+      and written in the order of labels. Failures of single labels are
+      reported together once all labels are handled. Defaults to ``False``.
+    - ``jobs``: Default number of workers. Defaults to ``1``.
+    - ``pool``: Either ``'thread'`` or ``'process'``. In the latter case
+      ``handle_label`` is called at a new instance of the command created at
+      worker process (so command class needs to be importable and namespace
+      picklable). Defaults to ``'thread'``.
+    - ``streaming_labels``: If ``True``, labels may also be read (lazily, one
+      by one) from standard input (if ``-`` is given as a label) and from a
+      file given with ``--labels-from FILE``. Records are separated with new
+      lines or, if ``-0/--null`` is given, with NUL characters. Defaults to
+      ``False``.
+
+    Run as a downstream stage of a pipeline (see
+    :meth:`ExecutionManager.pipeline`), command handles records of the
+    upstream stage in place of ``-`` label.
     """
     labels_required = True
+    parallel = False
+    jobs = 1
+    pool = 'thread'
+    streaming_labels = False
 
     def get_labels_arg(self):
         """
         Returns argument for *labels*.
         """
         nargs = self.labels_required and '+' or '*'
+        if self.streaming_labels:
+            nargs = '*'
         return arg('labels', nargs=nargs)
 
+    def get_streaming_labels_args(self):
+        """
+        Returns arguments controlling reading of streamed *labels*.
+        """
+        return [
+            arg('--labels-from', metavar='FILE', help='Read labels from FILE '
+                '("-" for standard input).'),
+            arg('-0', '--null', action='store_true', default=False,
+                help='Labels read from files are separated with NUL '
+                'characters rather than new lines.'),
+        ]
+
+    def get_jobs_arg(self):
+        """
+        Returns argument for number of parallel *jobs*.
+        """
+        return arg('-j', '--jobs', type=int, default=self.jobs, metavar='N',
+            help='Number of labels handled in parallel.')
+
     def get_args(self):
-        return self.args + [self.get_labels_arg()]
+        args = self.args + [self.get_labels_arg()]
+        if self.streaming_labels:
+            args.extend(self.get_streaming_labels_args())
+        if self.parallel:
+            args.append(self.get_jobs_arg())
+        return args
+
+    def get_labels(self, namespace):
+        """
+        Returns iterable of *labels* to handle. If *streaming_labels* is
+        enabled, it's a generator reading labels from files lazily.
+        """
+        if getattr(namespace, 'pipeline_input', None) is not None:
+            return self.iter_piped_labels(namespace)
+        if not self.streaming_labels:
+            return namespace.labels
+        labels_from = getattr(namespace, 'labels_from', None)
+        if self.labels_required and not namespace.labels and not labels_from:
+            raise CommandError('at least one label is required', 2)
+        return self.iter_streaming_labels(namespace)
+
+    def iter_streaming_labels(self, namespace):
+        """
+        Yields labels given at arguments, reading files (``-`` or
+        ``--labels-from`` file) lazily.
+        """
+        from monolith.utils.streams import iter_records
+
+        delimiter = getattr(namespace, 'null', False) and '\0' or '\n'
+        for label in namespace.labels:
+            if label != '-':
+                yield label
+                continue
+            for record in iter_records(sys.stdin, delimiter):
+                yield record
+        labels_from = getattr(namespace, 'labels_from', None)
+        if labels_from == '-':
+            for record in iter_records(sys.stdin, delimiter):
+                yield record
+        elif labels_from:
+            with open(labels_from) as stream:
+                for record in iter_records(stream, delimiter):
+                    yield record
+
+    def iter_piped_labels(self, namespace):
+        """
+        Yields labels given at arguments and records of the upstream pipeline
+        stage in place of ``-`` label.
+        """
+        for label in namespace.labels:
+            if label != '-':
+                yield label
+                continue
+            for record in namespace.pipeline_input:
+                yield record
 
     def handle(self, namespace):
         """
         Handles given ``namespace`` by calling ``handle_label`` method
         for each given *label*.
         """
-        for label in namespace.labels:
+        labels = self.get_labels(namespace)
+        jobs = getattr(namespace, 'jobs', None) or 1
+        if self.parallel and jobs > 1:
+            from monolith.cli.parallel import handle_labels_in_parallel
+            handle_labels_in_parallel(self, labels, namespace, jobs)
+            self.handle_no_labels(namespace)
+            return
+        for label in labels:
             self.handle_label(label, namespace)
         else:
             self.handle_no_labels(namespace)
@@ -333,3 +1196,87 @@ class SingleLabelCommand(BaseCommand):
         """
         raise NotImplementedError
 
+
+
+class CommandGroup(BaseCommand):
+    """
+    Command grouping other commands under its name (i.e. ``prog db migrate
+    up``). Commands of the group are held by a sub-manager which is created
+    only once the group is actually used - to parse arguments, format its
+    help or complete its commands. Groups may be nested.
+
+    Subparser of a group is always built lazily and subparsers of its
+    commands are populated only once they are needed, so parsing builds and
+    imports only the path actually taken.
+
+    **Attributes**
+
+    - ``manager_class``: *ExecutionManager* subclass (or dotted path to it)
+      used as the sub-manager. Defaults to :class:`ExecutionManager`.
+    - ``commands``: Dictionary mapping names to commands (classes, dotted
+      paths or :class:`LazyCommand` instances) registered at the sub-manager,
+      together with ones returned by sub-manager's
+      ``get_commands_to_register``. Defaults to empty dictionary.
+    - ``dest``: Name of the namespace attribute the chosen command name is
+      stored at (i.e. ``db_command``). Set once the subparser is populated.
+    """
+    manager_class = ExecutionManager
+    commands = {}
+    dest = None
+
+    def __init__(self, *args, **kwargs):
+        super(CommandGroup, self).__init__(*args, **kwargs)
+        self.group_manager = None
+
+    def get_commands_to_register(self):
+        """
+        Returns dictionary of commands registered at the sub-manager. By
+        default it returns ``self.commands``.
+        """
+        return self.commands
+
+    def get_manager(self):
+        """
+        Returns sub-manager holding commands of this group, creating it on
+        first call. Sub-manager inherits enabled *abbreviations* of the
+        manager the group is registered at.
+        """
+        if self.group_manager is None:
+            Manager = self.manager_class
+            if isinstance(Manager, basestring):
+                Manager = get_class(Manager)
+            parent = getattr(self, 'manager', None)
+            manager = Manager([self.prog_name], stdout=self.stdout,
+                stderr=parent and parent.stderr)
+            if getattr(parent, 'abbreviations', False):
+                manager.abbreviations = True
+            for name, Command in self.get_commands_to_register().items():
+                manager.register(name, Command, force=True)
+            self.group_manager = manager
+        return self.group_manager
+
+    def setup_parser(self, parser, cmdparser):
+        """
+        Adds subparsers of the group's commands to ``cmdparser``. They are
+        populated only once they are needed.
+        """
+        manager = self.get_manager()
+        self.dest = '%s_command' % '_'.join(
+            cmdparser.prog.split()[1:]).replace('-', '_')
+        subparsers = cmdparser.add_subparsers(title='subcommands',
+            dest=self.dest)
+        subparsers.required = True
+        for name in manager.get_command_names():
+            subparser = subparsers.add_parser(name,
+                help=manager.registry[name].help)
+            subparser.defer(manager.get_subparser_populator(parser, name))
+
+    def handle(self, namespace):
+        """
+        Runs command chosen at the group. Handler of the chosen command is
+        normally stored at ``namespace`` by its subparser, so this is called
+        only by Python versions where nested subparsers don't override parent's
+        defaults.
+        """
+        name = getattr(namespace, self.dest)
+        return self.get_manager().get_command(name).handle(namespace)
@@ -0,0 +1,224 @@
+"""
+Builder of single file bundles - executable zip archives (see :mod:`zipapp`)
+holding a monolith application: the manager, its command modules and the
+framework itself.
+
+Each module is stored together with its precompiled bytecode (next to the
+source, where :mod:`zipimport` looks for it). Bytecode is not validated
+against the sources, so it's used as is by the interpreter the bundle was
+built with (other versions compile sources). Commands manifest (see
+:meth:`monolith.cli.ExecutionManager.get_manifest`) is embedded too, so help
+and completion are served without importing command modules and the entry
+point imports only the manager and the requested command.
+"""
+import os
+import sys
+import json
+import stat
+import shutil
+import zipfile
+import tempfile
+import py_compile
+
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import arg
+from monolith.cli.exceptions import CommandError
+from monolith.cli.manifest import Manifest
+from monolith.cli.manifest import get_help_path
+from monolith.cli.manifest import get_registry_entries
+
+
+MANIFEST_NAME = 'monolith-manifest.json'
+
+MAIN_TEMPLATE = '''\
+# Entry point generated by monolith bundle builder.
+import os
+
+from %(module)s import %(name)s
+
+manager = %(name)s()
+manager.manifest_path = os.path.join(os.path.dirname(__file__), %(manifest)r)
+manager.execute()
+'''
+
+EXCLUDED_DIRECTORIES = ('__pycache__', 'tests')
+
+
+def get_entry_point(manager):
+    """
+    Returns entry point (``module:callable``) creating given ``manager``,
+    which is its class. Raises ``ValueError`` if the class cannot be used -
+    it's defined at ``__main__`` or cannot be called without arguments (as
+    :class:`monolith.cli.SimpleExecutionManager`).
+    """
+    import inspect
+
+    Manager = manager.__class__
+    if Manager.__module__ == '__main__':
+        raise ValueError('Manager defined at __main__ needs an explicit '
+            'entry point (--entry-point MODULE:CALLABLE)')
+    try:
+        inspect.signature(Manager).bind()
+    except TypeError:
+        raise ValueError('%s cannot be created without arguments, give an '
+            'entry point returning the manager (--entry-point '
+            'MODULE:CALLABLE)' % Manager.__name__)
+    return '%s:%s' % (Manager.__module__, Manager.__name__)
+
+
+def get_bundled_packages(manager, entry_point, packages=()):
+    """
+    Returns sorted names of top level packages (or modules) bundled for the
+    given ``manager``: the framework, ones holding the manager, the entry
+    point and registered commands, and given ``packages``.
+    """
+    modules = ['monolith', manager.__class__.__module__,
+        entry_point.split(':')[0]]
+    modules.extend(path.split(':')[0].rsplit('.', 1)[0] for path in
+        get_registry_entries(manager).values())
+    modules.extend(packages)
+    return sorted(set(module.split('.')[0] for module in modules if
+        module != '__main__'))
+
+
+def get_package_files(name):
+    """
+    Returns list of ``(path, archive name)`` of source files of the top level
+    package (or module) ``name``. Package is not imported.
+    """
+    from importlib.util import find_spec
+
+    spec = find_spec(name)
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        raise ValueError('Cannot find sources of %r' % name)
+    if not spec.submodule_search_locations:
+        return [(spec.origin, os.path.basename(spec.origin))]
+    root = list(spec.submodule_search_locations)[0]
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(dirname for dirname in dirnames if dirname not
+            in EXCLUDED_DIRECTORIES)
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                path = os.path.join(directory, filename)
+                arcname = os.path.join(name, os.path.relpath(path, root))
+                files.append((path, arcname.replace(os.sep, '/')))
+    return files
+
+
+def get_bytecode(path, arcname, tmpdir):
+    """
+    Returns bytecode of the source file at ``path`` which is stored as
+    ``arcname``. Bytecode is never checked against the source.
+    """
+    cfile = os.path.join(tmpdir, 'module.pyc')
+    kwargs = {}
+    if hasattr(py_compile, 'PycInvalidationMode'):
+        kwargs['invalidation_mode'] = \
+            py_compile.PycInvalidationMode.UNCHECKED_HASH
+    py_compile.compile(path, cfile=cfile, dfile=arcname, doraise=True,
+        **kwargs)
+    with open(cfile, 'rb') as fin:
+        return fin.read()
+
+
+def build_bundle(manager, output, entry_point=None, packages=(),
+        interpreter=None, compressed=False):
+    """
+    Writes executable bundle of the given ``manager`` to ``output``. All
+    commands of the ``manager`` are imported (to build the manifest).
+
+    :param entry_point: ``module:callable`` returning manager instance when
+      called without arguments. Defaults to the manager's class.
+    :param packages: Names of extra packages (i.e. dependencies) to include.
+    :param interpreter: Interpreter put at the shebang line. Defaults to
+      ``/usr/bin/env python3`` (``python`` for Python 2).
+    :param compressed: If ``True``, archive members are compressed (smaller
+      file, slightly slower start).
+
+    Returns list of archive names of bundled files.
+    """
+    if entry_point is None:
+        entry_point = get_entry_point(manager)
+    if interpreter is None:
+        interpreter = '/usr/bin/env python%s' % (
+            '3' if sys.version_info[0] == 3 else '')
+    module, name = entry_point.split(':')
+    manifest = Manifest.build(manager)
+    manifest.data['bundled'] = True
+    manifest.data['sources'] = {}
+    compression = zipfile.ZIP_DEFLATED if compressed else zipfile.ZIP_STORED
+    tmpdir = tempfile.mkdtemp()
+    tmp_output = '%s.%d.tmp' % (output, os.getpid())
+    names = []
+    try:
+        main_path = os.path.join(tmpdir, '__main__.py')
+        with open(main_path, 'w') as fout:
+            fout.write(MAIN_TEMPLATE % {'module': module, 'name': name,
+                'manifest': MANIFEST_NAME})
+        files = [(main_path, '__main__.py')]
+        for package in get_bundled_packages(manager, entry_point, packages):
+            files.extend(get_package_files(package))
+        with open(tmp_output, 'wb') as fout:
+            fout.write(('#!%s\n' % interpreter).encode('utf-8'))
+            with zipfile.ZipFile(fout, 'w', compression) as archive:
+                for path, arcname in files:
+                    archive.write(path, arcname)
+                    archive.writestr(arcname[:-len('.py')] + '.pyc',
+                        get_bytecode(path, arcname, tmpdir))
+                    names.extend([arcname, arcname[:-len('.py')] + '.pyc'])
+                for arcname, data in ((MANIFEST_NAME, manifest.data),
+                        (get_help_path(MANIFEST_NAME), manifest.help_data)):
+                    archive.writestr(arcname, json.dumps(data))
+                    names.append(arcname)
+        mode = os.stat(tmp_output).st_mode
+        os.chmod(tmp_output, mode | stat.S_IXUSR | stat.S_IXGRP |
+            stat.S_IXOTH)
+        os.rename(tmp_output, output)
+    finally:
+        if os.path.exists(tmp_output):
+            os.unlink(tmp_output)
+        shutil.rmtree(tmpdir)
+    return names
+
+
+class BundleCommand(BaseCommand):
+    """
+    Builds single file bundle of the application (see
+    :mod:`monolith.cli.bundle`).
+
+    **Extra attributes**:
+
+    - ``entry_point``: ``module:callable`` returning manager instance when
+      called without arguments. Defaults to ``None``, in which case the
+      manager's class is used (it must accept no arguments then).
+    - ``packages``: Names of extra packages (i.e. dependencies) bundled
+      together with the application. Defaults to empty list.
+    """
+    help = 'Builds single file executable bundle of this program.'
+    args = [
+        arg('-o', '--output', metavar='FILE',
+            help='Path of the bundle (defaults to PROG.pyz).'),
+        arg('--entry-point', metavar='MODULE:CALLABLE',
+            help='Callable returning the manager.'),
+        arg('--package', dest='packages', action='append', default=[],
+            metavar='NAME', help='Extra package to bundle (may be repeated).'),
+        arg('--python', metavar='INTERPRETER',
+            help='Interpreter put at the shebang line.'),
+        arg('--compress', action='store_true', default=False,
+            help='Compress archive members.'),
+    ]
+    entry_point = None
+    packages = []
+
+    def handle(self, namespace):
+        output = namespace.output or '%s.pyz' % self.prog_name
+        try:
+            names = build_bundle(self.manager, output,
+                namespace.entry_point or self.entry_point,
+                list(self.packages) + namespace.packages, namespace.python,
+                namespace.compress)
+        except (ValueError, ImportError) as err:
+            raise CommandError(str(err))
+        self.stdout.write(u'Bundled %d files into %s\n' % (len(names),
+            output))
@@ -0,0 +1,274 @@
+"""
+Caching of results of idempotent commands. Output (written to command's
+``stdout``) and exit status of a *cacheable* command are stored at an on-disk
+cache, keyed by the program, command class, parsed arguments and working
+directory. Repeated runs within command's *cache_ttl* replay stored output
+instead of running the command.
+
+Cache holds at most *result_cache_size* entries (see
+:class:`monolith.cli.ExecutionManager`); least recently used entries are
+evicted first. Numbers of hits, misses and evictions are kept together with
+entries (see :class:`CacheCommand`).
+"""
+import os
+import json
+import time
+import hashlib
+import contextlib
+
+from monolith.compat import unicode
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import arg
+from monolith.cli.exceptions import CommandError
+from monolith.utils.files import get_cache_path
+from monolith.utils.files import write_json
+
+
+STATS_FILENAME = 'stats.json'
+STATS_KEYS = ('hits', 'misses', 'evictions', 'expired')
+
+
+def cacheable(Command=None, ttl=None):
+    """
+    Class decorator marking given ``Command`` as *cacheable*, optionally
+    setting its *cache_ttl*::
+
+        @cacheable(ttl=60)
+        class InventoryCommand(BaseCommand):
+            ...
+    """
+    def decorator(Command):
+        Command.cacheable = True
+        if ttl is not None:
+            Command.cache_ttl = ttl
+        return Command
+
+    if Command is None:
+        return decorator
+    return decorator(Command)
+
+
+def get_cache_key(manager, command, namespace):
+    """
+    Returns key of the result of ``command`` run with parsed ``namespace``.
+    """
+    values = dict((key, value) for key, value in vars(namespace).items() if
+        key not in ('func', 'no_cache'))
+    data = json.dumps([
+        manager.prog_name,
+        '%s.%s' % (command.__class__.__module__, command.__class__.__name__),
+        os.getcwd(),
+        values,
+    ], sort_keys=True, default=repr)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def get_result_cache(manager):
+    """
+    Returns :class:`ResultCache` configured by *result_cache_path* and
+    *result_cache_size* of the given ``manager``.
+    """
+    path = manager.result_cache_path
+    if not path:
+        path = get_cache_path('results-%s' % manager.prog_name)
+    return ResultCache(path, manager.result_cache_size)
+
+
+class ResultCache(object):
+    """
+    Directory of cached results, one JSON file per entry. Modification time
+    of an entry file is its last use.
+    """
+
+    def __init__(self, path, max_entries=256):
+        self.path = path
+        self.max_entries = max_entries
+
+    def get_entry_path(self, key):
+        return os.path.join(self.path, '%s.json' % key)
+
+    def get_entry_paths(self):
+        try:
+            filenames = os.listdir(self.path)
+        except OSError:
+            return []
+        return [os.path.join(self.path, filename) for filename in filenames
+            if filename.endswith('.json') and filename != STATS_FILENAME]
+
+    def get(self, key, ttl=None):
+        """
+        Returns entry stored as ``key`` (dictionary with ``stdout``,
+        ``status`` and ``message``) or ``None`` if there is no such entry or
+        it's older than ``ttl`` seconds. Records a hit or a miss.
+        """
+        path = self.get_entry_path(key)
+        try:
+            with open(path) as fin:
+                entry = json.load(fin)
+        except (IOError, OSError, ValueError):
+            self.update_stats(misses=1)
+            return None
+        if ttl is not None and time.time() - entry['created'] > ttl:
+            self.remove(path)
+            self.update_stats(misses=1, expired=1)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.update_stats(hits=1)
+        return entry
+
+    def set(self, key, stdout, status=0, message=None):
+        """
+        Stores entry as ``key`` and evicts least recently used entries
+        exceeding *max_entries*.
+        """
+        write_json(self.get_entry_path(key), {
+            'created': time.time(),
+            'stdout': stdout,
+            'status': status,
+            'message': message,
+        })
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries so at most *max_entries* are
+        left. Returns number of removed entries.
+        """
+        paths = self.get_entry_paths()
+        if len(paths) <= self.max_entries:
+            return 0
+        used = []
+        for path in paths:
+            try:
+                used.append((os.stat(path).st_mtime, path))
+            except OSError:
+                pass
+        used.sort()
+        evicted = 0
+        for mtime, path in used[:len(used) - self.max_entries]:
+            if self.remove(path):
+                evicted += 1
+        self.update_stats(evictions=evicted)
+        return evicted
+
+    def remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return False
+        return True
+
+    def clear(self):
+        """
+        Removes all entries and statistics.
+        """
+        for path in self.get_entry_paths():
+            self.remove(path)
+        self.remove(os.path.join(self.path, STATS_FILENAME))
+
+    def get_stats(self):
+        """
+        Returns dictionary with numbers of ``hits``, ``misses``,
+        ``evictions``, ``expired`` entries and stored ``entries``.
+        """
+        try:
+            with open(os.path.join(self.path, STATS_FILENAME)) as fin:
+                stats = json.load(fin)
+        except (IOError, OSError, ValueError):
+            stats = {}
+        stats = dict((key, stats.get(key, 0)) for key in STATS_KEYS)
+        stats['entries'] = len(self.get_entry_paths())
+        return stats
+
+    def update_stats(self, **counts):
+        stats = self.get_stats()
+        for key, count in counts.items():
+            stats[key] += count
+        del stats['entries']
+        try:
+            write_json(os.path.join(self.path, STATS_FILENAME), stats)
+        except (IOError, OSError):
+            pass
+
+
+class CapturedOutput(object):
+    """
+    Writes to the given ``stream`` and keeps copy of everything written.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return self.stream.write(data)
+
+    def getvalue(self):
+        return ''.join(unicode(chunk) for chunk in self.chunks)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def cached_result(manager, command, namespace):
+    """
+    Returns context manager wrapping a run of ``command`` with ``namespace``
+    (see :meth:`monolith.cli.ExecutionManager.handling`). If the result is
+    cached, stored output is written, stored
+    :class:`monolith.cli.CommandError` is raised again and ``True`` is
+    yielded - command must not be run then. Otherwise, ``False`` is yielded
+    and output written by the command within the context is stored.
+    """
+    cache = get_result_cache(manager)
+    key = get_cache_key(manager, command, namespace)
+    entry = cache.get(key, command.cache_ttl)
+    if entry is not None:
+        command.stdout.write(unicode(entry['stdout']))
+        if entry['status']:
+            raise CommandError(entry['message'], entry['status'])
+        yield True
+        return
+    stdout = command.stdout
+    command.stdout = CapturedOutput(stdout)
+    try:
+        yield False
+    except CommandError as err:
+        store(cache, key, command.stdout.getvalue(), err.code, err.message)
+        raise
+    else:
+        store(cache, key, command.stdout.getvalue())
+    finally:
+        command.stdout = stdout
+
+
+def store(cache, key, stdout, status=0, message=None):
+    try:
+        cache.set(key, stdout, status, message)
+    except (IOError, OSError):
+        pass
+
+
+class CacheCommand(BaseCommand):
+    """
+    Prints statistics of the result cache (see :mod:`monolith.cli.caching`)
+    or clears it.
+    """
+    help = 'Prints statistics of the result cache.'
+    args = [
+        arg('--clear', action='store_true', default=False,
+            help='Remove all cached results.'),
+    ]
+
+    def handle(self, namespace):
+        cache = get_result_cache(self.manager)
+        if namespace.clear:
+            cache.clear()
+            return
+        stats = cache.get_stats()
+        for key in ('entries',) + STATS_KEYS:
+            self.stdout.write(unicode('%s: %d\n' % (key, stats[key])))
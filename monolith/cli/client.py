@@ -0,0 +1,173 @@
+"""
+Thin client of the command server (see :mod:`monolith.cli.server`). It uses
+the standard library only and can be run as::
+
+    $ python -m monolith.cli.client SOCKET [ARG ...]
+
+Protocol: client connects to the server's Unix domain socket and sends a
+single byte together with file descriptors of its standard input, output and
+error (``SCM_RIGHTS``), followed by a JSON request line with ``argv``
+(arguments without program name), ``cwd`` and ``env``. Process running the
+command replies with its pid and, once the command finishes, with the exit
+status (each in a separate line). If server closes the connection without
+a reply, client should run the program itself.
+
+Client talks only to sockets owned by the current user, placed at directories
+other users cannot write to (see :func:`is_trusted_socket`), and served by a
+process of the current user (if peer credentials are available).
+"""
+import os
+import sys
+import json
+import stat
+import array
+import errno
+import signal
+import socket
+import struct
+import tempfile
+
+
+def get_socket_directory():
+    """
+    Returns per-user directory of server sockets:
+    ``monolith-<uid>`` at ``XDG_RUNTIME_DIR`` (if set) or at temporary
+    directory. Directory is created by servers, see
+    :func:`make_socket_directory`.
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, 'monolith-%d' % os.getuid())
+
+
+def get_socket_path(prog_name):
+    """
+    Returns default path of the command server socket for the given
+    ``prog_name`` (at :func:`get_socket_directory`).
+    """
+    return os.path.join(get_socket_directory(), '%s-server.sock' % prog_name)
+
+
+def is_safe_directory(path):
+    """
+    Returns ``True`` if directory at ``path`` is owned by the current user (or
+    by root) and other users cannot replace files placed there - it's not
+    writable by group or others, or it has sticky bit set.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid not in (os.getuid(), 0):
+        return False
+    return not st.st_mode & 0o022 or bool(st.st_mode & stat.S_ISVTX)
+
+
+def is_trusted_socket(path):
+    """
+    Returns ``True`` if ``path`` is a socket owned by the current user placed
+    at a safe directory (see :func:`is_safe_directory`).
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid() and \
+        is_safe_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def make_socket_directory(path):
+    """
+    Creates directory at ``path`` (accessible by the owner only) unless it
+    exists. Raises ``OSError`` if directory is not safe (see
+    :func:`is_safe_directory`).
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+    if not is_safe_directory(path):
+        raise OSError(errno.EPERM, 'Socket directory is not private', path)
+
+
+def get_peer_uid(sock):
+    """
+    Returns user id of the process at the other end of connected Unix socket
+    ``sock`` or ``None`` if it cannot be checked at this platform.
+    """
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+        struct.calcsize('3i'))
+    pid, uid, gid = struct.unpack('3i', creds)
+    return uid
+
+
+def send_request(sock, argv, fds=(0, 1, 2)):
+    """
+    Sends request to run ``argv`` at current working directory and
+    environment, passing given ``fds`` as command's standard streams.
+    """
+    request = json.dumps({
+        'argv': list(argv),
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+    }).encode('utf-8') + b'\n'
+    sock.sendmsg([b'\0'], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+        array.array('i', fds))])
+    sock.sendall(request)
+
+
+def run_client(path, argv, fallback=None, fds=(0, 1, 2)):
+    """
+    Runs ``argv`` at the command server listening at ``path`` and returns
+    exit status of the command. Keyboard interrupt is passed to the process
+    running the command. Nothing is sent unless the socket and the server
+    belong to the current user.
+
+    :param fallback: program (list of arguments) executed with ``argv`` if
+      server is not available. If not given, error is reported instead.
+    :param fds: file descriptors passed as standard input, output and error
+      of the command.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            if not is_trusted_socket(path):
+                raise socket.error(errno.EPERM, 'Untrusted socket')
+            sock.connect(path)
+            if get_peer_uid(sock) not in (None, os.getuid()):
+                raise socket.error(errno.EPERM, 'Untrusted server')
+            send_request(sock, argv, fds)
+            stream = sock.makefile('rb')
+            line = stream.readline()
+        except socket.error:
+            line = b''
+        if not line:
+            if fallback:
+                sock.close()
+                os.execvp(fallback[0], list(fallback) + list(argv))
+            sys.stderr.write('Command server is not available at %s\n' %
+                path)
+            return 1
+        pid = int(line)
+        while True:
+            try:
+                line = stream.readline()
+                break
+            except KeyboardInterrupt:
+                os.kill(pid, signal.SIGINT)
+        return int(line) if line.strip() else 1
+    finally:
+        sock.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.stderr.write('usage: %s SOCKET [ARG ...]\n' % sys.argv[0])
+        sys.exit(2)
+    sys.exit(run_client(sys.argv[1], sys.argv[2:]))
+
+
+if __name__ == '__main__':
+    main()
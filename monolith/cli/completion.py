@@ -1,3 +1,10 @@
+import os
+
+try:
+    from shlex import quote as shell_quote
+except ImportError:
+    from pipes import quote as shell_quote
+
 from monolith.compat import unicode
 from monolith.cli.base import BaseCommand
 
@@ -15,18 +22,147 @@ complete -o default -F _%(prog_name)s_completion %(prog_name)s
 
 '''
 
+DAEMON_COMPLETION_TEMPLATE = '''
+# %(prog_name)s bash completion start
+_%(prog_name)s_completion()
+{
+    local reply word
+    if [ -S %(SOCKET_PATH)s ] && [ -O %(SOCKET_PATH)s ] \\
+            && [ -O %(SOCKET_DIR)s ]; then
+        reply=$( printf '%%s\\n%%s\\n' "$COMP_CWORD" "${COMP_WORDS[*]}" | \\
+                 nc -U %(SOCKET_PATH)s 2>/dev/null )
+        case "$reply" in
+            OK*)
+                COMPREPLY=()
+                while IFS= read -r word; do
+                    [ -n "$word" ] && COMPREPLY+=( "$word" )
+                done <<< "${reply#OK}"
+                return ;;
+        esac
+    fi
+    COMPREPLY=( $( COMP_WORDS="${COMP_WORDS[*]}" \\
+                   COMP_CWORD=$COMP_CWORD \\
+                   %(ENV_VAR_NAME)s=1 $1 ) )
+}
+complete -o default -F _%(prog_name)s_completion %(prog_name)s
+# %(prog_name)s bash completion end
+'''
+
+
+def get_completion_table(args):
+    """
+    Compiles given argument specs (see
+    :func:`monolith.cli.manifest.get_action_spec`) of a single command into
+    completion table - JSON serializable dictionary with following keys:
+
+    - ``options``: sorted option strings,
+    - ``values``: option strings of options which take a value,
+    - ``choices``: maps option strings to lists of their choices,
+    - ``positionals``: list of ``[nargs, choices]`` of positional arguments.
+    """
+    options = []
+    values = []
+    choices = {}
+    positionals = []
+    for spec in args:
+        if spec['option_strings']:
+            options.extend(spec['option_strings'])
+            if spec['nargs'] != 0:
+                values.extend(spec['option_strings'])
+            if spec['choices']:
+                for option_string in spec['option_strings']:
+                    choices[option_string] = spec['choices']
+        else:
+            positionals.append([spec['nargs'], spec['choices'] or []])
+    return {
+        'options': sorted(options),
+        'values': sorted(values),
+        'choices': choices,
+        'positionals': positionals,
+    }
+
+
+def complete_arguments(table, words, current):
+    """
+    Returns completion words for arguments of a single command.
+
+    :param table: completion table of the command (see
+      :func:`get_completion_table`).
+    :param words: words given after the command name, up to (but without)
+      the completed word.
+    :param current: completed word (may be empty).
+    """
+    if words and words[-1] in table['values']:
+        candidates = table['choices'].get(words[-1], [])
+    elif current.startswith('-'):
+        candidates = table['options']
+    else:
+        candidates = get_positional_choices(table, words)
+    return [unicode(candidate) for candidate in candidates if
+        unicode(candidate).startswith(current)]
+
+
+def get_positional_choices(table, words):
+    """
+    Returns choices of the positional argument which would consume next word
+    after given ``words``.
+    """
+    index = 0
+    expect_value = False
+    for word in words:
+        if expect_value:
+            expect_value = False
+        elif word.startswith('-'):
+            expect_value = word in table['values']
+        else:
+            index += 1
+    for nargs, choices in table['positionals']:
+        if nargs in ('*', '+', '...', 'A...'):
+            return choices
+        count = 1 if nargs in (None, '?') else nargs
+        if index < count:
+            return choices
+        index -= count
+    return []
+
 
 class CompletionCommand(BaseCommand):
+    """
+    Prints out shell completion snippet and enables completion at the manager.
+
+    **Extra attributes**:
+
+    - ``daemon``: If ``True``, completion requests are answered by a
+      background completion server (see
+      :mod:`monolith.cli.completion_server`) started on first use. Shell
+      snippet falls back to running the program if server is not available.
+      Defaults to ``False``.
+    - ``idle_timeout``: Number of seconds after which idle completion server
+      shuts down. Defaults to ``600``.
+    """
     help = ''.join((
         'Prints out shell snippet that once evaluated would allow '
         'this command utility to use completion abilities.',
     ))
     template = COMPLETION_TEMPLATE
+    daemon_template = DAEMON_COMPLETION_TEMPLATE
+    daemon = False
+    idle_timeout = 600
 
     def get_env_var_name(self):
         return '_'.join((self.prog_name.upper(), 'AUTO_COMPLETE'))
 
+    def get_socket_path(self):
+        from monolith.cli.completion_server import get_socket_path
+        return get_socket_path(self.prog_name)
+
     def get_completion_snippet(self):
+        if self.daemon:
+            path = self.get_socket_path()
+            return self.daemon_template % {'prog_name': self.prog_name,
+                'ENV_VAR_NAME': self.get_env_var_name(),
+                'SOCKET_PATH': shell_quote(path),
+                'SOCKET_DIR': shell_quote(os.path.dirname(path))}
         return self.template % {'prog_name': self.prog_name,
             'ENV_VAR_NAME': self.get_env_var_name()}
 
@@ -36,4 +172,7 @@ class CompletionCommand(BaseCommand):
     def post_register(self, manager):
         manager.completion = True
         manager.completion_env_var_name = self.get_env_var_name()
+        if self.daemon:
+            manager.completion_server_path = self.get_socket_path()
+            manager.completion_server_idle_timeout = self.idle_timeout
 
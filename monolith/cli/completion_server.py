@@ -0,0 +1,179 @@
+"""
+Completion server keeps :class:`ExecutionManager` loaded and answers
+completion requests over a Unix domain socket, so shell doesn't need to start
+the whole program on every TAB press.
+
+Protocol is line based: client sends ``COMP_CWORD`` and ``COMP_WORDS`` (each
+in a separate line) and server replies with ``OK`` followed by completion
+words, each in a separate line. If server replies with anything else (or not
+at all), client should fall back to running the program.
+"""
+import os
+import sys
+import errno
+import socket
+
+from monolith.compat import unicode
+from monolith.cli.client import get_socket_directory
+from monolith.cli.client import is_trusted_socket
+from monolith.cli.client import make_socket_directory
+from monolith.cli.manifest import get_source_stamps
+from monolith.utils.files import get_file_stamp
+
+
+def get_socket_path(prog_name):
+    """
+    Returns path of the completion server socket for the given
+    ``prog_name``, placed at the per-user socket directory (see
+    :func:`monolith.cli.client.get_socket_directory`).
+    """
+    return os.path.join(get_socket_directory(), '%s-completion.sock' %
+        prog_name)
+
+
+def is_server_running(path):
+    """
+    Returns ``True`` if completion server accepts connections at the given
+    ``path``.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except socket.error:
+        return False
+    finally:
+        client.close()
+    return True
+
+
+class CompletionServer(object):
+    """
+    Serves completion requests of the given ``manager`` at socket ``path``.
+
+    Server stops once no request came in for ``idle_timeout`` seconds or once
+    source files of the manager or of its commands have changed (so that next
+    request starts fresh server).
+    """
+
+    def __init__(self, manager, path, idle_timeout=600):
+        self.manager = manager
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.stamps = {}
+        self.socket = None
+
+    def bind(self):
+        """
+        Binds server socket (accessible by the owner only). Returns ``False``
+        if another server is already running. Directory of the socket is
+        created if needed; ``OSError`` is raised if it's not private (see
+        :func:`monolith.cli.client.make_socket_directory`) or if existing
+        socket belongs to another user.
+        """
+        make_socket_directory(os.path.dirname(os.path.abspath(self.path)))
+        if os.path.lexists(self.path):
+            if not is_trusted_socket(self.path):
+                raise OSError(errno.EPERM, 'Socket is owned by another user',
+                    self.path)
+            if is_server_running(self.path):
+                return False
+            os.unlink(self.path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self.socket.bind(self.path)
+        except socket.error as err:
+            if err.errno == errno.EADDRINUSE:
+                return False
+            raise
+        finally:
+            os.umask(umask)
+        self.socket.listen(5)
+        self.socket.settimeout(self.idle_timeout)
+        self.stamps = get_source_stamps(self.manager)
+        return True
+
+    def close(self):
+        self.socket.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def is_stale(self):
+        """
+        Returns ``True`` if any known source file has changed.
+        """
+        for path, stamp in self.stamps.items():
+            if get_file_stamp(path) != stamp:
+                return True
+        return False
+
+    def serve_forever(self):
+        """
+        Handles requests until server is idle for too long or is stale.
+        """
+        try:
+            while True:
+                try:
+                    conn, address = self.socket.accept()
+                except socket.timeout:
+                    break
+                try:
+                    if self.is_stale():
+                        break
+                    self.handle(conn)
+                finally:
+                    conn.close()
+                for path, stamp in get_source_stamps(self.manager).items():
+                    self.stamps.setdefault(path, stamp)
+        finally:
+            self.close()
+
+    def handle(self, conn):
+        conn.settimeout(5)
+        stream = conn.makefile('rb')
+        try:
+            cword = int(stream.readline().strip() or 0)
+            cwords = stream.readline().decode('utf-8').split()[1:]
+        finally:
+            stream.close()
+        words = self.manager.get_completions(cwords, cword)
+        reply = unicode('\n'.join(['OK'] + [word for word in words if
+            '\n' not in word]))
+        conn.sendall(reply.encode('utf-8'))
+
+
+def spawn_completion_server(manager, path, idle_timeout=600):
+    """
+    Starts completion server for the given ``manager`` in a background (fully
+    detached) process, unless one is already running at ``path``. Server
+    rebuilds missing or stale commands manifest (see
+    :meth:`monolith.cli.ExecutionManager.get_manifest`) first.
+    """
+    if not hasattr(socket, 'AF_UNIX') or is_server_running(path):
+        return
+    for stream in (sys.stdout, sys.stderr, manager.stdout):
+        stream.flush()
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+    try:
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        server = CompletionServer(manager, path, idle_timeout)
+        if server.bind():
+            # stale commands manifest is rebuilt here, in the background,
+            # rather than on TAB press
+            try:
+                manager.get_manifest(update=True)
+            except Exception:
+                pass
+            server.serve_forever()
+    finally:
+        os._exit(0)
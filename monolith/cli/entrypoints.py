@@ -0,0 +1,200 @@
+"""
+Discovery of commands published by installed distributions as entry points.
+Scanning distribution metadata is slow at large environments, so results are
+cached in a file invalidated whenever any ``sys.path`` entry (i.e.
+``site-packages`` directory) changes.
+"""
+import os
+import re
+import sys
+import json
+
+from monolith.cli.base import ExecutionManager
+from monolith.cli.base import LazyCommand
+from monolith.utils.files import get_cache_path
+from monolith.utils.files import write_json
+
+
+ENTRY_POINTS_CACHE_VERSION = 1
+
+ENTRY_POINT_PATTERN = re.compile(r'(?P<module>[\w.]+)\s*:\s*(?P<attr>[\w.]+)'
+    r'\s*(\[.*\])?\s*$')
+
+
+def get_entry_point_class_path(value):
+    """
+    Returns class path (see :func:`monolith.utils.imports.import_class`) for
+    entry point ``value`` given in ``module:Class`` format, optionally with
+    nested attributes (``module:Outer.Class``) and extras (``module:Class
+    [extra]``, which are dropped). Values in other formats are returned as
+    given, failing only once the command is imported.
+    """
+    match = ENTRY_POINT_PATTERN.match(value.strip())
+    if match is None:
+        return value
+    module, attr = match.group('module', 'attr')
+    if '.' in attr:
+        return '%s:%s' % (module, attr)
+    return '%s.%s' % (module, attr)
+
+
+def scan_entry_points(group):
+    """
+    Returns dictionary mapping names of entry points from given ``group`` of
+    all installed distributions to their values (``module:Class``). If the same
+    name is published more than once, the first entry point found at
+    ``sys.path`` wins.
+    """
+    entries = {}
+    try:
+        from importlib import metadata
+    except ImportError:
+        import pkg_resources
+        for entry_point in pkg_resources.iter_entry_points(group):
+            value = '%s:%s' % (entry_point.module_name,
+                '.'.join(entry_point.attrs))
+            entries.setdefault(entry_point.name, value)
+        return entries
+    all_entry_points = metadata.entry_points()
+    if hasattr(all_entry_points, 'select'):
+        selected = all_entry_points.select(group=group)
+    else:
+        selected = all_entry_points.get(group, [])
+    for entry_point in selected:
+        entries.setdefault(entry_point.name, entry_point.value)
+    return entries
+
+
+def get_path_stamps(paths=None):
+    """
+    Returns list of ``[path, mtime]`` pairs for given ``paths`` (defaults to
+    ``sys.path``). Installing or removing a distribution changes mtime of the
+    directory it is installed at.
+    """
+    if paths is None:
+        paths = sys.path
+    stamps = []
+    for path in paths:
+        try:
+            mtime = os.stat(path or os.curdir).st_mtime
+        except OSError:
+            mtime = None
+        stamps.append([path, mtime])
+    return stamps
+
+
+class EntryPointsCache(object):
+    """
+    Cached result of :func:`scan_entry_points` stored at ``path``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, group, stamps):
+        """
+        Returns cached entries of the given ``group`` or ``None`` if cache is
+        missing or was created for different ``stamps``.
+        """
+        try:
+            with open(self.path) as fin:
+                data = json.load(fin)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != \
+                ENTRY_POINTS_CACHE_VERSION:
+            return None
+        if data.get('group') != group or data.get('stamps') != stamps:
+            return None
+        return data.get('entries')
+
+    def save(self, group, stamps, entries):
+        """
+        Atomically writes ``entries`` of the given ``group`` to the cache file.
+        """
+        write_json(self.path, {
+            'version': ENTRY_POINTS_CACHE_VERSION,
+            'group': group,
+            'stamps': stamps,
+            'entries': entries,
+        })
+
+
+class EntryPointExecutionManager(ExecutionManager):
+    """
+    Execution manager registering commands published by installed
+    distributions as entry points of *entry_point_group*, i.e.::
+
+        setup(
+            ...
+            entry_points={
+                'mytool.commands': [
+                    'sync = mypackage.commands:SyncCommand',
+                ],
+            },
+        )
+
+    Commands are registered lazily (see :class:`monolith.cli.LazyCommand`) so
+    command classes are imported only once they are run.
+
+    **Attributes**
+
+    - ``entry_point_group``: Name of the entry point group. Defaults to
+      ``None``, in which case it's ``<prog>.commands``.
+    - ``entry_point_cache_path``: Path of the file caching scan results.
+      Defaults to ``None``, in which case file is stored at
+      ``$XDG_CACHE_HOME/monolith`` (``~/.cache/monolith``). If set to
+      ``False``, results are not cached.
+    """
+    entry_point_group = None
+    entry_point_cache_path = None
+
+    def get_entry_point_group(self):
+        """
+        Returns name of the entry point group commands are discovered at.
+        """
+        return self.entry_point_group or '%s.commands' % self.prog_name
+
+    def get_entry_point_cache_path(self):
+        """
+        Returns path of the file caching scan results or ``None`` if caching
+        is disabled.
+        """
+        if self.entry_point_cache_path is False:
+            return None
+        if self.entry_point_cache_path:
+            return self.entry_point_cache_path
+        return get_cache_path('entry-points-%s.json' %
+            self.get_entry_point_group())
+
+    def get_entry_points(self):
+        """
+        Returns dictionary mapping command names to entry point values, taken
+        from cache if it's fresh or scanned (and cached) otherwise.
+        """
+        group = self.get_entry_point_group()
+        path = self.get_entry_point_cache_path()
+        if path is None:
+            return scan_entry_points(group)
+        cache = EntryPointsCache(path)
+        stamps = get_path_stamps()
+        entries = cache.load(group, stamps)
+        if entries is None:
+            entries = scan_entry_points(group)
+            try:
+                cache.save(group, stamps, entries)
+            except (IOError, OSError):
+                pass
+        return entries
+
+    def get_commands_to_register(self):
+        """
+        Returns commands discovered at entry points (as
+        :class:`monolith.cli.LazyCommand` instances), together with commands
+        returned by the base class.
+        """
+        commands = dict((name, LazyCommand(get_entry_point_class_path(
+            value))) for name, value in self.get_entry_points().items())
+        commands.update(super(EntryPointExecutionManager,
+            self).get_commands_to_register())
+        return commands
@@ -0,0 +1,325 @@
+"""
+Fast path parser. :class:`FastParser` compiles arguments of a parser into
+lookup tables (option strings come from argparse's own hash map, positionals
+are described by minimal and maximal number of strings they consume) and
+parses argument strings in a single linear pass, without building and matching
+regular expressions.
+
+Only the well defined subset of argparse's behaviour is handled by the fast
+path. Whenever anything else is met - either at parser's definition
+(mutually exclusive groups, ``fromfile_prefix_chars``, ``REMAINDER`` etc.)
+or at parsed strings (``--``, abbreviated or unknown options, combined short
+flags, missing arguments) - parsing is delegated to argparse before any action
+is taken, so results (including error messages) are always the same.
+"""
+import bisect
+import argparse
+
+from monolith.compat import basestring
+from monolith.cli.base import Parser
+
+
+class Unsupported(Exception):
+    """
+    Raised when arguments cannot be handled by the fast path.
+    """
+
+
+def get_nargs_range(nargs):
+    """
+    Returns ``(minimum, maximum)`` number of strings consumed by an action
+    with given ``nargs`` (``maximum`` is ``None`` if unlimited).
+
+    :raises Unsupported: for ``nargs`` not handled by the fast path.
+    """
+    if nargs is None:
+        return 1, 1
+    elif nargs == argparse.OPTIONAL:
+        return 0, 1
+    elif nargs == argparse.ZERO_OR_MORE:
+        return 0, None
+    elif nargs == argparse.ONE_OR_MORE:
+        return 1, None
+    elif isinstance(nargs, int) and nargs >= 0:
+        return nargs, nargs
+    raise Unsupported(nargs)
+
+
+class CompiledArguments(object):
+    """
+    Lookup tables of a parser's arguments.
+
+    **Attributes**
+
+    - ``actions``: Tuple of actions the tables were compiled from.
+    - ``options``: Dictionary mapping option strings to actions.
+    - ``ranges``: Dictionary mapping option actions to ``(minimum,
+      maximum)`` number of consumed strings.
+    - ``positionals``: List of ``(action, minimum, maximum)`` tuples.
+    - ``parser_action``: Subparsers action if it's the only positional,
+      otherwise ``None``.
+    """
+
+    def __init__(self, parser):
+        if parser.fromfile_prefix_chars is not None:
+            raise Unsupported('fromfile_prefix_chars')
+        if parser.prefix_chars != '-':
+            raise Unsupported('prefix_chars')
+        if parser._mutually_exclusive_groups:
+            raise Unsupported('mutually exclusive groups')
+        if parser._has_negative_number_optionals:
+            raise Unsupported('negative number like options')
+        self.actions = tuple(parser._actions)
+        self.options = parser._option_string_actions
+        self.negative_number_matcher = parser._negative_number_matcher
+        self.ranges = {}
+        self.positionals = []
+        self.parser_action = None
+        for action in self.actions:
+            if getattr(action, 'deprecated', False):
+                raise Unsupported('deprecated')
+            if action.option_strings:
+                self.ranges[action] = get_nargs_range(action.nargs)
+            elif action.nargs == argparse.PARSER:
+                self.parser_action = action
+            else:
+                minimum, maximum = get_nargs_range(action.nargs)
+                if maximum == 0:
+                    raise Unsupported('positional without strings')
+                self.positionals.append((action, minimum, maximum))
+        if self.parser_action is not None and self.positionals:
+            raise Unsupported('positionals next to subparsers')
+
+    def classify(self, arg_strings):
+        """
+        Returns dictionary mapping indexes of option strings at given
+        ``arg_strings`` to ``(action, option_string, explicit_arg)`` tuples.
+        Action is ``None`` for unknown options (which are fine as long as
+        they are passed to a subparser).
+        """
+        options = {}
+        dashed = [index for index, arg_string in enumerate(arg_strings) if
+            arg_string[:1] == '-' and arg_string != '-']
+        for index in dashed:
+            arg_string = arg_strings[index]
+            action = self.options.get(arg_string)
+            if action is not None:
+                options[index] = (action, arg_string, None)
+                continue
+            if arg_string == '--':
+                raise Unsupported(arg_string)
+            if arg_string.startswith('--'):
+                option_string, explicit_arg = (arg_string.split('=', 1) +
+                    [None])[:2]
+                action = self.options.get(option_string)
+                if action is not None:
+                    minimum, maximum = self.ranges[action]
+                    if minimum > 1 or maximum == 0:
+                        raise Unsupported(arg_string)
+                    options[index] = (action, option_string, explicit_arg)
+                    continue
+                prefix = option_string
+            else:
+                prefix = arg_string
+            if self.may_be_abbreviation(arg_string, prefix):
+                raise Unsupported(arg_string)
+            if self.negative_number_matcher.match(arg_string) or \
+                    ' ' in arg_string:
+                continue
+            options[index] = (None, arg_string, None)
+        return options
+
+    def may_be_abbreviation(self, arg_string, prefix):
+        """
+        Returns ``True`` if argparse could take given ``arg_string`` (which
+        option part is ``prefix``) for an abbreviation of (or a short option
+        joined with an argument of) any option.
+        """
+        short = not arg_string.startswith('--') and arg_string[:2]
+        for option_string in self.options:
+            if option_string == short or option_string.startswith(prefix):
+                return True
+        return False
+
+    def plan(self, arg_strings):
+        """
+        Returns ``(steps, extras)`` where steps is a list of ``(action,
+        strings, option_string)`` tuples (in argparse's order) and extras are
+        strings not consumed by any action.
+
+        :raises Unsupported: if fast path cannot tell the result for sure.
+        """
+        options = self.classify(arg_strings)
+        indexes = sorted(options)
+        count = len(arg_strings)
+
+        def get_run(start):
+            # number of consecutive positional strings starting at index
+            position = bisect.bisect_left(indexes, start)
+            if position == len(indexes):
+                return count - start
+            return indexes[position] - start
+
+        def has_positional_strings(start):
+            position = bisect.bisect_left(indexes, start)
+            return count - start > len(indexes) - position
+
+        steps = []
+        extras = []
+        if self.parser_action is not None:
+            positionals = [(self.parser_action, 1, None)]
+        else:
+            positionals = list(self.positionals)
+
+        def consume_positionals(start):
+            counts = self.match_positionals(positionals, get_run(start))
+            if not counts:
+                return start
+            if positionals[len(counts) - 1][0] is self.parser_action:
+                # subparsers action takes all remaining strings
+                counts[-1] = count - start - sum(counts[:-1])
+            if 0 in counts and has_positional_strings(start + sum(counts)):
+                # argparse versions differ at consuming optional positionals
+                # with no strings while more positional strings follow
+                raise Unsupported('empty positional')
+            for (action, minimum, maximum), strings_count in zip(positionals,
+                    counts):
+                steps.append((action, arg_strings[start:start +
+                    strings_count], None))
+                start += strings_count
+            del positionals[:len(counts)]
+            return start
+
+        def consume_optional(start):
+            action, option_string, explicit_arg = options[start]
+            if action is None:
+                raise Unsupported('unknown option %s' % option_string)
+            if explicit_arg is not None:
+                steps.append((action, [explicit_arg], option_string))
+                return start + 1
+            minimum, maximum = self.ranges[action]
+            available = get_run(start + 1)
+            if available < minimum:
+                raise Unsupported('missing arguments')
+            if maximum is None or maximum > available:
+                maximum = available
+            steps.append((action, arg_strings[start + 1:start + 1 + maximum],
+                option_string))
+            return start + 1 + maximum
+
+        start = 0
+        while indexes and start <= indexes[-1]:
+            next_option = indexes[bisect.bisect_left(indexes, start)]
+            if start != next_option:
+                end = consume_positionals(start)
+                if end > start:
+                    start = end
+                    continue
+            if start not in options:
+                extras.extend(arg_strings[start:next_option])
+                start = next_option
+            start = consume_optional(start)
+        stop = consume_positionals(start)
+        extras.extend(arg_strings[stop:])
+
+        seen = set(action for action, strings, option_string in steps)
+        for action in self.actions:
+            if action.required and action not in seen:
+                raise Unsupported('missing required argument')
+        return steps, extras
+
+    def match_positionals(self, positionals, available):
+        """
+        Returns list of numbers of strings consumed by the longest possible
+        prefix of ``positionals`` out of ``available`` consecutive positional
+        strings. Strings are assigned greedily, from left to right (the same
+        way argparse's regular expressions do).
+        """
+        for length in range(len(positionals), 0, -1):
+            selected = positionals[:length]
+            required = sum(minimum for action, minimum, maximum in selected)
+            if required > available:
+                continue
+            counts = []
+            for action, minimum, maximum in selected:
+                required -= minimum
+                strings_count = available - required
+                if maximum is not None:
+                    strings_count = min(maximum, strings_count)
+                counts.append(strings_count)
+                available -= strings_count
+            return counts
+        return []
+
+
+class FastParser(Parser):
+    """
+    Drop-in replacement of :class:`monolith.cli.Parser` (set it as
+    *parser_cls* of the manager) using fast path (see
+    :mod:`monolith.cli.fastparser`) whenever possible. Arguments are compiled
+    when the parser is first used and recompiled if arguments change.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.compiled = None
+        self.compiled_actions = None
+        super(FastParser, self).__init__(*args, **kwargs)
+
+    def get_compiled_arguments(self):
+        """
+        Returns :class:`CompiledArguments` of this parser or ``None`` if they
+        are not supported by fast path.
+        """
+        actions = tuple(self._actions)
+        if actions != self.compiled_actions:
+            try:
+                self.compiled = CompiledArguments(self)
+            except Unsupported:
+                self.compiled = None
+            self.compiled_actions = actions
+        return self.compiled
+
+    def get_values(self, action, strings):
+        """
+        Returns value of ``action`` for given argument ``strings``. Values
+        which argparse would only copy are built directly, others are
+        converted by argparse.
+        """
+        if action.type is None and strings:
+            if action.nargs == argparse.PARSER:
+                self._check_value(action, strings[0])
+                return list(strings)
+            if action.choices is None:
+                if action.nargs in (None, argparse.OPTIONAL):
+                    return strings[0]
+                if action.nargs != 0:
+                    return list(strings)
+        return self._get_values(action, strings)
+
+    def _parse_known_args(self, arg_strings, namespace, *args, **kwargs):
+        compiled = self.get_compiled_arguments()
+        if compiled is None or any(args) or any(kwargs.values()):
+            return super(FastParser, self)._parse_known_args(arg_strings,
+                namespace, *args, **kwargs)
+        try:
+            steps, extras = compiled.plan(arg_strings)
+        except Unsupported:
+            return super(FastParser, self)._parse_known_args(arg_strings,
+                namespace, *args, **kwargs)
+        seen = set()
+        for action, strings, option_string in steps:
+            seen.add(action)
+            values = self.get_values(action, strings)
+            if values is not argparse.SUPPRESS:
+                action(self, namespace, values, option_string)
+        for action in compiled.actions:
+            if action in seen:
+                continue
+            # the same conversion of string defaults argparse does
+            if (action.default is not None and
+                    isinstance(action.default, basestring) and
+                    hasattr(namespace, action.dest) and
+                    action.default is getattr(namespace, action.dest)):
+                setattr(namespace, action.dest,
+                    self._get_value(action, action.default))
+        return namespace, extras
@@ -0,0 +1,287 @@
+"""
+On-disk manifest of commands registered at :class:`ExecutionManager`. It holds
+everything needed to print help or complete command line (names, help texts,
+argument specs and pre-rendered help) so those can be served without importing
+any command module.
+
+Manifest is stored as two files: the manifest itself, holding what completion
+needs (names, short help, completion tables and group flags), and a help file
+next to it (see :func:`get_help_path`) holding argument specs and pre-rendered
+help, which is read only when help is actually printed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from monolith import get_version
+from monolith.compat import basestring
+from monolith.cli.completion import get_completion_table
+from monolith.utils.files import get_file_stamp
+from monolith.utils.files import write_json
+
+
+MANIFEST_VERSION = 3
+
+
+def get_subparsers_action(parser):
+    """
+    Returns subparsers action of the given ``parser`` or ``None`` if it has
+    none.
+    """
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action
+    return None
+
+
+def get_class_path(Command):
+    """
+    Returns dotted path of the given ``Command`` class.
+    """
+    return '.'.join((Command.__module__, Command.__name__))
+
+
+def get_registry_entries(manager):
+    """
+    Returns dictionary mapping names of commands registered at ``manager`` to
+    dotted paths they were registered with. Commands are not imported.
+    """
+    from monolith.cli.base import LazyCommand
+
+    entries = {}
+    for name, command in manager.registry.items():
+        if isinstance(command, LazyCommand):
+            entries[name] = command.class_path
+        else:
+            entries[name] = get_class_path(command.__class__)
+    return entries
+
+
+def get_source_stamps(manager):
+    """
+    Returns dictionary mapping source files of the ``manager`` class and of
+    commands set up at its registry to their stamps (see
+    :func:`monolith.utils.files.get_file_stamp`). Lazy commands which are not set up yet are
+    skipped.
+    """
+    from monolith.cli.base import LazyCommand
+
+    stamps = {}
+    modules = [manager.__class__.__module__] + [
+        command.__class__.__module__ for command in manager.registry.values()
+        if not isinstance(command, LazyCommand)]
+    for module_name in modules:
+        path = getattr(sys.modules.get(module_name), '__file__', None)
+        if path:
+            stamps[path] = get_file_stamp(path)
+    return stamps
+
+
+def get_action_spec(action):
+    """
+    Returns JSON serializable specification of the given argparse ``action``.
+    """
+    choices = action.choices
+    if isinstance(choices, dict):
+        choices = sorted(choices)
+    elif choices is not None:
+        choices = [choice for choice in choices if
+            isinstance(choice, (basestring, int, float))]
+    return {
+        'option_strings': list(action.option_strings),
+        'dest': action.dest,
+        'nargs': action.nargs,
+        'choices': choices,
+        'help': action.help if action.help != argparse.SUPPRESS else None,
+    }
+
+
+def load_archive_member(path):
+    """
+    Returns JSON data of the zip archive member at ``path`` (i.e.
+    ``/usr/bin/tool.pyz/manifest.json``) or ``None`` if there is no such
+    member.
+    """
+    archive = os.path.dirname(path)
+    if not os.path.isfile(archive):
+        return None
+    import zipimport
+    try:
+        return json.loads(zipimport.zipimporter(archive).get_data(
+            path).decode('utf-8'))
+    except (IOError, OSError, ValueError, zipimport.ZipImportError):
+        return None
+
+
+def load_json(path):
+    """
+    Returns JSON data of the file (or zip archive member, see
+    :func:`load_archive_member`) at ``path`` or ``None`` if it's missing or
+    broken.
+    """
+    try:
+        with open(path) as fin:
+            return json.load(fin)
+    except (IOError, OSError, ValueError):
+        return load_archive_member(path)
+
+
+def get_help_path(path):
+    """
+    Returns path of the help file of the manifest at ``path`` (i.e.
+    ``manifest-help.json`` for ``manifest.json``).
+    """
+    root, ext = os.path.splitext(path)
+    return '%s-help%s' % (root, ext)
+
+
+class Manifest(object):
+    """
+    Wraps manifest data loaded from disk or built for a manager. Help data
+    (see :func:`get_help_path`) is given for a built manifest and is loaded
+    from ``path`` on first use otherwise.
+    """
+
+    def __init__(self, data, help_data=None, path=None):
+        self.data = data
+        self.help_data = help_data
+        self.path = path
+        self.command_names = None
+
+    @classmethod
+    def build(cls, manager):
+        """
+        Builds manifest for the given ``manager``. All commands are imported
+        and set up.
+        """
+        from monolith.cli.base import CommandGroup
+
+        entries = get_registry_entries(manager)
+        registered = manager.get_commands()
+        parser = manager.get_parser()
+        subparsers = get_subparsers_action(parser)
+        commands = {}
+        details = {}
+        for name, command in registered.items():
+            cmdparser = subparsers.choices[name]
+            cmdparser.populate()
+            args = [get_action_spec(action) for action in cmdparser._actions]
+            commands[name] = {
+                'help': command.help,
+                'completion': get_completion_table(args),
+                'group': isinstance(command, CommandGroup),
+            }
+            details[name] = {
+                'args': args,
+                'rendered_help': cmdparser.format_help(),
+            }
+        sources = get_source_stamps(manager)
+        built = time.time()
+        return cls({
+            'version': MANIFEST_VERSION,
+            'monolith': get_version(),
+            'built': built,
+            'prog': manager.prog_name,
+            'entries': entries,
+            'sources': sources,
+            'commands': commands,
+        }, {
+            'built': built,
+            'rendered_help': parser.format_help(),
+            'commands': details,
+        })
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads manifest from the given ``path`` (which may also point at a
+        member of a zip archive, see :mod:`monolith.cli.bundle`). Returns
+        ``None`` if file is missing or broken. Help file is not read.
+        """
+        data = load_json(path)
+        if not isinstance(data, dict) or data.get('version') != \
+                MANIFEST_VERSION:
+            return None
+        return cls(data, path=path)
+
+    def save(self, path):
+        """
+        Atomically writes manifest to the given ``path`` and its help data to
+        the help file next to it. Help file is written first, so it's never
+        older than the manifest pointing at it.
+        """
+        write_json(get_help_path(path), self.get_help_data())
+        write_json(path, self.data)
+
+    def is_fresh(self, manager):
+        """
+        Returns ``True`` if this manifest still describes commands registered
+        at the given ``manager`` and none of their source files have changed.
+        Manifest embedded at a bundle is built together with its sources, so
+        only registered commands are compared.
+        """
+        if self.data.get('monolith') != get_version():
+            return False
+        if self.data.get('entries') != get_registry_entries(manager):
+            return False
+        if self.data.get('bundled'):
+            return True
+        if self.data.get('prog') != manager.prog_name:
+            return False
+        for path, stamp in self.data.get('sources', {}).items():
+            if get_file_stamp(path) != stamp:
+                return False
+        return True
+
+    def get_command_names(self):
+        """
+        Returns sorted names of commands.
+        """
+        if self.command_names is None:
+            self.command_names = sorted(self.data['commands'])
+        return self.command_names
+
+    def get_command(self, name):
+        """
+        Returns dictionary with ``help``, ``completion`` and ``group``
+        (``True`` for command groups) of command registered as ``name`` or
+        ``None``.
+        """
+        return self.data['commands'].get(name)
+
+    def get_help_data(self):
+        """
+        Returns help data of this manifest, loading it from the help file if
+        needed, or ``None`` if help file is missing, broken or was written for
+        another build of the manifest.
+        """
+        if self.help_data is None and self.path is not None:
+            data = load_json(get_help_path(self.path))
+            if isinstance(data, dict) and data.get('built') == \
+                    self.data.get('built'):
+                self.help_data = data
+        return self.help_data
+
+    def get_args(self, name):
+        """
+        Returns argument specs (see :func:`get_action_spec`) of command
+        registered as ``name`` or ``None`` if help data is not available.
+        """
+        data = self.get_help_data()
+        if data is None:
+            return None
+        return data['commands'][name]['args']
+
+    def get_help(self, name=None):
+        """
+        Returns pre-rendered help of the main parser or of the command
+        registered as ``name`` or ``None`` if help data is not available.
+        """
+        data = self.get_help_data()
+        if data is None:
+            return None
+        if name is None:
+            return data['rendered_help']
+        return data['commands'][name]['rendered_help']
@@ -0,0 +1,122 @@
+"""
+Buffered output for commands writing many small chunks (i.e. one line per
+label).
+"""
+import io
+import time
+import atexit
+import threading
+
+
+#: Buffered outputs holding data which is not written yet. Outputs are added
+#: on write and removed once flushed, so only outputs with pending data are
+#: kept alive.
+pending_outputs = set()
+
+
+def flush_pending_outputs():
+    """
+    Flushes all buffered outputs holding data which is not written yet.
+    Registered to run at interpreter exit.
+    """
+    for output in list(pending_outputs):
+        output.flush_at_exit()
+
+
+atexit.register(flush_pending_outputs)
+
+
+def is_buffering_supported(stream):
+    """
+    Returns ``True`` if given ``stream`` is backed by a real file descriptor
+    (file, pipe or terminal). In-memory streams (like ``io.StringIO`` used at
+    tests) gain nothing from buffering, so they are written to directly.
+    """
+    try:
+        stream.fileno()
+    except (AttributeError, ValueError, io.UnsupportedOperation):
+        return False
+    return True
+
+
+def is_interactive(stream):
+    """
+    Returns ``True`` if given ``stream`` is connected to a terminal.
+    """
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+class BufferedOutput(object):
+    """
+    File-like object collecting written chunks and writing them to the given
+    ``stream`` in batches - once ``buffer_size`` characters are collected or
+    once ``flush_interval`` seconds passed since last flush. If ``stream`` is a
+    terminal, output is flushed at the end of each line instead. Remaining
+    data is flushed at :meth:`flush` and at interpreter exit (see
+    :func:`flush_pending_outputs`).
+    """
+
+    def __init__(self, stream, buffer_size=64 * 1024, flush_interval=1.0):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.line_buffered = is_interactive(stream)
+        self.chunks = []
+        self.size = 0
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        with self.lock:
+            self.chunks.append(data)
+            self.size += len(data)
+            pending_outputs.add(self)
+            if self.line_buffered:
+                ready = '\n' in data
+            else:
+                ready = self.size >= self.buffer_size or \
+                    time.time() - self.last_flush >= self.flush_interval
+            if ready:
+                self.flush_chunks()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        with self.lock:
+            self.flush_chunks()
+            self.stream.flush()
+
+    def flush_at_exit(self):
+        try:
+            self.flush()
+        except (ValueError, IOError, OSError):
+            # stream might have been closed already
+            pass
+
+    def flush_chunks(self):
+        if self.chunks:
+            self.stream.write(''.join(self.chunks))
+            self.chunks = []
+            self.size = 0
+        pending_outputs.discard(self)
+        self.last_flush = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def get_buffered_output(stream, buffer_size=64 * 1024, flush_interval=1.0):
+    """
+    Returns :class:`BufferedOutput` wrapping given ``stream`` or ``stream``
+    itself if buffering is not supported for it (see
+    :func:`is_buffering_supported`).
+    """
+    if isinstance(stream, BufferedOutput) or \
+            not is_buffering_supported(stream):
+        return stream
+    return BufferedOutput(stream, buffer_size, flush_interval)
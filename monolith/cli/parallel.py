@@ -0,0 +1,121 @@
+"""
+Parallel execution of :class:`monolith.cli.LabelCommand` labels.
+"""
+import io
+import argparse
+import threading
+from collections import deque
+
+from monolith.cli.exceptions import CommandError
+
+
+class ThreadLocalStream(object):
+    """
+    File-like object writing to a stream set for the current thread (see
+    :meth:`redirect`) or to the ``default`` stream.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def redirect(self, stream):
+        """
+        Redirects writes made by the current thread to the given ``stream``
+        (or back to the default one if ``None`` is given).
+        """
+        self.local.stream = stream
+
+    def get_stream(self):
+        return getattr(self.local, 'stream', None) or self.default
+
+    def write(self, data):
+        return self.get_stream().write(data)
+
+    def flush(self):
+        return self.get_stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+
+def run_label_in_thread(command, label, namespace):
+    """
+    Runs ``handle_label`` of the given ``command`` capturing its output.
+    Returns ``(output, error)`` tuple where *error* is ``None`` or
+    ``(message, code)`` tuple of raised :class:`CommandError`.
+    """
+    output = io.StringIO()
+    command.stdout.redirect(output)
+    try:
+        command.handle_label(label, namespace)
+    except CommandError as err:
+        return output.getvalue(), (err.message, err.code)
+    finally:
+        command.stdout.redirect(None)
+    return output.getvalue(), None
+
+
+def run_label_in_process(Command, prog_name, label, namespace):
+    """
+    Instantiates ``Command`` and runs its ``handle_label`` capturing output.
+    Used as a target of a process pool, see :func:`run_label_in_thread`.
+    """
+    output = io.StringIO()
+    command = Command(prog_name, output)
+    try:
+        command.handle_label(label, namespace)
+    except CommandError as err:
+        return output.getvalue(), (err.message, err.code)
+    return output.getvalue(), None
+
+
+def handle_labels_in_parallel(command, labels, namespace, jobs):
+    """
+    Handles ``labels`` with ``jobs`` workers of the pool set at command's
+    *pool* attribute (``'thread'`` or ``'process'``). Output of each label is
+    written to ``command.stdout`` in the order of labels. If handling of any
+    labels failed, :class:`CommandError` (with code of the first failure) is
+    raised once all labels are handled.
+    """
+    from concurrent import futures
+
+    if command.pool == 'process':
+        executor = futures.ProcessPoolExecutor(jobs)
+        # namespace is pickled for each label, so labels themselves (and
+        # options telling where to read them from) are left out
+        kwargs = dict((key, value) for key, value in vars(namespace).items()
+            if key not in ('func', 'pipeline_input', 'labels', 'labels_from',
+            'null'))
+        args = (run_label_in_process, command.__class__, command.prog_name)
+        namespace = argparse.Namespace(**kwargs)
+        stdout = command.stdout
+    else:
+        executor = futures.ThreadPoolExecutor(jobs)
+        args = (run_label_in_thread, command)
+        stdout = command.stdout
+        command.stdout = ThreadLocalStream(stdout)
+    errors = []
+    pending = deque()
+
+    def write_result(label, future):
+        output, error = future.result()
+        stdout.write(output)
+        if error is not None:
+            errors.append((label, error))
+
+    try:
+        with executor:
+            for label in labels:
+                pending.append((label, executor.submit(*(args + (label,
+                    namespace)))))
+                if len(pending) >= jobs * 2:
+                    write_result(*pending.popleft())
+            while pending:
+                write_result(*pending.popleft())
+    finally:
+        command.stdout = stdout
+    if errors:
+        raise CommandError('\n'.join(['%d label(s) failed:' % len(errors)] +
+            ['%s: %s' % (label, error[0]) for label, error in errors]),
+            errors[0][1][1])
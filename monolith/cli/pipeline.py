@@ -0,0 +1,80 @@
+"""
+In-process pipelines of commands. Each stage but the last one produces
+*records* - its ``handle`` is a generator function yielding Python objects -
+which are passed, one at a time, to the next stage without any text round
+trip. Downstream stage reads them from ``namespace.pipeline_input``;
+:class:`monolith.cli.LabelCommand` handles them as its labels (in place of
+``-`` label, which is added if not given).
+
+Records are pulled lazily by the last stage, so at most a few records are held
+in memory at once, no matter how long the stream is.
+"""
+import sys
+
+from monolith.cli.base import LabelCommand
+from monolith.cli.exceptions import CommandError
+
+
+def split_pipeline(args, separator):
+    """
+    Returns list of stages (lists of arguments) of ``args`` separated with
+    ``separator``.
+    """
+    stages = [[]]
+    for value in args:
+        if value == separator:
+            stages.append([])
+        else:
+            stages[-1].append(value)
+    return stages
+
+
+def parse_stage(manager, args, piped):
+    """
+    Returns parsed namespace of the pipeline stage given with ``args``. If
+    stage is ``piped`` (has an upstream stage) and is a label command, ``-``
+    label is added unless given.
+    """
+    args = manager.expand_command_name(args)
+    if piped and args and '-' not in args[1:] and args[0] in \
+            manager.get_command_names():
+        if isinstance(manager.get_command(args[0]), LabelCommand):
+            args = args + ['-']
+    parser = manager.get_cached_parser(args)
+    return manager.parse_args(parser, args)
+
+
+def iter_stage_records(manager, namespace):
+    """
+    Calls handler of the stage stored at ``namespace`` and returns iterator
+    over records it produces.
+    """
+    records = namespace.func(namespace)
+    if records is None or not hasattr(records, '__iter__') or \
+            hasattr(records, '__await__'):
+        raise CommandError('%s command does not produce records' %
+            namespace.func.__self__.__class__.__name__, 2)
+    return iter(records)
+
+
+def run_pipeline(manager, stages):
+    """
+    Runs pipeline of ``stages`` (lists of arguments, each starting with the
+    command name) at the given ``manager``. All stages are parsed before any
+    of them is run. Output of the last stage is handled the same way as of a
+    single command (see :meth:`monolith.cli.ExecutionManager.run_command`).
+    """
+    if not all(stages):
+        manager.get_cached_parser().error('empty pipeline stage')
+    namespaces = [parse_stage(manager, args, index > 0) for index, args in
+        enumerate(stages)]
+    records = None
+    try:
+        for namespace in namespaces[:-1]:
+            namespace.pipeline_input = records
+            records = iter_stage_records(manager, namespace)
+    except CommandError as err:
+        sys.stderr.write('ERROR: %s\n' % err.message)
+        sys.exit(err.code)
+    namespaces[-1].pipeline_input = records
+    manager.run_command(namespaces[-1])
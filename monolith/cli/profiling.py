@@ -0,0 +1,88 @@
+"""
+Profiling of :class:`ExecutionManager` invocations.
+"""
+import sys
+import time
+import cProfile
+
+from monolith.compat import unicode
+
+
+def profile_registration(manager):
+    """
+    Registers commands of the given ``manager`` (see
+    :meth:`monolith.cli.ExecutionManager.register_commands`) under profiler.
+    Returns ``(profiler, seconds)`` tuple, which is picked up by
+    :func:`execute_profiled`, or ``None`` if another profiler is already
+    active (i.e. for sub-managers of command groups created while executing).
+    """
+    if sys.getprofile() is not None:
+        manager.register_commands()
+        return None
+    profiler = cProfile.Profile()
+    start = time.time()
+    try:
+        profiler.enable()
+    except ValueError:
+        # since Python 3.12 profilers are registered with sys.monitoring
+        # (not seen by sys.getprofile) and only one may be active at once
+        manager.register_commands()
+        return None
+    try:
+        manager.register_commands()
+    finally:
+        profiler.disable()
+    return profiler, time.time() - start
+
+
+def execute_profiled(manager, args, path):
+    """
+    Executes command requested with ``args`` at given ``manager`` under
+    profiler. Statistics are written to ``path`` and a report splitting time
+    between the framework (registering commands, if it was profiled - see
+    :func:`profile_registration`, building parser, including lazily imported
+    commands, and parsing) and command's handler is written to
+    ``manager.stderr`` - even if execution ends with ``SystemExit``.
+    """
+    timings = []
+    profiler = cProfile.Profile()
+    if manager.registry_profile is not None:
+        profiler, seconds = manager.registry_profile
+        manager.registry_profile = None
+        timings.append(('registry', seconds))
+
+    def run(phase, func, *args):
+        start = time.time()
+        profiler.enable()
+        try:
+            return func(*args)
+        finally:
+            profiler.disable()
+            timings.append((phase, time.time() - start))
+
+    try:
+        run('manifest', manager.execute_from_manifest, args)
+        parser = run('get_parser', manager.get_cached_parser, args)
+        namespace = run('parse_args', manager.parse_args, parser, args)
+        run('handle', manager.dispatch, namespace)
+    finally:
+        profiler.dump_stats(path)
+        manager.stderr.write(unicode(get_report(timings, path)))
+
+
+def get_report(timings, path):
+    """
+    Returns profiling report for given list of ``(phase, seconds)`` tuples.
+    """
+    framework = [(phase, seconds) for phase, seconds in timings if
+        phase != 'handle']
+    handle = sum(seconds for phase, seconds in timings if phase == 'handle')
+    lines = [
+        'Profile statistics written to %s' % path,
+        'framework: %.3fs (%s)' % (sum(seconds for phase, seconds in
+            framework), ', '.join('%s: %.3fs' % timing for timing in
+            framework)),
+        'handle: %.3fs' % handle,
+        '',
+    ]
+    return '\n'.join(lines)
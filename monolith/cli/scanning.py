@@ -0,0 +1,499 @@
+"""
+Discovery of commands defined at a package by parsing its source files (no
+module is imported). Names, help texts and literal arguments of commands are
+extracted statically, so listing commands, ``<command> --help`` and completion
+don't import command modules either. Parsed files are cached per file (by
+their mtime and size).
+"""
+import os
+import re
+import ast
+import sys
+import json
+
+from monolith.compat import basestring
+from monolith.cli.base import ExecutionManager
+from monolith.cli.base import LazyCommand
+from monolith.cli.base import arg
+from monolith.utils.files import get_cache_path
+from monolith.utils.files import get_file_stamp
+from monolith.utils.files import write_json
+from monolith.utils.imports import get_class
+
+
+SCAN_CACHE_VERSION = 1
+
+# command base classes provided by monolith, recognized by name
+KNOWN_BASES = {
+    'BaseCommand': 'monolith.cli.base.BaseCommand',
+    'LabelCommand': 'monolith.cli.base.LabelCommand',
+    'SingleLabelCommand': 'monolith.cli.base.SingleLabelCommand',
+    'AsyncBaseCommand': 'monolith.cli.aio.AsyncBaseCommand',
+    'AsyncLabelCommand': 'monolith.cli.aio.AsyncLabelCommand',
+}
+
+# literal class attributes extracted from sources
+LITERAL_ATTRIBUTES = ('name', 'help', 'labels_required', 'label_default_value',
+    'parallel', 'jobs', 'streaming_labels')
+
+# attributes passed to stub commands used to build arguments
+STUB_ATTRIBUTES = ('labels_required', 'label_default_value', 'parallel', 'jobs',
+    'streaming_labels')
+
+# methods which may change arguments - if defined, arguments are not static
+ARGUMENT_METHODS = ('get_args', 'get_labels_arg', 'get_label_arg',
+    'get_jobs_arg', 'get_streaming_labels_args', 'setup_parser')
+
+HANDLER_METHODS = ('handle', 'handle_label')
+
+# keyword arguments of ``arg`` which may be skipped if not literal
+OPTIONAL_KWARGS = ('type', 'default')
+
+
+class NotLiteral(Exception):
+    """
+    Raised if expression cannot be evaluated statically.
+    """
+
+
+def get_command_name(class_name):
+    """
+    Returns command name derived from ``class_name``, i.e. ``sync-all`` for
+    ``SyncAllCommand``.
+    """
+    if class_name.endswith('Command') and class_name != 'Command':
+        class_name = class_name[:-len('Command')]
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'-\1', class_name).lower()
+
+
+def get_name(node):
+    """
+    Returns name of ``Name`` or last part of ``Attribute`` node or ``None``.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def get_literal(node):
+    """
+    Returns value of literal expression ``node``.
+
+    :raises NotLiteral: if ``node`` is not a literal.
+    """
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError):
+        raise NotLiteral()
+
+
+def get_arg_spec(node):
+    """
+    Returns ``[args, kwargs]`` of ``arg(...)`` call ``node``.
+
+    :raises NotLiteral: if call cannot be evaluated statically.
+    """
+    if not isinstance(node, ast.Call) or get_name(node.func) != 'arg':
+        raise NotLiteral()
+    args = [get_literal(value) for value in node.args]
+    kwargs = {}
+    for keyword in node.keywords:
+        if keyword.arg is None:
+            raise NotLiteral()
+        try:
+            kwargs[keyword.arg] = get_literal(keyword.value)
+        except NotLiteral:
+            if keyword.arg not in OPTIONAL_KWARGS:
+                raise NotLiteral()
+    return [args, kwargs]
+
+
+def get_args_spec(node):
+    """
+    Returns ``(base, specs)`` for ``args`` attribute value ``node``, where
+    ``base`` is name of the class which arguments are extended (if value is
+    ``Base.args + [...]``) or ``None``.
+
+    :raises NotLiteral: if value cannot be evaluated statically.
+    """
+    base = None
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add) and \
+            isinstance(node.left, ast.Attribute) and \
+            node.left.attr == 'args':
+        base = get_name(node.left.value)
+        node = node.right
+    if not isinstance(node, (ast.List, ast.Tuple)):
+        raise NotLiteral()
+    return base, [get_arg_spec(element) for element in node.elts]
+
+
+def scan_class(node, aliases):
+    """
+    Returns dictionary describing class defined by ``ClassDef`` ``node``.
+    ``aliases`` maps names imported at the module to the original ones.
+    """
+    info = {
+        'class': node.name,
+        'bases': [aliases.get(get_name(base), get_name(base)) for base in
+            node.bases],
+        'attrs': {},
+        'methods': [],
+        'args': None,
+        'args_base': None,
+        'dynamic_args': False,
+    }
+    for statement in node.body:
+        if isinstance(statement, ast.FunctionDef) or (hasattr(ast,
+                'AsyncFunctionDef') and isinstance(statement,
+                ast.AsyncFunctionDef)):
+            info['methods'].append(statement.name)
+        elif isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                if target.id == 'args':
+                    try:
+                        base, info['args'] = get_args_spec(statement.value)
+                    except NotLiteral:
+                        info['dynamic_args'] = True
+                    else:
+                        info['args_base'] = aliases.get(base, base)
+                elif target.id in LITERAL_ATTRIBUTES:
+                    try:
+                        info['attrs'][target.id] = get_literal(
+                            statement.value)
+                    except NotLiteral:
+                        if target.id in STUB_ATTRIBUTES:
+                            info['dynamic_args'] = True
+    return info
+
+
+def scan_file(path):
+    """
+    Returns list of dictionaries describing classes defined at top level of
+    the module at ``path``.
+    """
+    with open(path, 'rb') as fin:
+        source = fin.read()
+    try:
+        tree = ast.parse(source, path)
+    except (SyntaxError, ValueError):
+        return []
+    aliases = {}
+    classes = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+        elif isinstance(node, ast.ClassDef):
+            classes.append(scan_class(node, aliases))
+    return classes
+
+
+def get_package_path(package):
+    """
+    Returns directory of the given ``package`` (dotted path). Parent packages
+    are imported, ``package`` itself is not.
+    """
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        import imp
+        path = None
+        for part in package.split('.'):
+            path = imp.find_module(part, path and [path])[1]
+        return path
+    spec = find_spec(package)
+    if spec is None or not spec.submodule_search_locations:
+        raise ImportError('No package named %r' % package)
+    return list(spec.submodule_search_locations)[0]
+
+
+def get_modules(package, path):
+    """
+    Returns dictionary mapping source files of ``package`` (located at
+    ``path``) to module names.
+    """
+    modules = {}
+    for directory, dirnames, filenames in os.walk(path):
+        dirnames[:] = [dirname for dirname in dirnames if os.path.exists(
+            os.path.join(directory, dirname, '__init__.py'))]
+        relative = os.path.relpath(directory, path)
+        prefix = package if relative == os.curdir else '.'.join([package] +
+            relative.split(os.sep))
+        for filename in filenames:
+            if not filename.endswith('.py'):
+                continue
+            name = filename[:-len('.py')]
+            module = prefix if name == '__init__' else '%s.%s' % (prefix, name)
+            modules[os.path.join(directory, filename)] = module
+    return modules
+
+
+class ScanCache(object):
+    """
+    Results of :func:`scan_file` stored at ``path`` together with stamps of
+    the scanned files.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {}
+        self.changed = False
+
+    def load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as fin:
+                data = json.load(fin)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == \
+                SCAN_CACHE_VERSION:
+            self.files = data.get('files', {})
+
+    def save(self):
+        if self.path is None or not self.changed:
+            return
+        write_json(self.path, {'version': SCAN_CACHE_VERSION,
+            'files': self.files})
+
+    def get_classes(self, path):
+        """
+        Returns classes defined at file ``path``, parsing it only if it has
+        changed since it was cached.
+        """
+        stamp = get_file_stamp(path)
+        cached = self.files.get(path)
+        if cached is None or cached['stamp'] != stamp:
+            cached = self.files[path] = {
+                'stamp': stamp,
+                'classes': scan_file(path),
+            }
+            self.changed = True
+        return cached['classes']
+
+    def prune(self, paths):
+        """
+        Forgets files other than given ``paths``.
+        """
+        for path in list(self.files):
+            if path not in paths:
+                del self.files[path]
+                self.changed = True
+
+
+def resolve_commands(classes):
+    """
+    Returns dictionary mapping command names to :class:`ScannedCommand`
+    instances for given list of ``(module, class info)`` tuples. Classes are
+    commands if they derive (directly or through other given classes) from
+    one of monolith's command classes and define (or inherit from other given
+    classes) ``handle`` or ``handle_label``. Commands with ``name`` set to
+    ``None`` or which class names start with underscore are skipped.
+    """
+    by_name = {}
+    for module, info in classes:
+        by_name.setdefault(info['class'], (module, info))
+
+    def get_chain(info, seen=()):
+        # returns scanned classes from info up to monolith base (or None)
+        for base in info['bases']:
+            if base in KNOWN_BASES:
+                return [info], KNOWN_BASES[base]
+            if base in by_name and base not in seen:
+                chain, base_path = get_chain(by_name[base][1],
+                    seen + (info['class'],))
+                if base_path is not None:
+                    return [info] + chain, base_path
+        return [info], None
+
+    commands = {}
+    for module, info in sorted(classes, key=lambda item: (item[0],
+            item[1]['class'])):
+        chain, base_path = get_chain(info)
+        if base_path is None or info['class'].startswith('_'):
+            continue
+        methods = set()
+        attrs = {}
+        for parent in reversed(chain):
+            methods.update(parent['methods'])
+            attrs.update(parent['attrs'])
+        if not methods.intersection(HANDLER_METHODS):
+            continue
+        name = attrs.get('name', get_command_name(info['class']))
+        if not isinstance(name, basestring) or name in commands:
+            continue
+        args = get_static_args_spec(chain, methods)
+        help = attrs.get('help', '')
+        commands[name] = ScannedCommand('%s.%s' % (module, info['class']),
+            help=help if isinstance(help, basestring) else '', args=args,
+            base_path=base_path, attrs=dict((key, value) for key, value in
+            attrs.items() if key in STUB_ATTRIBUTES))
+    return commands
+
+
+def get_static_args_spec(chain, methods):
+    """
+    Returns list of ``[args, kwargs]`` of the first class in ``chain`` or
+    ``None`` if arguments are not static.
+    """
+    if methods.intersection(ARGUMENT_METHODS):
+        return None
+    specs = []
+    for index, info in enumerate(chain):
+        if info['dynamic_args']:
+            return None
+        if info['args'] is None:
+            continue
+        specs = info['args'] + specs
+        base = info['args_base']
+        if base is None:
+            break
+        if base in KNOWN_BASES:
+            break
+        if index + 1 >= len(chain) or chain[index + 1]['class'] != base:
+            return None
+    return specs
+
+
+def scan_package(package, cache_path=None):
+    """
+    Returns dictionary mapping names of commands defined at ``package`` to
+    :class:`ScannedCommand` instances (see :func:`resolve_commands`). No
+    module of ``package`` is imported.
+
+    :param cache_path: path of the file caching parsed files.
+    """
+    modules = get_modules(package, get_package_path(package))
+    cache = ScanCache(cache_path)
+    cache.load()
+    classes = []
+    for path, module in modules.items():
+        for info in cache.get_classes(path):
+            classes.append((module, info))
+    cache.prune(modules)
+    try:
+        cache.save()
+    except (IOError, OSError):
+        pass
+    return resolve_commands(classes)
+
+
+class ScannedCommand(LazyCommand):
+    """
+    Lazy command found by scanning package sources. Besides class path and
+    help text it keeps statically extracted arguments.
+
+    **Attributes**
+
+    - ``args``: List of ``[args, kwargs]`` given to :func:`monolith.cli.arg`
+      at command's class or ``None`` if arguments are not static.
+    - ``base_path``: Dotted path of monolith's command class the command
+      derives from.
+    - ``attrs``: Literal class attributes affecting arguments (i.e.
+      ``labels_required``).
+    """
+
+    def __init__(self, class_path, help='', args=None, base_path=None,
+            attrs=None):
+        super(ScannedCommand, self).__init__(class_path, help)
+        self.args = args
+        self.base_path = base_path
+        self.attrs = attrs or {}
+
+    def get_static_args(self):
+        """
+        Returns list of :class:`monolith.cli.base.Argument` instances (as
+        command's ``get_args`` would return) or ``None`` if arguments are not
+        static. Command's module is not imported.
+        """
+        if self.args is None:
+            return None
+        attrs = dict(self.attrs)
+        attrs['args'] = [arg(*args, **kwargs) for args, kwargs in self.args]
+        Stub = type('Stub', (get_class(self.base_path),), attrs)
+        return Stub().get_args()
+
+
+class PackageExecutionManager(ExecutionManager):
+    """
+    Execution manager registering commands defined at *commands_package* (and
+    its subpackages). Sources are parsed instead of imported, see
+    :func:`scan_package`. Command is named after its ``name`` attribute or its
+    class name (``SyncAllCommand`` becomes ``sync-all``).
+
+    **Attributes**
+
+    - ``commands_package``: Dotted path of the package with commands.
+    - ``scan_cache_path``: Path of the file caching parsed sources. Defaults
+      to ``None``, in which case file is stored at ``$XDG_CACHE_HOME/monolith``
+      (``~/.cache/monolith``). If set to ``False``, results are not cached.
+    """
+    commands_package = None
+    scan_cache_path = None
+
+    def get_scan_cache_path(self):
+        """
+        Returns path of the file caching parsed sources or ``None`` if caching
+        is disabled.
+        """
+        if self.scan_cache_path is False:
+            return None
+        if self.scan_cache_path:
+            return self.scan_cache_path
+        return get_cache_path('scan-%s.json' % self.commands_package)
+
+    def get_commands_to_register(self):
+        """
+        Returns commands found at *commands_package*, together with commands
+        returned by the base class.
+        """
+        commands = scan_package(self.commands_package,
+            self.get_scan_cache_path())
+        commands.update(super(PackageExecutionManager,
+            self).get_commands_to_register())
+        return commands
+
+    def get_static_parser(self, name):
+        """
+        Returns parser of the command registered as ``name`` built from its
+        statically extracted arguments or ``None`` if command was already
+        imported or its arguments are not static.
+        """
+        command = self.registry.get(name)
+        if not isinstance(command, ScannedCommand):
+            return None
+        args = command.get_static_args()
+        if args is None:
+            return None
+        parser = self.parser_cls(prog='%s %s' % (self.prog_name, name),
+            description=command.help or None, stream=self.stderr)
+        for argument in args:
+            parser.add_argument(*argument.args, **argument.kwargs)
+        return parser
+
+    def get_completion_table(self, name, manifest=None):
+        from monolith.cli.completion import get_completion_table
+        from monolith.cli.manifest import get_action_spec
+
+        resolved = self.resolve_command_name(name)
+        parser = resolved and self.get_static_parser(resolved)
+        if parser is None:
+            return super(PackageExecutionManager, self).get_completion_table(
+                name, manifest)
+        return get_completion_table([get_action_spec(action) for action in
+            parser._actions])
+
+    def execute_from_manifest(self, argv):
+        super(PackageExecutionManager, self).execute_from_manifest(argv)
+        if len(argv) != 2 or argv[-1] not in ('-h', '--help'):
+            return
+        parser = self.get_static_parser(argv[0])
+        if parser is not None:
+            sys.stdout.write(parser.format_help())
+            sys.exit(0)
@@ -0,0 +1,216 @@
+"""
+Command server keeps :class:`ExecutionManager`, its commands and given warm
+up modules loaded and runs commands requested by the thin client (see
+:mod:`monolith.cli.client`, which also describes the protocol). Each request
+is run at a process forked from the server, with standard streams, working
+directory and environment of the client, so command starts with everything
+already imported.
+
+Like the completion server, command server stops once source files of the
+manager or of its commands change. Requests coming to a stale server are
+left unanswered so clients run the program themselves.
+"""
+import os
+import gc
+import sys
+import json
+import array
+import signal
+import socket
+import traceback
+
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import arg
+from monolith.cli.exceptions import CommandError
+from monolith.cli.client import get_peer_uid
+from monolith.cli.client import get_socket_path
+from monolith.cli.completion_server import CompletionServer
+
+
+def receive_request(conn):
+    """
+    Returns ``(fds, request)`` sent by :func:`monolith.cli.client.send_request`
+    over ``conn``.
+    """
+    fds = array.array('i')
+    message, ancdata, flags, address = conn.recvmsg(1, socket.CMSG_SPACE(
+        3 * fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+    stream = conn.makefile('rb')
+    try:
+        line = stream.readline()
+    finally:
+        stream.close()
+    if len(fds) != 3 or not line:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError('Invalid request')
+    return list(fds), json.loads(line.decode('utf-8'))
+
+
+def get_exit_status(code):
+    """
+    Returns exit status for the given ``SystemExit`` code, the same way Python
+    interpreter does (message is written to standard error).
+    """
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    sys.stderr.write('%s\n' % code)
+    return 1
+
+
+def reap_children(signum=None, frame=None):
+    """
+    Collects exit statuses of all finished child processes.
+    """
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except OSError:
+            return
+        if not pid:
+            return
+
+
+class CommandServer(CompletionServer):
+    """
+    Serves requests to run commands of the given ``manager`` at socket
+    ``path``. Server stops once no request came in for ``idle_timeout``
+    seconds (never if it's ``None``) or once source files of the manager or of
+    its commands have changed.
+    """
+
+    def __init__(self, manager, path, idle_timeout=None):
+        super(CommandServer, self).__init__(manager, path, idle_timeout)
+
+    def serve_forever(self):
+        handler = signal.signal(signal.SIGCHLD, reap_children)
+        try:
+            super(CommandServer, self).serve_forever()
+        finally:
+            signal.signal(signal.SIGCHLD, handler)
+
+    def handle(self, conn):
+        conn.settimeout(5)
+        if get_peer_uid(conn) not in (None, os.getuid()):
+            return
+        try:
+            fds, request = receive_request(conn)
+        except (ValueError, socket.error):
+            return
+        for stream in (sys.stdout, sys.stderr, self.manager.stdout):
+            stream.flush()
+        if os.fork():
+            for fd in fds:
+                os.close(fd)
+            return
+        status = 1
+        try:
+            status = self.run_request(conn, fds, request)
+        finally:
+            os._exit(status)
+
+    def run_request(self, conn, fds, request):
+        """
+        Runs command given at ``request`` at forked process, replying over
+        ``conn``. Returns exit status.
+        """
+        self.socket.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = [sys.argv[0]] + list(request['argv'])
+        conn.settimeout(None)
+        conn.sendall(('%d\n' % os.getpid()).encode('ascii'))
+        try:
+            self.manager.execute(request['argv'])
+            status = 0
+        except SystemExit as err:
+            status = get_exit_status(err.code)
+        except KeyboardInterrupt:
+            status = 128 + signal.SIGINT
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        for stream in (sys.stdout, sys.stderr, self.manager.stdout):
+            try:
+                stream.flush()
+            except (IOError, OSError, ValueError):
+                pass
+        try:
+            conn.sendall(('%d\n' % status).encode('ascii'))
+        except socket.error:
+            pass
+        return status
+
+
+def serve(manager, path, preload_modules=(), preload_commands=True,
+        idle_timeout=None):
+    """
+    Imports given ``preload_modules`` (and, if ``preload_commands`` is
+    ``True``, all commands of the ``manager``), builds the parser and serves
+    requests at ``path`` (see :class:`CommandServer`). Returns ``False`` if
+    another server is already running at ``path``.
+    """
+    import importlib
+
+    for module in preload_modules:
+        importlib.import_module(module)
+    if preload_commands:
+        manager.get_commands()
+    manager.get_cached_parser()
+    server = CommandServer(manager, path, idle_timeout)
+    if not server.bind():
+        return False
+    if hasattr(gc, 'freeze'):
+        # keep objects loaded so far out of collections, so their memory
+        # stays shared with forked processes
+        gc.collect()
+        gc.freeze()
+    server.serve_forever()
+    return True
+
+
+class ServerCommand(BaseCommand):
+    """
+    Runs command server (see :mod:`monolith.cli.server`) in the foreground.
+
+    **Extra attributes**:
+
+    - ``preload_modules``: List of modules imported before serving (i.e.
+      heavy dependencies shared by commands). Defaults to empty list.
+    - ``preload_commands``: If ``True``, all registered commands are imported
+      before serving. Defaults to ``True``.
+    - ``idle_timeout``: Number of seconds after which idle server shuts down.
+      Defaults to ``None`` (never).
+    """
+    help = 'Runs command server answering requests of the thin client.'
+    args = [
+        arg('--socket', metavar='PATH', help='Path of the server socket.'),
+    ]
+    preload_modules = []
+    preload_commands = True
+    idle_timeout = None
+
+    def get_socket_path(self):
+        return get_socket_path(self.prog_name)
+
+    def handle(self, namespace):
+        path = namespace.socket or self.get_socket_path()
+        try:
+            served = serve(self.manager, path, self.preload_modules,
+                self.preload_commands, self.idle_timeout)
+        except OSError as err:
+            raise CommandError('Cannot serve at %s: %s' % (path, err))
+        if not served:
+            raise CommandError('Command server is already running at %s' %
+                path)
@@ -0,0 +1,127 @@
+"""
+Interactive shell running commands of a manager. Registry and parsers stay
+loaded between lines and completion is answered from the manager at the same
+process.
+"""
+import cmd
+import sys
+import shlex
+
+from monolith.compat import unicode
+from monolith.cli.base import BaseCommand
+
+
+class Shell(cmd.Cmd):
+    """
+    Reads command lines (shell quoted arguments, without program name) and
+    runs each of them with :meth:`monolith.cli.ExecutionManager.run_args`, so
+    failing commands (including :class:`monolith.cli.CommandError` and parser
+    errors) only report an error and set *status*.
+
+    Besides registered commands, ``help [COMMAND]`` prints help and ``exit``,
+    ``quit`` or end of input leave the shell (unless commands with such names
+    are registered).
+
+    **Attributes**
+
+    - ``manager``: *ExecutionManager* which commands are run.
+    - ``status``: Exit status of the last command.
+    """
+    builtins = ('exit', 'help', 'quit')
+
+    def __init__(self, manager, stdin=None, stdout=None):
+        cmd.Cmd.__init__(self, stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            self.use_rawinput = False
+        self.manager = manager
+        self.prompt = '%s> ' % manager.prog_name
+        self.status = 0
+
+    def preloop(self):
+        try:
+            import readline
+        except ImportError:
+            return
+        # options (i.e. ``--mode``) should be completed as whole words
+        readline.set_completer_delims(' \t\n')
+
+    def emptyline(self):
+        pass
+
+    def onecmd(self, line):
+        if line == 'EOF':
+            self.stdout.write('\n')
+            return True
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as err:
+            self.manager.stderr.write(unicode('%s: %s\n' % (
+                self.manager.prog_name, err)))
+            self.status = 2
+            return False
+        if not args:
+            return False
+        if args[0] not in self.manager.registry:
+            if args[0] in ('exit', 'quit'):
+                return True
+            if args[0] == 'help':
+                args = args[1:2] + ['--help']
+        try:
+            self.status = self.manager.run_args(args)
+        except KeyboardInterrupt:
+            self.stdout.write('\n')
+            self.status = 130
+        return False
+
+    def completenames(self, text, *ignored):
+        if text:
+            names = self.manager.get_completions([text], 1)
+        else:
+            names = self.manager.get_command_names()
+        builtins = [name for name in self.builtins if name.startswith(text)
+            and name not in self.manager.registry]
+        return sorted(set(names).union(builtins))
+
+    def completedefault(self, text, line, begidx, endidx):
+        try:
+            words = shlex.split(line[:begidx])
+        except ValueError:
+            return []
+        if words and words[0] == 'help' and 'help' not in \
+                self.manager.registry:
+            return self.completenames(text) if len(words) == 1 else []
+        cwords = words + [text]
+        return self.manager.get_completions(cwords, len(cwords))
+
+
+def run_shell(manager, stdin=None, stdout=None, intro=None):
+    """
+    Runs :class:`Shell` for the given ``manager`` until it's left and returns
+    exit status of the last command. Parser is built upfront, so the first
+    command doesn't pay for it. Keyboard interrupt at the prompt discards the
+    typed line.
+    """
+    shell = Shell(manager, stdin=stdin, stdout=stdout)
+    manager.get_cached_parser()
+    while True:
+        try:
+            shell.cmdloop(intro)
+        except KeyboardInterrupt:
+            shell.stdout.write('\n')
+            intro = None
+            continue
+        return shell.status
+
+
+class ShellCommand(BaseCommand):
+    """
+    Runs interactive shell (see :meth:`monolith.cli.ExecutionManager.shell`)
+    - register it to make the shell available as a command. Exits with the
+    status of the last command run in the shell if it's non-zero.
+    """
+    help = 'Runs interactive shell with all commands loaded.'
+
+    def handle(self, namespace):
+        status = self.manager.shell()
+        if status:
+            sys.exit(status)
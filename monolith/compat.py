@@ -6,18 +6,20 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import sys
-try:
-    import unittest2 as unittest
-except ImportError:
-    import unittest
 
 try:
     from collections import OrderedDict
 except ImportError:
     from monolith.utils.ordereddict import OrderedDict
 
+try:
+    from collections.abc import Iterator
+except ImportError:
+    from collections import Iterator
+
 try:
     unicode = unicode
+    basestring = basestring
 except NameError:
     basestring = unicode = str
 
@@ -28,5 +30,28 @@ else:
         return tuple(context_managers)
 
 
-__all__ = ['unittest', 'OrderedDict', 'nested', 'unicode']
+def get_unittest():
+    """
+    Returns ``unittest2`` module if available or ``unittest`` otherwise.
+    """
+    try:
+        import unittest2 as unittest
+    except ImportError:
+        import unittest
+    return unittest
+
+
+if sys.version_info < (3, 7):
+    unittest = get_unittest()
+else:
+    def __getattr__(name):
+        # unittest is needed by tests only so it's imported once requested
+        if name == 'unittest':
+            return get_unittest()
+        raise AttributeError('module %r has no attribute %r' % (__name__,
+            name))
+
+
+__all__ = ['unittest', 'OrderedDict', 'Iterator', 'nested', 'unicode',
+    'basestring']
 
@@ -4,7 +4,9 @@ from monolith.compat import unittest
 
 def collector():
     start_dir = os.path.abspath(os.path.dirname(__file__))
-    return unittest.defaultTestLoader.discover(start_dir)
+    top_level_dir = os.path.dirname(os.path.dirname(start_dir))
+    return unittest.defaultTestLoader.discover(start_dir,
+        top_level_dir=top_level_dir)
 
 def main():
     unittest.main()
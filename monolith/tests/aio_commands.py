@@ -0,0 +1,43 @@
+"""
+Asynchronous commands used by :mod:`monolith.tests.test_cli_aio`. They are
+kept apart so that test discovery doesn't import ``async def`` syntax on
+Python older than 3.5.
+"""
+import asyncio
+
+from monolith.cli.base import arg
+from monolith.cli.base import CommandError
+from monolith.cli.aio import AsyncBaseCommand
+from monolith.cli.aio import AsyncLabelCommand
+
+
+calls = []
+
+
+class SleepCommand(AsyncBaseCommand):
+    args = [
+        arg('name'),
+    ]
+
+    async def handle(self, namespace):
+        await asyncio.sleep(0)
+        calls.append(namespace.name)
+        if namespace.name == 'bad':
+            raise CommandError('bad name', 7)
+        self.stdout.write(namespace.name)
+
+
+class ConcurrentLabelCommand(AsyncLabelCommand):
+    concurrency = 2
+
+    def __init__(self, *args, **kwargs):
+        super(ConcurrentLabelCommand, self).__init__(*args, **kwargs)
+        self.running = 0
+        self.max_running = 0
+
+    async def handle_label(self, label, namespace):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.stdout.write(label)
@@ -1,14 +1,19 @@
 import io
 import sys
+import time
 import mock
+import pickle
 import argparse
+import tempfile
 from monolith.compat import unittest
 from monolith.cli.base import arg
 from monolith.cli.base import ExecutionManager
 from monolith.cli.base import SimpleExecutionManager
 from monolith.cli.base import BaseCommand
 from monolith.cli.base import CommandError
+from monolith.cli.base import CommandGroup
 from monolith.cli.base import LabelCommand
+from monolith.cli.base import LazyCommand
 from monolith.cli.base import SingleLabelCommand
 from monolith.cli.base import Parser
 from monolith.cli.exceptions import AlreadyRegistered
@@ -23,6 +28,16 @@ class AnotherDummyCommand(BaseCommand):
     pass
 
 
+class UpperLabelCommand(LabelCommand):
+    parallel = True
+
+    def handle_label(self, label, namespace):
+        if label == 'bad':
+            raise CommandError('bad label', 4)
+        time.sleep(0.01 * (len(label) % 3))
+        self.stdout.write(label.upper() + '\n')
+
+
 class TestExecutionManager(unittest.TestCase):
 
     def assertRegistryClassesEqual(self, actual, expected):
@@ -69,6 +84,46 @@ class TestExecutionManager(unittest.TestCase):
             self.manager.get_parser()
             self.assertTrue(setup_parser.called)
 
+    def test_lazy_parser_builds_only_requested_subparser(self):
+        FooCommand = type('FooCommand', (BaseCommand,), {})
+        BarCommand = type('BarCommand', (BaseCommand,), {})
+        self.manager.register('foo', FooCommand)
+        self.manager.register('bar', BarCommand)
+        self.manager.lazy_parser = True
+        with mock.patch.object(FooCommand, 'get_args') as foo_get_args:
+            with mock.patch.object(BarCommand, 'get_args') as bar_get_args:
+                foo_get_args.return_value = []
+                self.manager.get_parser(['foo'])
+                self.assertTrue(foo_get_args.called)
+                self.assertFalse(bar_get_args.called)
+
+    def test_lazy_parser_builds_all_subparsers_if_no_command_given(self):
+        FooCommand = type('FooCommand', (BaseCommand,), {})
+        self.manager.register('foo', FooCommand)
+        self.manager.lazy_parser = True
+        with mock.patch.object(FooCommand, 'setup_parser') as setup_parser:
+            self.manager.get_parser(['--help'])
+            self.assertTrue(setup_parser.called)
+
+    def test_lazy_parser_lists_stub_commands(self):
+        FooCommand = type('FooCommand', (BaseCommand,), {'help': 'Foo help'})
+        BarCommand = type('BarCommand', (BaseCommand,), {'help': 'Bar help'})
+        self.manager.register('foo', FooCommand)
+        self.manager.register('bar', BarCommand)
+        self.manager.lazy_parser = True
+        help_text = self.manager.get_parser(['foo']).format_help()
+        self.assertIn('Foo help', help_text)
+        self.assertIn('Bar help', help_text)
+
+    def test_get_requested_command_name(self):
+        self.manager.register('foo', DummyCommand)
+        self.assertEqual(self.manager.get_requested_command_name(
+            ['-v', 'foo', 'bar']), 'foo')
+        self.assertEqual(self.manager.get_requested_command_name(
+            ['bar', 'foo']), None)
+        self.assertEqual(self.manager.get_requested_command_name(['-h']),
+            None)
+
     def test_register(self):
         Command = type('Command', (BaseCommand,), {})
         self.manager.register('foo', Command)
@@ -101,6 +156,113 @@ class TestExecutionManager(unittest.TestCase):
             'bar': BarCommand,
         })
 
+    def test_get_command_names(self):
+        for name in ('commit', 'config', 'add', 'clone'):
+            self.manager.register(name, DummyCommand)
+        self.manager.register('add', DummyCommand, force=True)
+        self.assertEqual(self.manager.get_command_names(),
+            ['add', 'clone', 'commit', 'config'])
+        self.assertEqual(self.manager.get_command_names('co'),
+            ['commit', 'config'])
+        self.assertEqual(self.manager.get_command_names('con'), ['config'])
+        self.assertEqual(self.manager.get_command_names('x'), [])
+
+    def test_get_command_names_after_registry_changed_directly(self):
+        self.manager.register('foo', DummyCommand)
+        self.manager.registry['bar'] = DummyCommand()
+        self.assertEqual(self.manager.get_command_names(), ['bar', 'foo'])
+
+    def test_get_command_names_with_many_commands(self):
+        for index in range(20000):
+            self.manager.register('command-%05d' % index, 'foo.Command')
+        self.assertEqual(self.manager.get_command_names('command-1999'), [
+            'command-%05d' % index for index in range(19990, 20000)])
+
+    def test_resolve_command_name(self):
+        for name in ('commit', 'config', 'co', 'status'):
+            self.manager.register(name, DummyCommand)
+        self.assertEqual(self.manager.resolve_command_name('commit'),
+            'commit')
+        self.assertEqual(self.manager.resolve_command_name('st'), None)
+        self.manager.abbreviations = True
+        self.assertEqual(self.manager.resolve_command_name('st'), 'status')
+        self.assertEqual(self.manager.resolve_command_name('com'), 'commit')
+        self.assertEqual(self.manager.resolve_command_name('co'), 'co')
+        self.assertEqual(self.manager.resolve_command_name('c'), None)
+        self.assertEqual(self.manager.resolve_command_name(''), None)
+
+    def test_call_abbreviated_command(self):
+        handle = mock.Mock()
+        Command = type('Command', (BaseCommand,), {'handle': handle})
+        self.manager.register('commit', Command)
+        self.manager.register('config', DummyCommand)
+        self.manager.abbreviations = True
+        self.manager.execute(['com'])
+        self.manager.call_command('comm')
+        self.assertEqual(self.manager.run_args(['commi']), 0)
+        self.assertEqual(handle.call_count, 3)
+        with mock.patch.object(sys, 'stderr', StringIO()) as stderr:
+            self.assertEqual(self.manager.run_args(['co']), 2)
+        self.assertIn("invalid choice: 'co'", stderr.getvalue())
+
+    def test_abbreviations_disabled(self):
+        self.manager.register('commit', DummyCommand)
+        with mock.patch.object(sys, 'stderr', StringIO()):
+            self.assertEqual(self.manager.run_args(['com']), 2)
+
+    def test_register_lazy_command(self):
+        with mock.patch('monolith.cli.base.get_class') as get_class:
+            self.manager.register('foo', 'monolith.tests.test_cli.DummyCommand')
+            self.assertFalse(get_class.called)
+        entry = self.manager.registry['foo']
+        self.assertIsInstance(entry, LazyCommand)
+        self.assertEqual(entry.class_path,
+            'monolith.tests.test_cli.DummyCommand')
+
+    def test_get_command_sets_up_lazy_command(self):
+        post_register = mock.Mock()
+        Command = type('Command', (BaseCommand,), {
+            'post_register': post_register})
+        self.manager.register('foo', LazyCommand('foo.Command', help='Foo'))
+        with mock.patch('monolith.cli.base.get_class') as get_class:
+            get_class.return_value = Command
+            command = self.manager.get_command('foo')
+            get_class.assert_called_once_with('foo.Command')
+        self.assertIsInstance(command, Command)
+        self.assertEqual(command.manager, self.manager)
+        self.assertIs(self.manager.registry['foo'], command)
+        post_register.assert_called_once_with(self.manager)
+
+    def test_get_parser_does_not_import_lazy_commands(self):
+        self.manager.register('foo', LazyCommand('foo.Command', help='Foo'))
+        with mock.patch('monolith.cli.base.get_class') as get_class:
+            self.manager.get_parser()
+            self.assertFalse(get_class.called)
+
+    def test_call_lazy_command(self):
+
+        class Command(BaseCommand):
+            args = [
+                arg('-f', '--force', action='store_true', default=False),
+            ]
+            handle = mock.Mock()
+
+        self.manager.register('foo', LazyCommand('foo.Command'))
+        self.manager.register('bar', LazyCommand('bar.Command'))
+        with mock.patch('monolith.cli.base.get_class') as get_class:
+            get_class.return_value = Command
+            self.manager.call_command('foo', '-f')
+            get_class.assert_called_once_with('foo.Command')
+        namespace = Command.handle.call_args[0][0]
+        self.assertTrue(namespace.force)
+        self.assertIsInstance(self.manager.registry['bar'], LazyCommand)
+
+    def test_get_commands_sets_up_lazy_commands(self):
+        self.manager.register('foo', 'monolith.tests.test_cli.DummyCommand')
+        self.assertRegistryClassesEqual(self.manager.get_commands(), {
+            'foo': DummyCommand,
+        })
+
     def test_get_commands_to_register(self):
         FooCommand = type('FooCommand', (BaseCommand,), {})
         BarCommand = type('BarCommand', (BaseCommand,), {})
@@ -175,6 +337,95 @@ class TestExecutionManager(unittest.TestCase):
 
         stderr.write.assert_called_once_with('ERROR: foo bar baz\n')
 
+    def test_call_command_with_lazy_parser(self):
+
+        class Command(BaseCommand):
+            args = [
+                arg('-f', '--force', action='store_true', default=False),
+            ]
+            handle = mock.Mock()
+
+        self.manager.lazy_parser = True
+        self.manager.register('add', Command)
+        self.manager.register('init', DummyCommand)
+        self.manager.call_command('add', '-f')
+        namespace = Command.handle.call_args[0][0]
+        self.assertTrue(namespace.force)
+
+    def test_call_command_reuses_parser(self):
+        self.manager.register('foo', DummyCommand)
+        with mock.patch.object(DummyCommand, 'handle'):
+            with mock.patch.object(self.manager, 'get_parser',
+                    wraps=self.manager.get_parser) as get_parser:
+                self.manager.call_command('foo')
+                self.manager.call_command('foo')
+                self.assertEqual(get_parser.call_count, 1)
+
+    def test_register_invalidates_cached_parser(self):
+        self.manager.register('foo', DummyCommand)
+        parser = self.manager.get_cached_parser(['foo'])
+        self.assertIs(self.manager.get_cached_parser(['foo']), parser)
+        self.manager.register('foo', AnotherDummyCommand, force=True)
+        self.assertIsNot(self.manager.get_cached_parser(['foo']), parser)
+
+    def test_changed_args_invalidate_cached_parser(self):
+        self.manager.register('foo', DummyCommand)
+        parser = self.manager.get_cached_parser(['foo'])
+        command = self.manager.registry['foo']
+        command.args = [arg('--bar')]
+        self.assertIsNot(self.manager.get_cached_parser(['foo']), parser)
+
+    def test_only_requested_command_is_validated(self):
+        self.manager.register('foo', DummyCommand)
+        self.manager.register('bar', AnotherDummyCommand)
+        parser = self.manager.get_cached_parser(['foo'])
+        command = self.manager.registry['bar']
+        with mock.patch.object(command, 'get_args') as get_args:
+            self.assertIs(self.manager.get_cached_parser(['foo']), parser)
+        self.assertFalse(get_args.called)
+        command.args = [arg('--baz')]
+        self.assertIs(self.manager.get_cached_parser(['foo']), parser)
+        self.assertIsNot(self.manager.get_cached_parser(['bar']), parser)
+
+    def test_lazy_commands_do_not_rebuild_parser(self):
+        for name in ('c0', 'c1', 'c2'):
+            self.manager.register(name, LazyCommand(
+                'monolith.tests.test_cli.DummyCommand'))
+        with mock.patch.object(self.manager, 'get_parser',
+                wraps=self.manager.get_parser) as get_parser:
+            for name in ('c0', 'c0', 'c0', 'c1', 'c1', 'c2', 'c0'):
+                self.manager.parse_args(self.manager.get_cached_parser([name]),
+                    [name])
+        self.assertEqual(get_parser.call_count, 1)
+        parser = self.manager.get_cached_parser(['c0'])
+        self.manager.registry['c1'].args = [arg('--baz')]
+        self.assertIsNot(self.manager.get_cached_parser(['c1']), parser)
+
+    def test_parser_caching_disabled(self):
+        self.manager.parser_caching = False
+        self.manager.register('foo', DummyCommand)
+        parser = self.manager.get_cached_parser(['foo'])
+        self.assertIsNot(self.manager.get_cached_parser(['foo']), parser)
+
+    def test_call_command_does_not_share_namespace_values(self):
+        namespaces = []
+
+        class Command(BaseCommand):
+            args = [
+                arg('--item', action='append', default=[]),
+            ]
+
+            def handle(self, namespace):
+                namespace.item.append('handled')
+                namespaces.append(namespace)
+
+        self.manager.register('add', Command)
+        self.manager.call_command('add')
+        self.manager.call_command('add', '--item', 'foo')
+        self.assertEqual(namespaces[0].item, ['handled'])
+        self.assertEqual(namespaces[1].item, ['foo', 'handled'])
+        self.assertEqual(Command.args[0].kwargs['default'], [])
+
     def test_execute_calls_handle_command(self):
 
         class Command(BaseCommand):
@@ -190,6 +441,109 @@ class TestExecutionManager(unittest.TestCase):
         namespace = Command.handle.call_args[0][0]
         Command.handle.assert_called_once_with(namespace)
 
+    def test_run_args_returns_exit_status(self):
+
+        class Command(BaseCommand):
+            def handle(self, namespace):
+                raise CommandError('failed', 3)
+
+        self.manager.register('fail', Command)
+        self.manager.register('foo', DummyCommand)
+        with mock.patch.object(DummyCommand, 'handle'):
+            self.assertEqual(self.manager.run_args(['foo']), 0)
+        with mock.patch.object(sys, 'stderr', StringIO()):
+            self.assertEqual(self.manager.run_args(['fail']), 3)
+            self.assertEqual(self.manager.run_args(['unknown']), 2)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.stderr = StringIO()
+        self.manager = ExecutionManager(['foobar'], stderr=self.stderr)
+        self.manager.batch = True
+        self.calls = calls = []
+
+        class Command(BaseCommand):
+            args = [
+                arg('name'),
+            ]
+
+            def handle(self, namespace):
+                calls.append(namespace.name)
+                if namespace.name == 'bad':
+                    raise CommandError('bad name', 5)
+                if namespace.name == 'broken':
+                    raise ValueError('boom')
+
+        self.manager.register('greet', Command)
+
+    def test_run_batch(self):
+        stream = StringIO('greet foo\n\n# comment\ngreet "bar baz"\n')
+        statuses = self.manager.run_batch(stream)
+        self.assertEqual(statuses, [(1, 0), (4, 0)])
+        self.assertEqual(self.calls, ['foo', 'bar baz'])
+        self.assertEqual(self.stderr.getvalue(),
+            'foobar: 2 command(s) run, 0 failed\n')
+
+    def test_run_batch_continues_after_failure(self):
+        stream = StringIO('greet bad\ngreet foo\n')
+        with mock.patch.object(sys, 'stderr', StringIO()):
+            statuses = self.manager.run_batch(stream)
+        self.assertEqual(statuses, [(1, 5), (2, 0)])
+        self.assertEqual(self.calls, ['bad', 'foo'])
+        self.assertEqual(self.stderr.getvalue(), '\n'.join((
+            'foobar: line 1: exit status 5',
+            'foobar: 2 command(s) run, 1 failed',
+            '',
+        )))
+
+    def test_run_batch_continues_after_unbalanced_quote(self):
+        stream = StringIO('greet a\ngreet "b\ngreet c\n')
+        statuses = self.manager.run_batch(stream)
+        self.assertEqual(statuses, [(1, 0), (2, 2), (3, 0)])
+        self.assertEqual(self.calls, ['a', 'c'])
+        self.assertEqual(self.stderr.getvalue(), '\n'.join((
+            'foobar: line 2: No closing quotation',
+            'foobar: line 2: exit status 2',
+            'foobar: 3 command(s) run, 1 failed',
+            '',
+        )))
+
+    def test_run_batch_continues_after_unexpected_exception(self):
+        stream = StringIO('greet broken\ngreet foo\n')
+        statuses = self.manager.run_batch(stream)
+        self.assertEqual(statuses, [(1, 1), (2, 0)])
+        self.assertEqual(self.calls, ['broken', 'foo'])
+        stderr = self.stderr.getvalue()
+        self.assertIn('Traceback', stderr)
+        self.assertIn('ValueError: boom\n', stderr)
+        self.assertTrue(stderr.endswith('foobar: line 1: exit status 1\n'
+            'foobar: 2 command(s) run, 1 failed\n'))
+
+    def test_execute_batch_from_stdin(self):
+        stdin = StringIO('greet foo\ngreet bar\n')
+        with mock.patch.object(sys, 'stdin', stdin):
+            with self.assertRaises(SystemExit) as context:
+                self.manager.execute(['--batch', '-'])
+        self.assertEqual(context.exception.code, 0)
+        self.assertEqual(self.calls, ['foo', 'bar'])
+
+    def test_execute_batch_fails(self):
+        stdin = StringIO('greet bad\n')
+        with mock.patch.object(sys, 'stdin', stdin):
+            with mock.patch.object(sys, 'stderr', StringIO()):
+                with self.assertRaises(SystemExit) as context:
+                    self.manager.execute(['--batch', '-'])
+        self.assertEqual(context.exception.code, 1)
+
+    def test_batch_option_disabled(self):
+        self.manager.batch = False
+        with mock.patch.object(sys, 'stderr', StringIO()):
+            with self.assertRaises(SystemExit) as context:
+                self.manager.execute(['--batch', '-'])
+        self.assertEqual(context.exception.code, 2)
+
 
 class TestSimpleExecutionManager(unittest.TestCase):
 
@@ -207,6 +561,19 @@ class TestSimpleExecutionManager(unittest.TestCase):
             'pull': AnotherDummyCommand,
         })
 
+    def test_get_commands_to_register_lazy(self):
+        from monolith.tests.test_cli import DummyCommand
+        manager = SimpleExecutionManager('git', {
+            'push': DummyCommand,
+            'pull': 'monolith.tests.test_cli.AnotherDummyCommand',
+        }, lazy=True)
+        commands = manager.get_commands_to_register()
+        self.assertEqual(commands['push'], DummyCommand)
+        self.assertIsInstance(commands['pull'], LazyCommand)
+        self.assertEqual(commands['pull'].class_path,
+            'monolith.tests.test_cli.AnotherDummyCommand')
+        self.assertIsInstance(manager.registry['pull'], LazyCommand)
+
 
 class TestBaseCommand(unittest.TestCase):
 
@@ -267,6 +634,133 @@ class TestLabelCommand(unittest.TestCase):
         command.handle(namespace)
         command.handle_no_labels.assert_called_once_with(namespace)
 
+    def test_parallel_adds_jobs_arg(self):
+        command = LabelCommand()
+        self.assertNotIn(command.get_jobs_arg(), command.get_args())
+        command = UpperLabelCommand()
+        self.assertIn(command.get_jobs_arg(), command.get_args())
+
+    def test_parallel_keeps_labels_order(self):
+        stdout = StringIO()
+        command = UpperLabelCommand(stdout=stdout)
+        command.handle_no_labels = mock.Mock()
+        labels = ['a', 'bb', 'ccc', 'd', 'ee', 'fff', 'g']
+        namespace = argparse.Namespace(labels=labels, jobs=3)
+        command.handle(namespace)
+        self.assertEqual(stdout.getvalue(),
+            ''.join(label.upper() + '\n' for label in labels))
+        self.assertEqual(command.stdout, stdout)
+        command.handle_no_labels.assert_called_once_with(namespace)
+
+    def test_parallel_aggregates_errors(self):
+        stdout = StringIO()
+        command = UpperLabelCommand(stdout=stdout)
+        namespace = argparse.Namespace(labels=['a', 'bad', 'b', 'bad'], jobs=2)
+        with self.assertRaises(CommandError) as context:
+            command.handle(namespace)
+        self.assertEqual(context.exception.code, 4)
+        self.assertEqual(context.exception.message,
+            '2 label(s) failed:\nbad: bad label\nbad: bad label')
+        self.assertEqual(stdout.getvalue(), 'A\nB\n')
+
+    def test_parallel_process_pool(self):
+        stdout = StringIO()
+        command = UpperLabelCommand(stdout=stdout)
+        command.pool = 'process'
+        namespace = argparse.Namespace(labels=['a', 'bb', 'c'], jobs=2,
+            func=command.handle)
+        command.handle(namespace)
+        self.assertEqual(stdout.getvalue(), 'A\nBB\nC\n')
+
+    def test_parallel_process_pool_payload(self):
+        from concurrent import futures
+
+        sizes = []
+
+        class Executor(futures.ThreadPoolExecutor):
+
+            def submit(self, fn, *args):
+                sizes.append(len(pickle.dumps(args)))
+                return super(Executor, self).submit(fn, *args)
+
+        def get_payload_size(count):
+            del sizes[:]
+            command = UpperLabelCommand(stdout=StringIO())
+            command.pool = 'process'
+            labels = ['ab%04d' % index for index in range(count)]
+            namespace = argparse.Namespace(labels=labels, labels_from=None,
+                null=False, jobs=2, func=command.handle)
+            with mock.patch.object(futures, 'ProcessPoolExecutor', Executor):
+                command.handle(namespace)
+            return max(sizes)
+
+        self.assertEqual(get_payload_size(1000), get_payload_size(10))
+
+    def test_parallel_call_command(self):
+        stdout = StringIO()
+        manager = ExecutionManager(['foobar'], stdout=stdout)
+        manager.register('upper', UpperLabelCommand)
+        manager.call_command('upper', '-j', '4', 'x', 'yy', 'zzz')
+        self.assertEqual(stdout.getvalue(), 'X\nYY\nZZZ\n')
+
+    def test_streaming_labels_args(self):
+        Command = type('Command', (LabelCommand,), {'streaming_labels': True})
+        command = Command()
+        self.assertEqual(command.get_labels_arg().kwargs['nargs'], '*')
+        self.assertEqual(command.get_args()[1:],
+            command.get_streaming_labels_args())
+
+    def test_streaming_labels_from_stdin(self):
+        manager = ExecutionManager(['foobar'])
+        Command = type('Command', (LabelCommand,), {'streaming_labels': True})
+        manager.register('cmd', Command)
+        stdin = StringIO('bar\nbaz\n')
+        with mock.patch.object(Command, 'handle_label') as handle_label:
+            with mock.patch.object(sys, 'stdin', stdin):
+                manager.call_command('cmd', 'foo', '-', 'qux')
+        self.assertEqual([call[0][0] for call in handle_label.call_args_list],
+            ['foo', 'bar', 'baz', 'qux'])
+
+    def test_streaming_labels_from_file(self):
+        manager = ExecutionManager(['foobar'])
+        Command = type('Command', (LabelCommand,), {'streaming_labels': True})
+        manager.register('cmd', Command)
+        with tempfile.NamedTemporaryFile('w') as fout:
+            fout.write('bar\0baz\nqux\0')
+            fout.flush()
+            with mock.patch.object(Command, 'handle_label') as handle_label:
+                manager.call_command('cmd', '--labels-from', fout.name, '-0')
+        self.assertEqual([call[0][0] for call in handle_label.call_args_list],
+            ['bar', 'baz\nqux'])
+
+    def test_streaming_labels_are_lazy(self):
+        Command = type('Command', (LabelCommand,), {'streaming_labels': True})
+        command = Command()
+        namespace = argparse.Namespace(labels=['-'], labels_from=None,
+            null=False)
+        stdin = StringIO('foo\nbar\n')
+        with mock.patch.object(sys, 'stdin', stdin):
+            labels = command.get_labels(namespace)
+            self.assertEqual(stdin.tell(), 0)
+            self.assertEqual(next(labels), 'foo')
+
+    def test_streaming_labels_required(self):
+        Command = type('Command', (LabelCommand,), {'streaming_labels': True})
+        namespace = argparse.Namespace(labels=[], labels_from=None)
+        with self.assertRaises(CommandError):
+            Command().handle(namespace)
+
+    def test_streaming_labels_in_parallel(self):
+        stdout = StringIO()
+        Command = type('Command', (UpperLabelCommand,), {
+            'streaming_labels': True})
+        command = Command(stdout=stdout)
+        namespace = argparse.Namespace(labels=['-'], labels_from=None,
+            null=False, jobs=2)
+        with mock.patch.object(sys, 'stdin', StringIO('a\nbb\nc\n')):
+            command.handle(namespace)
+        self.assertEqual(stdout.getvalue(), 'A\nBB\nC\n')
+
 
 class TestSingleLabelCommand(unittest.TestCase):
 
@@ -296,6 +790,153 @@ class TestSingleLabelCommand(unittest.TestCase):
         ])
 
 
+class UpCommand(SingleLabelCommand):
+    help = 'Migrates up'
+
+    def handle_label(self, label, namespace):
+        self.stdout.write(u'up %s' % label)
+
+
+class MigrateGroup(CommandGroup):
+    help = 'Migrations'
+    commands = {
+        'up': UpCommand,
+        'down': LazyCommand('monolith.tests.missing.DownCommand',
+            help='Migrates down'),
+    }
+
+
+class DbGroup(CommandGroup):
+    help = 'Database commands'
+    args = [arg('--database', default='default')]
+    commands = {
+        'migrate': MigrateGroup,
+        'seed': 'monolith.tests.missing.SeedCommand',
+    }
+
+
+class CacheGroup(CommandGroup):
+    help = 'Cache commands'
+    manager_class = 'monolith.tests.missing.CacheManager'
+
+
+class LazyDbGroup(CommandGroup):
+    help = 'Database commands'
+    commands = {
+        'migrate': 'monolith.tests.test_cli.MigrateGroup',
+    }
+
+
+class TestCommandGroup(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        self.manager = ExecutionManager(['prog'], stdout=self.stdout,
+            stderr=self.stderr)
+        self.manager.register('db', DbGroup)
+        self.manager.register('cache', CacheGroup)
+
+    def test_call_nested_command(self):
+        self.manager.call_command('db', 'migrate', 'up', 'head')
+        self.assertEqual(self.stdout.getvalue(), 'up head')
+
+    def test_group_arguments_are_parsed(self):
+        parser = self.manager.get_parser()
+        namespace = self.manager.parse_args(parser, ['db', '--database',
+            'replica', 'migrate', 'up'])
+        self.assertEqual(namespace.database, 'replica')
+        self.assertEqual(namespace.db_command, 'migrate')
+        self.assertEqual(namespace.db_migrate_command, 'up')
+        self.assertEqual(namespace.label, None)
+
+    def test_only_taken_path_is_built(self):
+        # other groups and commands point at missing modules
+        self.manager.call_command('db', 'migrate', 'up', 'head')
+        self.assertEqual(self.manager.registry['cache'].group_manager, None)
+        migrate = self.manager.registry['db'].get_manager().registry[
+            'migrate']
+        self.assertTrue(isinstance(migrate.get_manager().registry['down'],
+            LazyCommand))
+
+    def test_group_help_lists_commands_without_import(self):
+        parser = self.manager.get_parser()
+        cmdparser = parser._subparsers._group_actions[0].choices['db']
+        help = cmdparser.format_help()
+        self.assertIn('usage: prog db', help)
+        self.assertIn('Migrations', help)
+        self.assertIn('seed', help)
+        self.assertEqual(self.manager.registry['cache'].group_manager, None)
+
+    def test_missing_command_of_group(self):
+        stderr = StringIO()
+        with mock.patch.object(sys, 'stderr', stderr):
+            with self.assertRaises(SystemExit) as context:
+                self.manager.call_command('db')
+        self.assertEqual(context.exception.code, 2)
+        self.assertIn('required', stderr.getvalue())
+
+    def test_handle_runs_chosen_command(self):
+        self.manager.get_parser().parse_args(['db', 'migrate', 'up', 'x'])
+        group = self.manager.registry['db'].get_manager().get_command(
+            'migrate')
+        namespace = argparse.Namespace(db_migrate_command='up', label='x')
+        group.handle(namespace)
+        self.assertEqual(self.stdout.getvalue(), 'up x')
+
+    def test_manager_class_path(self):
+        CacheGroup = type('CacheGroup', (CommandGroup,), {
+            'manager_class': 'monolith.cli.base.ExecutionManager',
+            'commands': {'up': UpCommand},
+        })
+        self.manager.register('cache', CacheGroup, force=True)
+        self.manager.call_command('cache', 'up', 'foo')
+        self.assertEqual(self.stdout.getvalue(), 'up foo')
+
+    def test_abbreviations(self):
+        self.manager.abbreviations = True
+        self.manager.call_command('d', 'mig', 'u', 'foo')
+        self.assertEqual(self.stdout.getvalue(), 'up foo')
+
+    def test_lazily_registered_groups(self):
+        self.manager.register('lazydb', 'monolith.tests.test_cli.LazyDbGroup')
+        self.assertEqual(self.manager.get_completions(['lazydb', 'migrate',
+            'u'], 3), ['up'])
+        self.assertEqual(self.manager.get_completions(['lazydb', 'migrate',
+            'up', '--h'], 4), ['--help'])
+        self.assertTrue(isinstance(self.manager.registry['lazydb'],
+            LazyDbGroup))
+        self.manager.abbreviations = True
+        self.manager.register('other', 'monolith.tests.test_cli.LazyDbGroup')
+        self.manager.call_command('oth', 'mig', 'up', 'foo')
+        self.assertEqual(self.stdout.getvalue(), 'up foo')
+
+    def test_get_command_group(self):
+        self.manager.register('lazydb', 'monolith.tests.test_cli.LazyDbGroup')
+        self.manager.register('seed', 'monolith.tests.missing.SeedCommand')
+        manifest = mock.Mock()
+        manifest.get_command.return_value = {'group': False}
+        # manifest tells it's not a group, so the command is not imported
+        self.assertEqual(self.manager.get_command_group('seed', manifest),
+            None)
+        self.assertEqual(self.manager.get_command_group('missing'), None)
+        self.assertTrue(isinstance(self.manager.get_command_group('lazydb'),
+            LazyDbGroup))
+        self.assertTrue(isinstance(self.manager.get_command_group('db'),
+            DbGroup))
+
+    def test_completions(self):
+        self.assertEqual(self.manager.get_completions(['d'], 1), ['db'])
+        self.assertEqual(self.manager.get_completions(['db', ''], 2), [])
+        self.assertEqual(self.manager.get_completions(['db', 'm'], 2),
+            ['migrate'])
+        self.assertEqual(self.manager.get_completions(['db', 'migrate', 'd'],
+            3), ['down'])
+        self.assertEqual(self.manager.get_completions(['db', 'migrate', 'up',
+            '-'], 4), ['--help', '-h'])
+        self.assertEqual(self.manager.registry['cache'].group_manager, None)
+
+
 class TestArg(unittest.TestCase):
 
     def test_args(self):
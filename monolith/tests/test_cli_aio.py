@@ -0,0 +1,128 @@
+import io
+import sys
+import mock
+import shutil
+import argparse
+import tempfile
+from monolith.compat import unittest
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import CommandError
+from monolith.cli.base import ExecutionManager
+from monolith.cli.caching import cacheable
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from monolith.cli.aio import AsyncBaseCommand
+    from monolith.tests.aio_commands import ConcurrentLabelCommand
+    from monolith.tests.aio_commands import SleepCommand
+    from monolith.tests.aio_commands import calls
+
+
+@cacheable
+class RecordsCommand(BaseCommand):
+
+    def handle(self, namespace):
+        for index in range(2):
+            yield 'record%d' % index
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'asyncio commands require '
+    'Python 3.5+')
+
+
+class TestAsyncCommands(unittest.TestCase):
+
+    def setUp(self):
+        del calls[:]
+        self.tmpdir = tempfile.mkdtemp()
+        self.stdout = io.StringIO()
+        self.manager = ExecutionManager(['foobar'], stdout=self.stdout)
+        self.manager.result_cache_path = self.tmpdir
+        self.manager.register('sleep', SleepCommand)
+        self.manager.register('labels', ConcurrentLabelCommand)
+        self.manager.register('records', RecordsCommand)
+
+    def tearDown(self):
+        if self.manager.event_loop is not None:
+            self.manager.event_loop.close()
+        shutil.rmtree(self.tmpdir)
+
+    def acall_command(self, *args):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.manager.acall_command(*args))
+        finally:
+            loop.close()
+
+    def test_async_base_command_handle_not_implemented(self):
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertRaises(NotImplementedError):
+                loop.run_until_complete(
+                    AsyncBaseCommand().handle(argparse.Namespace()))
+        finally:
+            loop.close()
+
+    def test_call_command(self):
+        self.manager.call_command('sleep', 'foo')
+        self.assertEqual(self.stdout.getvalue(), 'foo')
+
+    def test_commands_share_event_loop(self):
+        self.manager.call_command('sleep', 'foo')
+        loop = self.manager.get_event_loop()
+        self.manager.call_command('sleep', 'bar')
+        self.assertIs(self.manager.get_event_loop(), loop)
+        self.assertEqual(self.stdout.getvalue(), 'foobar')
+
+    @mock.patch('monolith.cli.base.sys.stderr')
+    def test_call_command_fails(self, stderr):
+        with self.assertRaises(SystemExit) as context:
+            self.manager.call_command('sleep', 'bad')
+        self.assertEqual(context.exception.code, 7)
+        stderr.write.assert_called_once_with('ERROR: bad name\n')
+
+    def test_label_command_concurrency(self):
+        self.manager.call_command('labels', 'a', 'b', 'c', 'd', 'e')
+        command = self.manager.registry['labels']
+        self.assertEqual(command.max_running, 2)
+        self.assertEqual(sorted(self.stdout.getvalue()), list('abcde'))
+
+    def test_acall_command(self):
+        self.acall_command('sleep', 'foo')
+        self.assertEqual(self.stdout.getvalue(), 'foo')
+        self.assertIsNone(self.manager.event_loop)
+
+    def test_acall_command_fails(self):
+        with self.assertRaises(CommandError) as context:
+            self.acall_command('sleep', 'bad')
+        self.assertEqual(context.exception.code, 7)
+
+    def test_acall_command_abbreviations(self):
+        self.manager.abbreviations = True
+        self.acall_command('sl', 'foo')
+        self.assertEqual(self.stdout.getvalue(), 'foo')
+
+    def test_acall_command_records(self):
+        self.manager.registry['records'].stdout = self.stdout
+        self.acall_command('records')
+        self.assertEqual(self.stdout.getvalue(), 'record0\nrecord1\n')
+
+    def test_acall_command_cached(self):
+        SleepCommand.cacheable = True
+        try:
+            self.acall_command('sleep', 'foo')
+            self.acall_command('sleep', 'foo')
+            with self.assertRaises(CommandError):
+                self.acall_command('sleep', 'bad')
+            with self.assertRaises(CommandError):
+                self.acall_command('sleep', 'bad')
+        finally:
+            del SleepCommand.cacheable
+        self.assertEqual(calls, ['foo', 'bad'])
+        self.assertEqual(self.stdout.getvalue(), 'foofoo')
+
+    def test_acall_command_timings(self):
+        with mock.patch('monolith.cli.base.timings.phase') as phase:
+            self.acall_command('sleep', 'foo')
+        self.assertIn(mock.call('handle', handler='SleepCommand.handle'),
+            phase.call_args_list)
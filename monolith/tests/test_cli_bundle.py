@@ -0,0 +1,174 @@
+import io
+import os
+import sys
+import json
+import mock
+import shutil
+import zipfile
+import tempfile
+import subprocess
+from monolith.compat import unittest
+from monolith.cli.bundle import MANIFEST_NAME
+from monolith.cli.bundle import build_bundle
+from monolith.cli.bundle import get_bundled_packages
+from monolith.cli.bundle import get_entry_point
+from monolith.cli.manifest import Manifest
+
+
+CLI_MODULE = '''
+from monolith.cli.bundle import BundleCommand
+from monolith.cli import ExecutionManager
+from monolith.cli import LazyCommand
+from monolith.cli import SimpleExecutionManager
+
+
+class Manager(ExecutionManager):
+
+    def get_commands_to_register(self):
+        return {
+            'hello': LazyCommand('bundleapp.commands.HelloCommand',
+                help='Says hello'),
+            'bundle': BundleCommand,
+        }
+
+
+def get_simple_manager():
+    return SimpleExecutionManager('app.pyz', {
+        'hello': 'bundleapp.commands.HelloCommand',
+    })
+'''
+
+COMMANDS_MODULE = '''
+import sys
+from monolith.cli import BaseCommand
+from monolith.cli import arg
+
+sys.stderr.write('commands imported\\n')
+
+
+class HelloCommand(BaseCommand):
+    help = 'Says hello'
+    args = [arg('--name', default='world')]
+
+    def handle(self, namespace):
+        self.stdout.write('hello %s from %s\\n' % (namespace.name,
+            __file__))
+'''
+
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        package = os.path.join(self.tmpdir, 'src', 'bundleapp')
+        os.makedirs(package)
+        for filename, content in (('__init__.py', ''), ('cli.py', CLI_MODULE),
+                ('commands.py', COMMANDS_MODULE)):
+            with open(os.path.join(package, filename), 'w') as fout:
+                fout.write(content)
+        sys.path.insert(0, os.path.dirname(package))
+        # commands module reports its import to stderr
+        patcher = mock.patch.object(sys, 'stderr', io.StringIO())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        from bundleapp.cli import Manager
+        self.stderr = io.StringIO()
+        self.manager = Manager(['app.pyz'], stderr=self.stderr)
+        self.output = os.path.join(self.tmpdir, 'app.pyz')
+
+    def tearDown(self):
+        sys.path.remove(os.path.join(self.tmpdir, 'src'))
+        for name in list(sys.modules):
+            if name == 'bundleapp' or name.startswith('bundleapp.'):
+                del sys.modules[name]
+        shutil.rmtree(self.tmpdir)
+
+    def run_bundle(self, *args):
+        env = dict(os.environ)
+        env.pop('PYTHONPATH', None)
+        process = subprocess.Popen([sys.executable, self.output] +
+            list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=self.tmpdir, env=env)
+        stdout, stderr = process.communicate()
+        return process.returncode, stdout.decode('utf-8'), \
+            stderr.decode('utf-8')
+
+    def test_get_entry_point(self):
+        self.assertEqual(get_entry_point(self.manager),
+            'bundleapp.cli:Manager')
+
+    def test_get_entry_point_of_manager_requiring_arguments(self):
+        from bundleapp.cli import get_simple_manager
+        with self.assertRaises(ValueError) as context:
+            get_entry_point(get_simple_manager())
+        self.assertIn('--entry-point', str(context.exception))
+        with self.assertRaises(ValueError):
+            build_bundle(get_simple_manager(), self.output)
+        self.assertFalse(os.path.exists(self.output))
+
+    def test_run_simple_manager(self):
+        from bundleapp.cli import get_simple_manager
+        build_bundle(get_simple_manager(), self.output,
+            'bundleapp.cli:get_simple_manager')
+        status, stdout, stderr = self.run_bundle('hello', '--name', 'foo')
+        self.assertEqual((status, stderr), (0, 'commands imported\n'))
+        self.assertTrue(stdout.startswith('hello foo from '))
+
+    def test_get_bundled_packages(self):
+        self.assertEqual(get_bundled_packages(self.manager,
+            'bundleapp.cli:Manager', ['json']), ['bundleapp', 'json',
+            'monolith'])
+
+    def test_archive_contents(self):
+        names = build_bundle(self.manager, self.output)
+        self.assertTrue(os.access(self.output, os.X_OK))
+        with open(self.output, 'rb') as fin:
+            self.assertTrue(fin.readline().startswith(b'#!/usr/bin/env python'))
+        archive = zipfile.ZipFile(self.output)
+        self.assertEqual(sorted(archive.namelist()), sorted(names))
+        for name in ('__main__.py', '__main__.pyc', 'bundleapp/cli.pyc',
+                'bundleapp/commands.py', 'bundleapp/commands.pyc',
+                'monolith/cli/base.pyc', MANIFEST_NAME):
+            self.assertIn(name, names)
+        self.assertFalse([name for name in names if '/tests/' in name])
+        manifest = json.loads(archive.read(MANIFEST_NAME).decode('utf-8'))
+        self.assertTrue(manifest['bundled'])
+        self.assertEqual(manifest['sources'], {})
+        self.assertEqual(sorted(manifest['commands']), ['bundle', 'hello'])
+        archive.close()
+
+    def test_run_command(self):
+        build_bundle(self.manager, self.output)
+        status, stdout, stderr = self.run_bundle('hello', '--name', 'foo')
+        self.assertEqual(status, 0)
+        # precompiled bytecode is imported
+        self.assertEqual(stdout, 'hello foo from %s\n' % os.path.join(
+            self.output, 'bundleapp', 'commands.pyc'))
+
+    def test_help_is_served_from_manifest(self):
+        build_bundle(self.manager, self.output)
+        status, stdout, stderr = self.run_bundle('hello', '--help')
+        self.assertEqual(status, 0)
+        self.assertIn('--name', stdout)
+        self.assertEqual(stderr, '')
+        status, stdout, stderr = self.run_bundle('--help')
+        self.assertIn('Says hello', stdout)
+        self.assertEqual(stderr, '')
+
+    def test_bundle_command(self):
+        self.manager.stdout = io.StringIO()
+        self.manager.registry['bundle'].stdout = self.manager.stdout
+        self.manager.call_command('bundle', '-o', self.output,
+            '--python', '/opt/python', '--compress')
+        self.assertTrue(self.manager.stdout.getvalue().startswith('Bundled '))
+        with open(self.output, 'rb') as fin:
+            self.assertEqual(fin.readline(), b'#!/opt/python\n')
+        status, stdout, stderr = self.run_bundle('hello')
+        self.assertEqual(status, 0)
+
+    def test_manifest_in_archive(self):
+        build_bundle(self.manager, self.output)
+        manifest = Manifest.load(os.path.join(self.output, MANIFEST_NAME))
+        self.assertTrue(manifest.is_fresh(self.manager))
+        self.assertEqual(Manifest.load(os.path.join(self.output, 'missing')),
+            None)
@@ -0,0 +1,170 @@
+import io
+import os
+import sys
+import time
+import mock
+import shutil
+import tempfile
+from monolith.compat import unittest
+from monolith.cli import BaseCommand
+from monolith.cli.caching import CacheCommand
+from monolith.cli import CommandError
+from monolith.cli import ExecutionManager
+from monolith.cli import arg
+from monolith.cli.caching import cacheable
+from monolith.cli.caching import ResultCache
+
+
+calls = []
+
+
+@cacheable
+class EchoCommand(BaseCommand):
+    args = [arg('words', nargs='*')]
+
+    def handle(self, namespace):
+        calls.append(namespace.words)
+        self.stdout.write(u'%s\n' % ' '.join(namespace.words))
+
+
+@cacheable(ttl=10)
+class FailCommand(BaseCommand):
+
+    def handle(self, namespace):
+        calls.append('fail')
+        self.stdout.write(u'partial\n')
+        raise CommandError('failed', 3)
+
+
+class PlainCommand(BaseCommand):
+
+    def handle(self, namespace):
+        calls.append('plain')
+
+
+class TestCacheable(unittest.TestCase):
+
+    def test_decorator(self):
+        self.assertTrue(EchoCommand.cacheable)
+        self.assertEqual(EchoCommand.cache_ttl, 300)
+        self.assertEqual(FailCommand.cache_ttl, 10)
+        self.assertFalse(PlainCommand.cacheable)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.tmpdir, 'cache'), 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_and_set(self):
+        self.assertEqual(self.cache.get('a'), None)
+        self.cache.set('a', 'out', 2, 'msg')
+        entry = self.cache.get('a', 60)
+        self.assertEqual((entry['stdout'], entry['status'], entry['message']),
+            ('out', 2, 'msg'))
+        self.assertEqual(self.cache.get_stats(), {'hits': 1, 'misses': 1,
+            'evictions': 0, 'expired': 0, 'entries': 1})
+
+    def test_ttl(self):
+        self.cache.set('a', 'out')
+        with mock.patch.object(time, 'time', return_value=time.time() + 61):
+            self.assertEqual(self.cache.get('a', 60), None)
+        self.assertEqual(self.cache.get('a'), None)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['expired'], stats['misses'], stats['entries']),
+            (1, 2, 0))
+
+    def test_least_recently_used_are_evicted(self):
+        self.cache.set('a', 'a')
+        self.cache.set('b', 'b')
+        now = time.time()
+        os.utime(self.cache.get_entry_path('a'), (now - 20, now - 20))
+        os.utime(self.cache.get_entry_path('b'), (now - 10, now - 10))
+        self.cache.get('a')
+        self.cache.set('c', 'c')
+        self.assertEqual(self.cache.get('b'), None)
+        self.assertNotEqual(self.cache.get('a'), None)
+        self.assertNotEqual(self.cache.get('c'), None)
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+
+    def test_clear(self):
+        self.cache.set('a', 'a')
+        self.cache.get('a')
+        self.cache.clear()
+        self.assertEqual(self.cache.get_stats(), {'hits': 0, 'misses': 0,
+            'evictions': 0, 'expired': 0, 'entries': 0})
+
+
+class TestCachedExecution(unittest.TestCase):
+
+    def setUp(self):
+        del calls[:]
+        self.tmpdir = tempfile.mkdtemp()
+        self.stdout = io.StringIO()
+        self.manager = ExecutionManager(['prog'], stdout=self.stdout)
+        self.manager.result_cache_path = self.tmpdir
+        self.manager.register('echo', EchoCommand)
+        self.manager.register('fail', FailCommand)
+        self.manager.register('plain', PlainCommand)
+        self.manager.register('cache', CacheCommand)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def execute(self, *argv):
+        stderr = io.StringIO()
+        with mock.patch.object(sys, 'stderr', stderr):
+            try:
+                self.manager.execute(list(argv))
+            except SystemExit as err:
+                return err.code, stderr.getvalue()
+        return 0, stderr.getvalue()
+
+    def test_output_is_replayed(self):
+        self.execute('echo', 'foo')
+        self.execute('echo', 'foo')
+        self.execute('echo', 'bar')
+        self.assertEqual(calls, [['foo'], ['bar']])
+        self.assertEqual(self.stdout.getvalue(), 'foo\nfoo\nbar\n')
+
+    def test_no_cache(self):
+        self.execute('echo', 'foo')
+        self.execute('echo', '--no-cache', 'foo')
+        self.assertEqual(calls, [['foo'], ['foo']])
+        self.assertEqual(self.stdout.getvalue(), 'foo\nfoo\n')
+
+    def test_failure_is_replayed(self):
+        self.assertEqual(self.execute('fail'), (3, 'ERROR: failed\n'))
+        self.assertEqual(self.execute('fail'), (3, 'ERROR: failed\n'))
+        self.assertEqual(calls, ['fail'])
+        self.assertEqual(self.stdout.getvalue(), 'partial\npartial\n')
+
+    def test_key_includes_working_directory(self):
+        self.execute('echo', 'foo')
+        with mock.patch.object(os, 'getcwd', return_value='/elsewhere'):
+            self.execute('echo', 'foo')
+        self.assertEqual(len(calls), 2)
+
+    def test_plain_commands_are_not_cached(self):
+        self.execute('plain')
+        self.execute('plain')
+        self.assertEqual(calls, ['plain', 'plain'])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        self.assertEqual(self.execute('plain', '--no-cache')[0], 2)
+
+    def test_cache_command(self):
+        self.execute('echo', 'foo')
+        self.execute('echo', 'foo')
+        self.stdout.truncate(0)
+        self.stdout.seek(0)
+        self.manager.registry['cache'].stdout = self.stdout
+        self.execute('cache')
+        self.assertEqual(self.stdout.getvalue(), 'entries: 1\nhits: 1\n'
+            'misses: 1\nevictions: 0\nexpired: 0\n')
+        self.execute('cache', '--clear')
+        self.execute('echo', 'foo')
+        self.assertEqual(len(calls), 2)
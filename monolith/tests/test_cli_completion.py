@@ -2,12 +2,20 @@ import io
 import os
 import sys
 import mock
+import shutil
+import socket
 import argparse
+import tempfile
+import threading
 from monolith.compat import unittest
 from monolith.cli.base import arg
 from monolith.cli.base import ExecutionManager
 from monolith.cli.base import BaseCommand
 from monolith.cli.completion import CompletionCommand
+from monolith.cli.completion import complete_arguments
+from monolith.cli.completion import get_completion_table
+from monolith.cli.completion_server import CompletionServer
+from monolith.cli.completion_server import get_socket_path
 
 
 class TestCompletionCommand(unittest.TestCase):
@@ -22,6 +30,24 @@ class TestCompletionCommand(unittest.TestCase):
         self.assertEqual(command.get_completion_snippet(),
             'foo | FOO_AUTO_COMPLETE')
 
+    def test_get_completion_snippet_daemon(self):
+        command = CompletionCommand('foo')
+        command.daemon = True
+        with mock.patch.object(command, 'get_socket_path') as get_socket_path:
+            get_socket_path.return_value = "/tmp/it's/foo.sock"
+            snippet = command.get_completion_snippet()
+        self.assertIn('nc -U \'/tmp/it\'"\'"\'s/foo.sock\'', snippet)
+        self.assertIn('[ -O \'/tmp/it\'"\'"\'s\' ]', snippet)
+        self.assertNotIn('${reply#OK} )', snippet)
+        self.assertIn('FOO_AUTO_COMPLETE=1', snippet)
+
+    def test_post_register_daemon(self):
+        manager = ExecutionManager()
+        Command = type('Command', (CompletionCommand,), {'daemon': True})
+        manager.register('completion', Command)
+        self.assertEqual(manager.completion_server_path,
+            get_socket_path(manager.prog_name))
+
     def test_handle(self):
         stream = io.StringIO()
         command = CompletionCommand('foo', stream)
@@ -52,6 +78,9 @@ class TestAutocomplete(unittest.TestCase):
         class AddCommand(BaseCommand):
             args = BaseCommand.args + [
                 arg('-f', '--force', action='store_true', default=False),
+                arg('--mode', choices=['fast', 'slow']),
+                arg('target', choices=['bar', 'baz']),
+                arg('items', nargs='*', choices=['one', 'two']),
             ]
 
         self.manager.register('add', AddCommand)
@@ -85,6 +114,18 @@ class TestAutocomplete(unittest.TestCase):
                 self.manager.execute()
         self.assertEqual(self.stdout.getvalue(), 'add annotate')
 
+    @mock.patch.object(sys, 'argv', ['prog', 'a'])
+    def test_autocomplete_spawns_completion_server(self):
+        os.environ['COMP_WORDS'] = 'prog a'
+        os.environ['COMP_CWORD'] = '1'
+        self.manager.completion_server_path = '/tmp/foo.sock'
+        with mock.patch('monolith.cli.completion_server.'
+                'spawn_completion_server') as spawn:
+            with self.assertRaises(SystemExit):
+                self.manager.autocomplete()
+        spawn.assert_called_once_with(self.manager, '/tmp/foo.sock', 600)
+        self.assertEqual(self.stdout.getvalue(), 'add annotate')
+
     @mock.patch.object(sys, 'argv', ['prog', 'a'])
     def test_autocomplete_returns_none_if_wrong_COMP_CWORD_set(self):
         os.environ['COMP_WORDS'] = 'prog a'
@@ -95,14 +136,147 @@ class TestAutocomplete(unittest.TestCase):
                 self.manager.execute()
         self.assertEqual(self.stdout.getvalue(), '')
 
-    # skip until we implement completion for subcommands' arguments
-    #@mock.patch.object(sys, 'argv', ['prog', 'add', '--fo'])
-    #def test_autocomplete_returns_completes_for_subcommands_args(self):
-        #os.environ['COMP_WORDS'] = 'prog add --fo'
-        #os.environ['COMP_CWORD'] = '2'
-        #stream = io.StringIO()
-        #with mock.patch.object(sys, 'stderr', stream):
-            #with self.assertRaises(SystemExit):
-                #self.manager.execute()
-        #self.assertEqual(self.stdout.getvalue(), '--force')
+    @mock.patch.object(sys, 'argv', ['prog', 'add', '--fo'])
+    def test_autocomplete_returns_completes_for_subcommands_args(self):
+        os.environ['COMP_WORDS'] = 'prog add --fo'
+        os.environ['COMP_CWORD'] = '2'
+        stream = io.StringIO()
+        with mock.patch.object(sys, 'stderr', stream):
+            with self.assertRaises(SystemExit):
+                self.manager.execute()
+        self.assertEqual(self.stdout.getvalue(), '--force')
+
+    def test_get_completions_for_option_choices(self):
+        self.assertEqual(self.manager.get_completions(
+            ['add', '--mode', 'f'], 3), ['fast'])
+        self.assertEqual(self.manager.get_completions(
+            ['add', '--mode', ''], 3), ['fast', 'slow'])
+
+    def test_get_completions_for_positionals(self):
+        self.assertEqual(self.manager.get_completions(
+            ['add', '-f', '--mode', 'fast', 'b'], 5), ['bar', 'baz'])
+        self.assertEqual(self.manager.get_completions(
+            ['add', 'bar', ''], 3), ['one', 'two'])
+        self.assertEqual(self.manager.get_completions(
+            ['add', 'bar', 'one', ''], 4), ['one', 'two'])
+
+    def test_get_completions_for_unknown_command(self):
+        self.assertEqual(self.manager.get_completions(['foo', '--'], 2), [])
+
+    def test_get_completions_for_abbreviated_command(self):
+        self.assertEqual(self.manager.get_completions(['ad', '--m'], 2), [])
+        self.manager.abbreviations = True
+        self.assertEqual(self.manager.get_completions(['ad', '--m'], 2),
+            ['--mode'])
+        self.assertEqual(self.manager.get_completions(['a', '--m'], 2), [])
+
+    def test_get_completions_from_manifest(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            self.manager.manifest_path = os.path.join(tmpdir, 'manifest')
+            self.manager.get_manifest(update=True)
+            with mock.patch.object(self.manager, 'get_parser') as get_parser:
+                self.assertEqual(self.manager.get_completions(
+                    ['add', '--fo'], 2), ['--force'])
+                self.assertFalse(get_parser.called)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestCompletionServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'prog.sock')
+        self.manager = ExecutionManager(['prog'])
+        self.manager.register('add', BaseCommand)
+        self.manager.register('annotate', BaseCommand)
+        self.server = CompletionServer(self.manager, self.path, 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def request(self, data):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.path)
+        client.sendall(data)
+        reply = client.makefile('rb').read()
+        client.close()
+        return reply
+
+    def test_serves_completions(self):
+        self.assertTrue(self.server.bind())
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        try:
+            self.assertEqual(self.request(b'1\nprog a\n'), b'OK\nadd\nannotate')
+        finally:
+            self.server.stamps = {'/nonexistent': [0, 0]}
+            self.request(b'')
+            thread.join()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_bind_fails_if_server_is_running(self):
+        self.assertTrue(self.server.bind())
+        try:
+            server = CompletionServer(self.manager, self.path)
+            self.assertFalse(server.bind())
+        finally:
+            self.server.close()
+
+    def test_bind_refuses_socket_of_another_user(self):
+        self.assertTrue(self.server.bind())
+        self.server.socket.close()
+        server = CompletionServer(self.manager, self.path)
+        with mock.patch.object(os, 'getuid', return_value=os.getuid() + 1):
+            self.assertRaises(OSError, server.bind)
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_bind_creates_private_directory(self):
+        path = os.path.join(self.tmpdir, 'sockets', 'prog.sock')
+        server = CompletionServer(self.manager, path)
+        self.assertTrue(server.bind())
+        server.close()
+        self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777,
+            0o700)
+
+    def test_bind_removes_stale_socket(self):
+        self.assertTrue(self.server.bind())
+        self.server.socket.close()
+        server = CompletionServer(self.manager, self.path)
+        self.assertTrue(server.bind())
+        server.close()
+
+
+class TestCompletionTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = get_completion_table([
+            {'option_strings': ['-h', '--help'], 'nargs': 0,
+                'choices': None},
+            {'option_strings': ['-o'], 'nargs': None, 'choices': None},
+            {'option_strings': [], 'nargs': None, 'choices': ['a', 'b']},
+            {'option_strings': [], 'nargs': '*', 'choices': ['c']},
+        ])
+
+    def test_get_completion_table(self):
+        self.assertEqual(self.table, {
+            'options': ['--help', '-h', '-o'],
+            'values': ['-o'],
+            'choices': {},
+            'positionals': [[None, ['a', 'b']], ['*', ['c']]],
+        })
+
+    def test_complete_options(self):
+        self.assertEqual(complete_arguments(self.table, [], '--'),
+            ['--help'])
+
+    def test_complete_option_without_choices(self):
+        self.assertEqual(complete_arguments(self.table, ['-o'], ''), [])
 
+    def test_complete_positionals(self):
+        self.assertEqual(complete_arguments(self.table, [], ''), ['a', 'b'])
+        self.assertEqual(complete_arguments(self.table, ['-o', 'x'], ''),
+            ['a', 'b'])
+        self.assertEqual(complete_arguments(self.table, ['a', 'c'], ''),
+            ['c'])
@@ -0,0 +1,182 @@
+import io
+import os
+import sys
+import mock
+import shutil
+import tempfile
+from monolith.compat import unittest
+from monolith.cli.entrypoints import EntryPointExecutionManager
+from monolith.cli import ExecutionManager
+from monolith.cli import LazyCommand
+from monolith.cli import entrypoints
+from monolith.cli.entrypoints import EntryPointsCache
+from monolith.cli.entrypoints import get_entry_point_class_path
+from monolith.cli.entrypoints import get_path_stamps
+from monolith.cli.entrypoints import scan_entry_points
+
+
+COMMANDS_MODULE = '''
+from monolith.cli import BaseCommand
+
+
+class HelloCommand(BaseCommand):
+
+    def handle(self, namespace):
+        self.stdout.write('hello')
+
+
+class Outer(object):
+
+    class NestedCommand(HelloCommand):
+        pass
+'''
+
+ENTRY_POINTS = '''
+[fooprog.commands]
+hello = fooprogcommands:HelloCommand
+missing = fooprogcommands.missing:Command
+'''
+
+
+class EntryPointsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.site = os.path.join(self.tmpdir, 'site')
+        dist_info = os.path.join(self.site, 'fooprog_plugins-1.0.dist-info')
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as fout:
+            fout.write('Metadata-Version: 2.1\nName: fooprog-plugins\n'
+                'Version: 1.0\n')
+        with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as fout:
+            fout.write(ENTRY_POINTS)
+        with open(os.path.join(self.site, 'fooprogcommands.py'), 'w') as fout:
+            fout.write(COMMANDS_MODULE)
+        self.cache_path = os.path.join(self.tmpdir, 'cache', 'ep.json')
+        sys.path.insert(0, self.site)
+
+    def tearDown(self):
+        sys.path.remove(self.site)
+        sys.modules.pop('fooprogcommands', None)
+        shutil.rmtree(self.tmpdir)
+
+    def get_manager(self, **attrs):
+        Manager = type('Manager', (EntryPointExecutionManager,), dict({
+            'entry_point_cache_path': self.cache_path,
+        }, **attrs))
+        self.stdout = io.StringIO()
+        return Manager(['fooprog'], stdout=self.stdout)
+
+
+class TestScanEntryPoints(EntryPointsTestCase):
+
+    def test_scan_entry_points(self):
+        self.assertEqual(scan_entry_points('fooprog.commands'), {
+            'hello': 'fooprogcommands:HelloCommand',
+            'missing': 'fooprogcommands.missing:Command',
+        })
+        self.assertEqual(scan_entry_points('barprog.commands'), {})
+
+    def test_get_entry_point_class_path(self):
+        self.assertEqual(get_entry_point_class_path('foo.bar:Cmd'),
+            'foo.bar.Cmd')
+        self.assertEqual(get_entry_point_class_path('foo.bar : Cmd [x, y]'),
+            'foo.bar.Cmd')
+        self.assertEqual(get_entry_point_class_path('foo:Outer.Cmd [x]'),
+            'foo:Outer.Cmd')
+
+    def test_get_path_stamps(self):
+        stamps = get_path_stamps([self.site, os.path.join(self.tmpdir, 'x')])
+        self.assertEqual(stamps, [
+            [self.site, os.stat(self.site).st_mtime],
+            [os.path.join(self.tmpdir, 'x'), None],
+        ])
+
+
+class TestEntryPointsCache(EntryPointsTestCase):
+
+    def test_load_saved(self):
+        cache = EntryPointsCache(self.cache_path)
+        self.assertIsNone(cache.load('foo', [['a', 1]]))
+        cache.save('foo', [['a', 1]], {'bar': 'baz:Command'})
+        self.assertEqual(cache.load('foo', [['a', 1]]), {'bar': 'baz:Command'})
+        self.assertIsNone(cache.load('foo', [['a', 2]]))
+        self.assertIsNone(cache.load('other', [['a', 1]]))
+
+
+class TestEntryPointExecutionManager(EntryPointsTestCase):
+
+    def test_registers_lazy_commands(self):
+        manager = self.get_manager()
+        self.assertEqual(manager.get_entry_point_group(), 'fooprog.commands')
+        self.assertEqual(sorted(manager.registry), ['hello', 'missing'])
+        self.assertIsInstance(manager.registry['hello'], LazyCommand)
+        self.assertEqual(manager.registry['hello'].class_path,
+            'fooprogcommands.HelloCommand')
+        self.assertNotIn('fooprogcommands', sys.modules)
+
+    def test_execute(self):
+        manager = self.get_manager()
+        manager.execute(['hello'])
+        self.assertEqual(self.stdout.getvalue(), 'hello')
+
+    def test_execute_entry_points_with_extras_and_nested_classes(self):
+        with mock.patch.object(EntryPointExecutionManager,
+                'get_entry_points', return_value={
+                    'extra': 'fooprogcommands:HelloCommand [color]',
+                    'nested': 'fooprogcommands:Outer.NestedCommand',
+                }):
+            manager = self.get_manager()
+        manager.execute(['extra'])
+        manager.execute(['nested'])
+        self.assertEqual(self.stdout.getvalue(), 'hellohello')
+
+    def test_scan_is_cached(self):
+        with mock.patch.object(entrypoints, 'scan_entry_points',
+                wraps=scan_entry_points) as scan:
+            self.get_manager()
+            self.get_manager()
+        self.assertEqual(scan.call_count, 1)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+    def test_cache_invalidated_when_site_packages_change(self):
+        self.get_manager()
+        with open(os.path.join(self.site, 'new.pth'), 'w'):
+            pass
+        os.utime(self.site, (0, 0))
+        with mock.patch.object(entrypoints, 'scan_entry_points',
+                wraps=scan_entry_points) as scan:
+            self.get_manager()
+        self.assertEqual(scan.call_count, 1)
+
+    def test_caching_disabled(self):
+        with mock.patch.object(entrypoints, 'scan_entry_points',
+                wraps=scan_entry_points) as scan:
+            self.get_manager(entry_point_cache_path=False)
+            self.get_manager(entry_point_cache_path=False)
+        self.assertEqual(scan.call_count, 2)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_default_cache_path(self):
+        cache = os.path.join(self.tmpdir, 'xdg')
+        path = os.path.join(cache, 'monolith',
+            'entry-points-fooprog.commands.json')
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache}):
+            manager = self.get_manager(entry_point_cache_path=None)
+            self.assertEqual(manager.get_entry_point_cache_path(), path)
+        self.assertTrue(os.path.exists(path))
+
+    def test_commands_of_base_class_are_registered(self):
+
+        class Base(ExecutionManager):
+
+            def get_commands_to_register(self):
+                return {'hello': 'monolith.tests.test_cli.DummyCommand'}
+
+        class Manager(EntryPointExecutionManager, Base):
+            entry_point_cache_path = self.cache_path
+
+        manager = Manager(['fooprog'])
+        self.assertEqual(sorted(manager.registry), ['hello', 'missing'])
+        self.assertEqual(manager.registry['hello'].class_path,
+            'monolith.tests.test_cli.DummyCommand')
@@ -0,0 +1,170 @@
+import io
+import sys
+import mock
+import argparse
+from monolith.compat import unittest
+from monolith.cli.base import ExecutionManager
+from monolith.cli.base import Parser
+from monolith.cli.fastparser import CompiledArguments
+from monolith.cli.fastparser import FastParser
+from monolith.tests import test_cli
+from monolith.tests import test_cli_completion
+
+
+class FastParserMixin(object):
+    """
+    Runs tests of the mixed in test case with :class:`FastParser` as
+    manager's *parser_cls*.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(ExecutionManager, 'parser_cls',
+            FastParser)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(FastParserMixin, self).setUp()
+
+
+class TestExecutionManager(FastParserMixin, test_cli.TestExecutionManager):
+    pass
+
+
+class TestBatch(FastParserMixin, test_cli.TestBatch):
+    pass
+
+
+class TestSimpleExecutionManager(FastParserMixin,
+        test_cli.TestSimpleExecutionManager):
+    pass
+
+
+class TestLabelCommand(FastParserMixin, test_cli.TestLabelCommand):
+    pass
+
+
+class TestSingleLabelCommand(FastParserMixin,
+        test_cli.TestSingleLabelCommand):
+    pass
+
+
+class TestAutocomplete(FastParserMixin, test_cli_completion.TestAutocomplete):
+    pass
+
+
+def get_parser(cls, subcommand=False):
+    stream = io.StringIO()
+    parser = cls(prog='prog', stream=stream)
+    target = parser
+    if subcommand:
+        parser.add_argument('--verbose', action='store_true')
+        subparsers = parser.add_subparsers(title='subcommands')
+        target = subparsers.add_parser('cmd', stream=stream)
+        target.set_defaults(func='cmd')
+    target.add_argument('source')
+    target.add_argument('targets', nargs='*')
+    target.add_argument('-f', '--force', action='store_true')
+    target.add_argument('-n', '--count', type=int, default='1')
+    target.add_argument('--mode', choices=['fast', 'slow'])
+    target.add_argument('--tag', action='append')
+    target.add_argument('--pair', nargs=2)
+    target.add_argument('--level', nargs='?', const='high')
+    return parser, stream
+
+
+def parse(cls, argv, subcommand=False):
+    parser, stream = get_parser(cls, subcommand)
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    with mock.patch.object(sys, 'stdout', stdout):
+        with mock.patch.object(sys, 'stderr', stderr):
+            try:
+                namespace, extras = parser.parse_known_args(argv)
+            except SystemExit as err:
+                return 'exit', err.code, stdout.getvalue(), \
+                    stream.getvalue() + stderr.getvalue()
+    return 'ok', vars(namespace), extras
+
+
+class TestFastParser(unittest.TestCase):
+    argvs = [
+        [],
+        ['src'],
+        ['src', 'a', 'b', '-f'],
+        ['-f', 'src', 'a', '--count', '3', 'b'],
+        ['src', '--count=5', '--mode', 'fast', '--tag', 'x', '--tag=y'],
+        ['src', '--pair', 'a', 'b', 'c'],
+        ['src', '--level'],
+        ['src', '--level', 'low', 'x'],
+        ['src', '-', '-1', 'with space'],
+        ['src', '--count', 'x'],
+        ['src', '--mode', 'medium'],
+        ['src', '--mode'],
+        ['src', '--pair', 'a'],
+        ['src', '--unknown', 'x'],
+        ['src', '--', '-f'],
+        ['src', '--cou', '2'],
+        ['src', '-fn', '2'],
+        ['src', '-n2'],
+        ['src', '--force=yes'],
+        ['src', '-h'],
+    ]
+
+    def test_same_results_as_argparse(self):
+        for subcommand in (False, True):
+            for argv in self.argvs:
+                if subcommand:
+                    argv = ['cmd'] + argv
+                self.assertEqual(parse(FastParser, argv, subcommand),
+                    parse(Parser, argv, subcommand), argv)
+
+    def test_fast_path_is_used(self):
+        parser, stream = get_parser(FastParser, subcommand=True)
+        with mock.patch.object(argparse.ArgumentParser,
+                '_parse_known_args') as parse_known_args:
+            namespace = parser.parse_args(['--verbose', 'cmd', 'src', 'a',
+                '-n', '2', '--mode=slow'])
+        self.assertFalse(parse_known_args.called)
+        self.assertEqual(vars(namespace), {
+            'verbose': True,
+            'func': 'cmd',
+            'source': 'src',
+            'targets': ['a'],
+            'force': False,
+            'count': 2,
+            'mode': 'slow',
+            'tag': None,
+            'pair': None,
+            'level': None,
+        })
+
+    def test_falls_back_to_argparse(self):
+        parser, stream = get_parser(FastParser)
+        with mock.patch.object(argparse.ArgumentParser, '_parse_known_args',
+                return_value=(argparse.Namespace(), [])) as parse_known_args:
+            parser.parse_args(['src', '--', '-f'])
+        self.assertTrue(parse_known_args.called)
+
+    def test_unsupported_parser(self):
+        parser, stream = get_parser(FastParser)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--foo', action='store_true')
+        self.assertIsNone(parser.get_compiled_arguments())
+        self.assertEqual(vars(parser.parse_args(['src', '--foo'])),
+            vars(Parser.parse_args(parser, ['src', '--foo'])))
+
+    def test_arguments_are_recompiled(self):
+        parser, stream = get_parser(FastParser)
+        compiled = parser.get_compiled_arguments()
+        self.assertIs(parser.get_compiled_arguments(), compiled)
+        parser.add_argument('--extra')
+        self.assertIsNot(parser.get_compiled_arguments(), compiled)
+        self.assertEqual(parser.parse_args(['src', '--extra', 'x']).extra,
+            'x')
+
+    def test_match_positionals(self):
+        compiled = CompiledArguments(argparse.ArgumentParser())
+        positionals = [('a', 1, 1), ('b', 0, None), ('c', 1, 1)]
+        self.assertEqual(compiled.match_positionals(positionals, 4), [1, 2, 1])
+        self.assertEqual(compiled.match_positionals(positionals, 2), [1, 0, 1])
+        self.assertEqual(compiled.match_positionals(positionals, 1), [1, 0])
+        self.assertEqual(compiled.match_positionals(positionals, 0), [])
@@ -0,0 +1,155 @@
+import io
+import os
+import sys
+import mock
+import shutil
+import tempfile
+from monolith.compat import unittest
+from monolith.cli.base import arg
+from monolith.cli.base import ExecutionManager
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import LazyCommand
+from monolith.cli.manifest import Manifest
+
+
+class FooCommand(BaseCommand):
+    help = 'Foo help'
+    args = [
+        arg('-f', '--force', action='store_true', help='Force it'),
+        arg('--mode', choices=['fast', 'slow']),
+    ]
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'manifest.json')
+        self.manager = ExecutionManager(['foobar'], stderr=io.StringIO())
+        self.manager.manifest_path = self.path
+        self.manager.register('foo',
+            LazyCommand('monolith.tests.test_cli_manifest.FooCommand'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_build(self):
+        manifest = Manifest.build(self.manager)
+        self.assertEqual(manifest.get_command_names(), ['foo'])
+        command = manifest.get_command('foo')
+        self.assertEqual(command['help'], 'Foo help')
+        self.assertEqual(command['group'], False)
+        options = dict((spec['dest'], spec) for spec in
+            manifest.get_args('foo'))
+        self.assertEqual(options['force']['option_strings'],
+            ['-f', '--force'])
+        self.assertEqual(options['mode']['choices'], ['fast', 'slow'])
+        self.assertIn('Force it', manifest.get_help('foo'))
+        self.assertIn('Foo help', manifest.get_help())
+
+    def test_save_and_load(self):
+        Manifest.build(self.manager).save(self.path)
+        manifest = Manifest.load(self.path)
+        self.assertEqual(manifest.get_command_names(), ['foo'])
+        self.assertNotIn('rendered_help', manifest.data)
+        self.assertIsNone(manifest.help_data)
+        self.assertIn('Force it', manifest.get_help('foo'))
+
+    def test_help_of_another_build_is_not_used(self):
+        Manifest.build(self.manager).save(self.path)
+        manifest = Manifest.load(self.path)
+        manifest.data['built'] -= 1
+        self.assertIsNone(manifest.get_help())
+        self.assertIsNone(manifest.get_args('foo'))
+
+    def test_load_missing_file(self):
+        self.assertIsNone(Manifest.load(self.path))
+
+    def test_load_broken_file(self):
+        with open(self.path, 'w') as fout:
+            fout.write('{broken')
+        self.assertIsNone(Manifest.load(self.path))
+
+    def test_is_fresh(self):
+        manifest = Manifest.build(self.manager)
+        manager = ExecutionManager(['foobar'])
+        manager.register('foo',
+            LazyCommand('monolith.tests.test_cli_manifest.FooCommand'))
+        self.assertTrue(manifest.is_fresh(manager))
+
+    def test_is_not_fresh_if_registry_changed(self):
+        manifest = Manifest.build(self.manager)
+        self.manager.register('bar', 'monolith.tests.test_cli.DummyCommand')
+        self.assertFalse(manifest.is_fresh(self.manager))
+
+    def test_is_not_fresh_if_source_changed(self):
+        manifest = Manifest.build(self.manager)
+        path = list(manifest.data['sources'])[0]
+        manifest.data['sources'][path] = [0, 0]
+        self.assertFalse(manifest.is_fresh(self.manager))
+
+    def test_get_manifest_updates_stale_manifest(self):
+        self.assertIsNone(self.manager.get_manifest())
+        self.assertIsNotNone(self.manager.get_manifest(update=True))
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_execute_help_from_manifest(self):
+        self.manager.get_manifest(update=True)
+        manager = ExecutionManager(['foobar'])
+        manager.manifest_path = self.path
+        manager.register('foo',
+            LazyCommand('monolith.tests.test_cli_manifest.FooCommand'))
+        stdout = io.StringIO()
+        with mock.patch('monolith.cli.base.get_class') as get_class:
+            with mock.patch.object(sys, 'stdout', stdout):
+                with self.assertRaises(SystemExit):
+                    manager.execute(['foo', '--help'])
+            self.assertFalse(get_class.called)
+        self.assertIn('Force it', stdout.getvalue())
+
+    def test_execute_top_level_help_from_manifest(self):
+        self.manager.get_manifest(update=True)
+        stdout = io.StringIO()
+        with mock.patch.object(self.manager, 'get_parser') as get_parser:
+            with mock.patch.object(sys, 'stdout', stdout):
+                with self.assertRaises(SystemExit):
+                    self.manager.execute(['--help'])
+            self.assertFalse(get_parser.called)
+        self.assertIn('Foo help', stdout.getvalue())
+
+    def test_execute_help_with_stale_manifest(self):
+        self.manager.get_manifest(update=True)
+        self.manager.register('bar', 'monolith.tests.test_cli.DummyCommand')
+        stdout = io.StringIO()
+        with mock.patch('monolith.cli.manifest.Manifest.build') as build:
+            with mock.patch.object(sys, 'stdout', stdout):
+                with self.assertRaises(SystemExit):
+                    self.manager.execute(['foo', '--help'])
+            self.assertFalse(build.called)
+        self.assertIn('Force it', stdout.getvalue())
+
+    def test_missing_manifest_is_not_built_by_help_or_completion(self):
+        stdout = io.StringIO()
+        with mock.patch.object(sys, 'stdout', stdout):
+            with self.assertRaises(SystemExit):
+                self.manager.execute(['--help'])
+        self.assertEqual(self.manager.get_completions(['f'], 1), ['foo'])
+        self.assertEqual(self.manager.get_completions(['foo', '--fo'], 2),
+            ['--force'])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_completion_loads_manifest_once(self):
+        self.manager.get_manifest(update=True)
+        with mock.patch.object(Manifest, 'load', wraps=Manifest.load) as load:
+            self.assertEqual(self.manager.get_completions(['foo', '--fo'], 2),
+                ['--force'])
+        self.assertEqual(load.call_count, 1)
+
+    def test_execute_without_manifest_path(self):
+        self.manager.manifest_path = None
+        stdout = io.StringIO()
+        with mock.patch.object(sys, 'stdout', stdout):
+            with self.assertRaises(SystemExit):
+                self.manager.execute(['foo', '--help'])
+        self.assertIn('Force it', stdout.getvalue())
+        self.assertFalse(os.path.exists(self.path))
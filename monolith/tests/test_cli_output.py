@@ -0,0 +1,114 @@
+import io
+import os
+import mock
+from monolith.compat import unittest
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import CommandError
+from monolith.cli.base import ExecutionManager
+from monolith.cli.output import BufferedOutput
+from monolith.cli.output import flush_pending_outputs
+from monolith.cli.output import pending_outputs
+from monolith.cli.output import get_buffered_output
+
+
+class PipeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        read_fd, write_fd = os.pipe()
+        self.reader = io.open(read_fd, 'r')
+        self.writer = io.open(write_fd, 'w')
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+
+    def read(self):
+        self.writer.close()
+        return self.reader.read()
+
+
+class TestBufferedOutput(PipeTestCase):
+
+    def test_get_buffered_output_for_in_memory_stream(self):
+        stream = io.StringIO()
+        self.assertIs(get_buffered_output(stream), stream)
+
+    def test_get_buffered_output_for_pipe(self):
+        output = get_buffered_output(self.writer)
+        self.assertIsInstance(output, BufferedOutput)
+        self.assertFalse(output.line_buffered)
+        self.assertIs(get_buffered_output(output), output)
+
+    def test_writes_are_batched(self):
+        self.writer.write = mock.Mock(wraps=self.writer.write)
+        output = BufferedOutput(self.writer, buffer_size=10)
+        output.write('foo\n')
+        output.write('bar\n')
+        self.assertFalse(self.writer.write.called)
+        output.write('baz\n')
+        self.writer.write.assert_called_once_with('foo\nbar\nbaz\n')
+
+    def test_flush_interval(self):
+        output = BufferedOutput(self.writer, flush_interval=0)
+        self.writer.write = mock.Mock()
+        output.write('foo\n')
+        self.writer.write.assert_called_once_with('foo\n')
+
+    def test_flush(self):
+        output = BufferedOutput(self.writer)
+        output.write('foo\n')
+        output.flush()
+        self.assertEqual(self.read(), 'foo\n')
+
+    def test_pending_data_is_flushed_at_exit(self):
+        output = BufferedOutput(self.writer)
+        self.assertNotIn(output, pending_outputs)
+        output.write('foo\n')
+        self.assertIn(output, pending_outputs)
+        flush_pending_outputs()
+        self.assertNotIn(output, pending_outputs)
+        self.assertEqual(self.read(), 'foo\n')
+
+    def test_line_buffered_for_terminal(self):
+        with mock.patch.object(self.writer, 'isatty', return_value=True):
+            output = BufferedOutput(self.writer)
+        self.assertTrue(output.line_buffered)
+        self.writer.write = mock.Mock()
+        output.write('foo')
+        self.assertFalse(self.writer.write.called)
+        output.write(' bar\n')
+        self.writer.write.assert_called_once_with('foo bar\n')
+
+
+class BufferedCommand(BaseCommand):
+    buffered_output = True
+
+    def handle(self, namespace):
+        self.stdout.write('foo\n')
+        self.stdout.write('bar\n')
+        if self.fail:
+            raise CommandError('failed', 3)
+
+
+class TestBufferedCommand(PipeTestCase):
+
+    def test_in_memory_stdout_is_not_wrapped(self):
+        stream = io.StringIO()
+        self.assertIs(BufferedCommand('foo', stream).stdout, stream)
+
+    def test_output_flushed_by_manager(self):
+        manager = ExecutionManager(['foobar'], stdout=self.writer)
+        BufferedCommand.fail = False
+        manager.register('cmd', BufferedCommand)
+        self.assertIsInstance(manager.registry['cmd'].stdout, BufferedOutput)
+        manager.call_command('cmd')
+        self.assertEqual(self.read(), 'foo\nbar\n')
+
+    @mock.patch('monolith.cli.base.sys.stderr')
+    def test_output_flushed_on_command_error(self, stderr):
+        manager = ExecutionManager(['foobar'], stdout=self.writer)
+        BufferedCommand.fail = True
+        manager.register('cmd', BufferedCommand)
+        with self.assertRaises(SystemExit):
+            manager.call_command('cmd')
+        self.assertEqual(self.read(), 'foo\nbar\n')
@@ -0,0 +1,146 @@
+import io
+import sys
+import mock
+import itertools
+from monolith.compat import unittest
+from monolith.cli import BaseCommand
+from monolith.cli import CommandError
+from monolith.cli import ExecutionManager
+from monolith.cli import LabelCommand
+from monolith.cli import arg
+from monolith.cli.pipeline import split_pipeline
+
+
+class Host(object):
+
+    def __init__(self, name, up):
+        self.name = name
+        self.up = up
+
+    def __str__(self):
+        return self.name
+
+
+class ListHostsCommand(BaseCommand):
+    args = [arg('--count', type=int)]
+
+    def handle(self, namespace):
+        names = itertools.count() if namespace.count is None else \
+            range(namespace.count)
+        for index in names:
+            yield Host('host%d' % index, index % 2 == 0)
+
+
+class HeadCommand(BaseCommand):
+    args = [arg('-n', type=int, default=3)]
+
+    def handle(self, namespace):
+        return itertools.islice(namespace.pipeline_input, namespace.n)
+
+
+class PrintCommand(BaseCommand):
+
+    def handle(self, namespace):
+        self.stdout.write(u'print\n')
+
+
+class CheckCommand(LabelCommand):
+    parallel = True
+
+    def handle_label(self, label, namespace):
+        if isinstance(label, Host):
+            label = '%s:%s' % (label.name, label.up and 'up' or 'down')
+        self.stdout.write(u'%s\n' % label)
+
+
+class FailingCommand(BaseCommand):
+
+    def handle(self, namespace):
+        yield 'first'
+        raise CommandError('broken', 4)
+
+
+class TestSplitPipeline(unittest.TestCase):
+
+    def test_split_pipeline(self):
+        self.assertEqual(split_pipeline(['a', '-x', '::', 'b', '::', 'c', 'd'],
+            '::'), [['a', '-x'], ['b'], ['c', 'd']])
+        self.assertEqual(split_pipeline(['a', '::'], '::'), [['a'], []])
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        self.manager = ExecutionManager(['prog'], stdout=self.stdout)
+        for name, Command in (('list-hosts', ListHostsCommand),
+                ('head', HeadCommand), ('print', PrintCommand),
+                ('check', CheckCommand), ('failing', FailingCommand)):
+            self.manager.register(name, Command)
+            self.manager.registry[name].stdout = self.stdout
+
+    def run_pipeline(self, *stages):
+        stderr = io.StringIO()
+        with mock.patch.object(sys, 'stderr', stderr):
+            try:
+                self.manager.pipeline(*stages)
+            except SystemExit as err:
+                return err.code, stderr.getvalue()
+        return 0, stderr.getvalue()
+
+    def test_records_are_passed_as_labels(self):
+        self.assertEqual(self.run_pipeline(['list-hosts', '--count', '3'],
+            ['check']), (0, ''))
+        self.assertEqual(self.stdout.getvalue(),
+            'host0:up\nhost1:down\nhost2:up\n')
+
+    def test_explicit_labels(self):
+        self.run_pipeline(['list-hosts', '--count', '2'], ['check', 'a', '-',
+            'b'])
+        self.assertEqual(self.stdout.getvalue(),
+            'a\nhost0:up\nhost1:down\nb\n')
+
+    def test_unbounded_stream(self):
+        self.run_pipeline(['list-hosts'], ['head', '-n', '2'], ['check',
+            '-j', '2'])
+        self.assertEqual(self.stdout.getvalue(), 'host0:up\nhost1:down\n')
+
+    def test_records_of_last_stage_are_written(self):
+        self.run_pipeline(['list-hosts'], ['head'])
+        self.assertEqual(self.stdout.getvalue(), 'host0\nhost1\nhost2\n')
+        self.manager.call_command('list-hosts', '--count', '1')
+        self.assertEqual(self.stdout.getvalue(),
+            'host0\nhost1\nhost2\nhost0\n')
+
+    def test_stage_not_producing_records(self):
+        self.assertEqual(self.run_pipeline(['print'], ['check']), (2,
+            'ERROR: PrintCommand command does not produce records\n'))
+        self.assertEqual(self.stdout.getvalue(), 'print\n')
+
+    def test_upstream_failure(self):
+        self.assertEqual(self.run_pipeline(['failing'], ['check']), (4,
+            'ERROR: broken\n'))
+        self.assertEqual(self.stdout.getvalue(), 'first\n')
+
+    def test_stages_are_parsed_first(self):
+        parser = self.manager.get_cached_parser()
+        with mock.patch.object(parser, '_print_message'):
+            status, stderr = self.run_pipeline(['list-hosts'], ['check',
+                '--bad'])
+        self.assertEqual(status, 2)
+        self.assertEqual(self.stdout.getvalue(), '')
+
+    def test_separator(self):
+        self.manager.pipeline_separator = '|'
+        self.manager.execute(['list-hosts', '--count', '1', '|', 'check'])
+        self.assertEqual(self.manager.run_args(['list-hosts', '--count', '1',
+            '|', 'head', '|', 'check']), 0)
+        self.assertEqual(self.stdout.getvalue(), 'host0:up\nhost0:up\n')
+        with mock.patch.object(self.manager.get_cached_parser(), 'error',
+                side_effect=SystemExit(2)) as error:
+            self.assertEqual(self.manager.run_args(['list-hosts', '|']), 2)
+        error.assert_called_once_with('empty pipeline stage')
+
+    def test_separator_is_disabled_by_default(self):
+        self.manager.call_command('check', 'a', '|', 'b')
+        self.assertEqual(self.stdout.getvalue(), 'a\n|\nb\n')
@@ -0,0 +1,135 @@
+import io
+import os
+import mock
+import shutil
+import pstats
+import tempfile
+from monolith.compat import unittest
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import CommandError
+from monolith.cli.base import CommandGroup
+from monolith.cli.base import ExecutionManager
+from monolith.cli.profiling import get_report
+from monolith.cli.profiling import profile_registration
+
+
+class Command(BaseCommand):
+
+    def handle(self, namespace):
+        self.stdout.write('handled')
+
+
+class Group(CommandGroup):
+    commands = {'foo': Command}
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'foo.prof')
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+        self.manager = ExecutionManager(['foobar'], stdout=self.stdout,
+            stderr=self.stderr)
+        self.manager.profiling = True
+        self.manager.register('foo', Command)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @mock.patch.object(os, 'environ', {})
+    def test_get_profile_path(self):
+        args = ['--profile', 'foo']
+        self.assertEqual(self.manager.get_profile_path(args), 'foobar.prof')
+        self.assertEqual(args, ['foo'])
+        args = ['--profile=out.prof', 'foo']
+        self.assertEqual(self.manager.get_profile_path(args), 'out.prof')
+        self.assertEqual(args, ['foo'])
+        args = ['foo', '--profile']
+        self.assertIsNone(self.manager.get_profile_path(args))
+        self.assertEqual(args, ['foo', '--profile'])
+
+    @mock.patch.object(os, 'environ', {})
+    def test_get_profile_path_if_profiling_disabled(self):
+        self.manager.profiling = False
+        args = ['--profile', 'foo']
+        self.assertIsNone(self.manager.get_profile_path(args))
+        self.assertEqual(args, ['--profile', 'foo'])
+
+    def test_get_profile_path_from_environment(self):
+        self.manager.profiling = False
+        with mock.patch.object(os, 'environ', {'MONOLITH_PROFILE': 'a.prof'}):
+            self.assertEqual(self.manager.get_profile_path(['foo']), 'a.prof')
+        with mock.patch.object(os, 'environ', {'MONOLITH_PROFILE': '1'}):
+            self.assertEqual(self.manager.get_profile_path(['foo']),
+                'foobar.prof')
+
+    def test_execute_profiled(self):
+        self.manager.execute(['--profile=%s' % self.path, 'foo'])
+        self.assertEqual(self.stdout.getvalue(), 'handled')
+        stats = pstats.Stats(self.path)
+        self.assertTrue(any(func[2] == 'handle' for func in stats.stats))
+        report = self.stderr.getvalue()
+        self.assertIn('Profile statistics written to %s' % self.path, report)
+        self.assertIn('get_parser: ', report)
+        self.assertIn('parse_args: ', report)
+        self.assertIn('handle: ', report)
+
+    @mock.patch('monolith.cli.base.sys.stderr')
+    def test_execute_profiled_failing_command(self, stderr):
+        def handle(namespace):
+            raise CommandError('failed')
+        self.manager.registry['foo'].handle = handle
+        with self.assertRaises(SystemExit):
+            self.manager.execute(['--profile=%s' % self.path, 'foo'])
+        self.assertTrue(os.path.exists(self.path))
+        self.assertIn('handle: ', self.stderr.getvalue())
+
+    def test_registration_is_profiled(self):
+        Manager = type('Manager', (ExecutionManager,), {
+            'get_commands_to_register': lambda self: {'foo': Command}})
+        with mock.patch.object(os, 'environ', {'MONOLITH_PROFILE': self.path}):
+            manager = Manager(['foobar'], stdout=self.stdout,
+                stderr=self.stderr)
+            manager.execute(['foo'])
+        self.assertEqual(self.stdout.getvalue(), 'handled')
+        stats = pstats.Stats(self.path)
+        self.assertTrue(any(func[2] == 'register' for func in stats.stats))
+        self.assertTrue(any(func[2] == 'handle' for func in stats.stats))
+        report = self.stderr.getvalue()
+        self.assertIn('(registry: ', report)
+        self.assertIn('get_parser: ', report)
+
+    def test_command_group_is_profiled(self):
+        Manager = type('Manager', (ExecutionManager,), {
+            'get_commands_to_register': lambda self: {'group': Group}})
+        with mock.patch.object(os, 'environ', {'MONOLITH_PROFILE': self.path}):
+            manager = Manager(['foobar'], stdout=self.stdout,
+                stderr=self.stderr)
+            manager.execute(['group', 'foo'])
+        self.assertEqual(self.stdout.getvalue(), 'handled')
+        self.assertIn('(registry: ', self.stderr.getvalue())
+
+    def test_registration_under_another_profiler(self):
+        manager = mock.Mock()
+        with mock.patch('monolith.cli.profiling.cProfile.Profile') as Profile:
+            Profile.return_value.enable.side_effect = ValueError(
+                'Another profiling tool is already active')
+            self.assertEqual(profile_registration(manager), None)
+        manager.register_commands.assert_called_once_with()
+
+    def test_registration_is_not_profiled_without_environment(self):
+        with mock.patch.object(os, 'environ', {}):
+            manager = ExecutionManager(['foobar'])
+        self.assertEqual(manager.registry_profile, None)
+
+    def test_get_report(self):
+        report = get_report([('get_parser', 0.5), ('parse_args', 0.25),
+            ('handle', 2)], 'foo.prof')
+        self.assertEqual(report, '\n'.join((
+            'Profile statistics written to foo.prof',
+            'framework: 0.750s (get_parser: 0.500s, parse_args: 0.250s)',
+            'handle: 2.000s',
+            '',
+        )))
@@ -0,0 +1,279 @@
+import io
+import os
+import sys
+import mock
+import shutil
+import tempfile
+from monolith.compat import unittest
+from monolith.cli import ExecutionManager
+from monolith.cli.scanning import PackageExecutionManager
+from monolith.cli import LabelCommand
+from monolith.cli import scanning
+from monolith.cli.scanning import ScannedCommand
+from monolith.cli.scanning import get_command_name
+from monolith.cli.scanning import scan_package
+
+
+SYNC_MODULE = '''
+from monolith.cli import BaseCommand, arg
+
+
+class SyncAllCommand(BaseCommand):
+    help = 'Synchronizes everything'
+    args = [
+        arg('-f', '--force', action='store_true'),
+        arg('--mode', choices=['fast', 'slow'], help='Sync mode'),
+        arg('--retries', type=int, default=3),
+    ]
+
+    def handle(self, namespace):
+        self.stdout.write('sync %s' % namespace.mode)
+
+
+class Helper(object):
+
+    def handle(self, namespace):
+        pass
+'''
+
+LABELS_MODULE = '''
+from monolith.cli import LabelCommand as Base
+from monolith.cli import arg
+
+HELP = 'Removes everything'
+
+
+class ProjectCommand(Base):
+    args = Base.args + [arg('--dry-run', action='store_true')]
+    parallel = True
+
+
+class BuildCommand(ProjectCommand):
+    name = 'make'
+    help = 'Builds projects'
+    args = ProjectCommand.args + [arg('--target')]
+
+    def handle_label(self, label, namespace):
+        self.stdout.write('build %s' % label)
+
+
+class CleanCommand(ProjectCommand):
+    args = [arg('--everything', action='store_true', help=HELP)]
+
+    def handle_label(self, label, namespace):
+        pass
+
+
+class _PrivateCommand(Base):
+
+    def handle_label(self, label, namespace):
+        pass
+'''
+
+MIGRATE_MODULE = '''
+from monolith.cli.base import SingleLabelCommand
+
+
+class Command(SingleLabelCommand):
+    name = 'migrate'
+    label_default_value = 'head'
+
+    def handle_label(self, label, namespace):
+        self.stdout.write('migrate %s' % label)
+
+
+class Hidden(Command):
+    name = None
+'''
+
+BROKEN_MODULE = '''
+class Broken(BaseCommand:
+'''
+
+
+class ScanningTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.package = os.path.join(self.tmpdir, 'scanpkg')
+        self.commands = os.path.join(self.package, 'commands')
+        os.makedirs(os.path.join(self.commands, 'db'))
+        os.makedirs(os.path.join(self.commands, 'data'))
+        self.write('__init__.py', '', self.package)
+        self.write('__init__.py', '')
+        self.write('sync.py', SYNC_MODULE)
+        self.write('labels.py', LABELS_MODULE)
+        self.write('broken.py', BROKEN_MODULE)
+        self.write('__init__.py', '', os.path.join(self.commands, 'db'))
+        self.write('migrate.py', MIGRATE_MODULE, os.path.join(self.commands,
+            'db'))
+        # not a package (no __init__.py)
+        self.write('loader.py', SYNC_MODULE, os.path.join(self.commands,
+            'data'))
+        self.cache_path = os.path.join(self.tmpdir, 'cache', 'scan.json')
+        sys.path.insert(0, self.tmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        for name in list(sys.modules):
+            if name == 'scanpkg' or name.startswith('scanpkg.'):
+                del sys.modules[name]
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, filename, content, directory=None):
+        path = os.path.join(directory or self.commands, filename)
+        with open(path, 'w') as fout:
+            fout.write(content)
+        return path
+
+    def get_imported_modules(self):
+        return sorted(name for name in sys.modules if
+            name.startswith('scanpkg.commands.'))
+
+    def get_manager(self, **attrs):
+        Manager = type('Manager', (PackageExecutionManager,), dict({
+            'commands_package': 'scanpkg.commands',
+            'scan_cache_path': self.cache_path,
+        }, **attrs))
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+        return Manager(['prog'], stdout=self.stdout, stderr=self.stderr)
+
+
+class TestScanPackage(ScanningTestCase):
+
+    def test_get_command_name(self):
+        self.assertEqual(get_command_name('SyncAllCommand'), 'sync-all')
+        self.assertEqual(get_command_name('Command'), 'command')
+        self.assertEqual(get_command_name('HTTPGet'), 'httpget')
+        self.assertEqual(get_command_name('Build2Command'), 'build2')
+
+    def test_scan_package(self):
+        commands = scan_package('scanpkg.commands', self.cache_path)
+        self.assertEqual(sorted(commands), ['clean', 'make', 'migrate',
+            'sync-all'])
+        self.assertEqual(self.get_imported_modules(), [])
+        sync = commands['sync-all']
+        self.assertTrue(isinstance(sync, ScannedCommand))
+        self.assertEqual(sync.class_path, 'scanpkg.commands.sync.SyncAllCommand')
+        self.assertEqual(sync.help, 'Synchronizes everything')
+        self.assertEqual(sync.base_path, 'monolith.cli.base.BaseCommand')
+        self.assertEqual(sync.args, [
+            [['-f', '--force'], {'action': 'store_true'}],
+            [['--mode'], {'choices': ['fast', 'slow'], 'help': 'Sync mode'}],
+            [['--retries'], {'default': 3}],
+        ])
+        self.assertEqual(commands['migrate'].class_path,
+            'scanpkg.commands.db.migrate.Command')
+
+    def test_inherited_args_and_attributes(self):
+        commands = scan_package('scanpkg.commands', self.cache_path)
+        make = commands['make']
+        self.assertEqual(make.base_path, 'monolith.cli.base.LabelCommand')
+        self.assertEqual(make.help, 'Builds projects')
+        self.assertEqual(make.attrs, {'parallel': True})
+        self.assertEqual(make.args, [
+            [['--dry-run'], {'action': 'store_true'}],
+            [['--target'], {}],
+        ])
+        self.assertEqual([argument.args for argument in
+            make.get_static_args()], [('--dry-run',), ('--target',),
+            ('labels',), ('-j', '--jobs')])
+        self.assertEqual(self.get_imported_modules(), [])
+
+    def test_dynamic_args(self):
+        commands = scan_package('scanpkg.commands', self.cache_path)
+        self.assertEqual(commands['clean'].args, None)
+        self.assertEqual(commands['clean'].get_static_args(), None)
+
+    def test_get_static_args_of_single_label_command(self):
+        commands = scan_package('scanpkg.commands', self.cache_path)
+        args = commands['migrate'].get_static_args()
+        self.assertEqual(args[-1].args, ('label',))
+        self.assertEqual(args[-1].kwargs, {'default': 'head', 'nargs': '?'})
+
+    def test_cached_files_are_not_parsed_again(self):
+        scan_package('scanpkg.commands', self.cache_path)
+        self.assertTrue(os.path.exists(self.cache_path))
+        with mock.patch.object(scanning, 'scan_file') as scan_file:
+            commands = scan_package('scanpkg.commands', self.cache_path)
+        self.assertFalse(scan_file.called)
+        self.assertEqual(sorted(commands), ['clean', 'make', 'migrate',
+            'sync-all'])
+
+    def test_changed_files_are_parsed_again(self):
+        scan_package('scanpkg.commands', self.cache_path)
+        path = self.write('sync.py', SYNC_MODULE.replace('SyncAll', 'Pull'))
+        mtime = os.stat(path).st_mtime + 10
+        os.utime(path, (mtime, mtime))
+        os.remove(os.path.join(self.commands, 'db', 'migrate.py'))
+        with mock.patch.object(scanning, 'scan_file',
+                wraps=scanning.scan_file) as scan_file:
+            commands = scan_package('scanpkg.commands', self.cache_path)
+        scan_file.assert_called_once_with(path)
+        self.assertEqual(sorted(commands), ['clean', 'make', 'pull'])
+
+    def test_missing_package(self):
+        with self.assertRaises(ImportError):
+            scan_package('scanpkg.missing', self.cache_path)
+
+
+class TestPackageExecutionManager(ScanningTestCase):
+
+    def test_commands_are_registered_lazily(self):
+        manager = self.get_manager()
+        self.assertEqual(manager.get_command_names(), ['clean', 'make',
+            'migrate', 'sync-all'])
+        manager.get_parser()
+        self.assertEqual(self.get_imported_modules(), [])
+
+    def test_execute_imports_only_run_command(self):
+        manager = self.get_manager()
+        manager.execute(['make', 'foo'])
+        self.assertEqual(self.stdout.getvalue(), 'build foo')
+        self.assertEqual(self.get_imported_modules(), ['scanpkg.commands.labels'])
+        self.assertTrue(isinstance(manager.registry['make'], LabelCommand))
+
+    def test_command_help_without_import(self):
+        manager = self.get_manager()
+        stdout = io.StringIO()
+        with mock.patch.object(sys, 'stdout', stdout):
+            with self.assertRaises(SystemExit) as context:
+                manager.execute(['sync-all', '--help'])
+        self.assertEqual(context.exception.code, 0)
+        self.assertIn('usage: prog sync-all', stdout.getvalue())
+        self.assertIn('Synchronizes everything', stdout.getvalue())
+        self.assertIn('--mode {fast,slow}', stdout.getvalue())
+        self.assertEqual(self.get_imported_modules(), [])
+
+    def test_completion_table_without_import(self):
+        manager = self.get_manager()
+        table = manager.get_completion_table('make')
+        self.assertEqual(table['options'], ['--dry-run', '--help', '--jobs',
+            '--target', '-h', '-j'])
+        self.assertEqual(self.get_imported_modules(), [])
+
+    def test_completion_table_of_dynamic_command_imports_it(self):
+        manager = self.get_manager()
+        with mock.patch.object(scanning.ScannedCommand, 'get_static_args',
+                return_value=None):
+            table = manager.get_completion_table('sync-all')
+        self.assertIn('--mode', table['options'])
+        self.assertEqual(self.get_imported_modules(), [
+            'scanpkg.commands.sync'])
+
+    def test_registered_commands_take_precedence(self):
+        Command = type('Command', (LabelCommand,), {})
+        with mock.patch.object(ExecutionManager, 'get_commands_to_register',
+                return_value={'make': Command}):
+            manager = self.get_manager()
+        self.assertTrue(isinstance(manager.registry['make'], Command))
+        self.assertIn('sync-all', manager.registry)
+
+    def test_scan_cache_path(self):
+        manager = self.get_manager(scan_cache_path=None)
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmpdir}):
+            self.assertEqual(manager.get_scan_cache_path(), os.path.join(
+                self.tmpdir, 'monolith', 'scan-scanpkg.commands.json'))
+        manager.scan_cache_path = False
+        self.assertEqual(manager.get_scan_cache_path(), None)
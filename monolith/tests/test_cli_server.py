@@ -0,0 +1,238 @@
+import io
+import os
+import sys
+import time
+import mock
+import shutil
+import socket
+import tempfile
+import subprocess
+from monolith.compat import unittest
+from monolith.cli import client
+from monolith.cli.client import get_socket_path
+from monolith.cli.client import is_safe_directory
+from monolith.cli.client import is_trusted_socket
+from monolith.cli.client import make_socket_directory
+from monolith.cli.client import run_client
+from monolith.cli.server import get_exit_status
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+APP_MODULE = '''
+import os
+import sys
+from monolith.cli import BaseCommand
+from monolith.cli import CommandError
+from monolith.cli import ExecutionManager
+from monolith.cli.server import ServerCommand
+from monolith.cli import arg
+
+
+class EchoCommand(BaseCommand):
+    args = [arg('words', nargs='*')]
+
+    def handle(self, namespace):
+        self.stdout.write('%s|%s|%s|%s\\n' % (' '.join(namespace.words),
+            os.getcwd(), os.environ.get('SRVAPP_VAR'), sys.stdin.read()))
+
+
+class FailCommand(BaseCommand):
+
+    def handle(self, namespace):
+        sys.stderr.write('failing\\n')
+        raise CommandError('failed', 3)
+
+
+class PidCommand(BaseCommand):
+
+    def handle(self, namespace):
+        self.stdout.write('%d %s\\n' % (os.getpid(), 'json' in sys.modules))
+
+
+class Server(ServerCommand):
+    preload_modules = ['json']
+
+
+if __name__ == '__main__':
+    manager = ExecutionManager()
+    manager.register('echo', EchoCommand)
+    manager.register('fail', FailCommand)
+    manager.register('pid', PidCommand)
+    manager.register('serve', Server)
+    manager.execute()
+'''
+
+
+def is_supported():
+    return hasattr(socket, 'AF_UNIX') and hasattr(socket.socket, 'sendmsg')
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_get_exit_status(self):
+        self.assertEqual(get_exit_status(None), 0)
+        self.assertEqual(get_exit_status(3), 3)
+        stderr = io.StringIO()
+        with mock.patch.object(sys, 'stderr', stderr):
+            self.assertEqual(get_exit_status('bad things'), 1)
+        self.assertEqual(stderr.getvalue(), 'bad things\n')
+
+    def test_get_socket_path(self):
+        with mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR': '/run/user/7'}):
+            self.assertEqual(get_socket_path('foo'),
+                '/run/user/7/monolith-%d/foo-server.sock' % os.getuid())
+
+
+class TestSocketTrust(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'srv.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_is_safe_directory(self):
+        self.assertTrue(is_safe_directory(self.tmpdir))
+        os.chmod(self.tmpdir, 0o777)
+        self.assertFalse(is_safe_directory(self.tmpdir))
+        os.chmod(self.tmpdir, 0o1777)
+        self.assertTrue(is_safe_directory(self.tmpdir))
+        self.assertFalse(is_safe_directory(os.path.join(self.tmpdir,
+            'missing')))
+
+    def test_make_socket_directory(self):
+        path = os.path.join(self.tmpdir, 'sockets')
+        make_socket_directory(path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+        make_socket_directory(path)
+        os.chmod(path, 0o755)
+        make_socket_directory(path)
+        os.chmod(path, 0o777)
+        self.assertRaises(OSError, make_socket_directory, path)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets required')
+    def test_is_trusted_socket(self):
+        self.assertFalse(is_trusted_socket(self.path))
+        with open(self.path, 'w'):
+            pass
+        self.assertFalse(is_trusted_socket(self.path))
+        os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        try:
+            self.assertTrue(is_trusted_socket(self.path))
+            with mock.patch.object(os, 'getuid', return_value=os.getuid() +
+                    1):
+                self.assertFalse(is_trusted_socket(self.path))
+        finally:
+            sock.close()
+
+
+@unittest.skipUnless(is_supported(), 'Unix sockets with SCM_RIGHTS required')
+class TestCommandServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmpdir, 'srv.sock')
+        script = os.path.join(cls.tmpdir, 'srvapp.py')
+        with open(script, 'w') as fout:
+            fout.write(APP_MODULE)
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        cls.process = subprocess.Popen([sys.executable, script, 'serve',
+            '--socket', cls.path], env=env)
+        deadline = time.time() + 10
+        while not os.path.exists(cls.path) and time.time() < deadline:
+            time.sleep(0.01)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.process.terminate()
+        cls.process.wait()
+        shutil.rmtree(cls.tmpdir)
+
+    def run_client(self, argv, stdin=''):
+        with tempfile.TemporaryFile() as fin:
+            with tempfile.TemporaryFile() as fout:
+                with tempfile.TemporaryFile() as ferr:
+                    fin.write(stdin.encode('utf-8'))
+                    fin.seek(0)
+                    status = run_client(self.path, argv, fds=(fin.fileno(),
+                        fout.fileno(), ferr.fileno()))
+                    fout.seek(0)
+                    ferr.seek(0)
+                    return status, fout.read().decode('utf-8'), \
+                        ferr.read().decode('utf-8')
+
+    def test_run_command(self):
+        with mock.patch.dict(os.environ, {'SRVAPP_VAR': 'foo'}):
+            status, stdout, stderr = self.run_client(['echo', 'a', 'b'],
+                'input')
+        self.assertEqual(status, 0)
+        self.assertEqual(stdout, 'a b|%s|foo|input\n' % os.getcwd())
+        self.assertEqual(stderr, '')
+
+    def test_exit_status(self):
+        status, stdout, stderr = self.run_client(['fail'])
+        self.assertEqual(status, 3)
+        self.assertEqual(stderr, 'failing\nERROR: failed\n')
+
+    def test_parser_error(self):
+        status, stdout, stderr = self.run_client(['missing'])
+        self.assertEqual(status, 2)
+        self.assertIn('invalid choice', stderr)
+
+    def test_each_request_runs_at_new_process(self):
+        status, first, stderr = self.run_client(['pid'])
+        status, second, stderr = self.run_client(['pid'])
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.endswith(' True\n'))
+        self.assertNotEqual(int(first.split()[0]), self.process.pid)
+
+    def test_untrusted_server_is_not_used(self):
+        stderr = io.StringIO()
+        with mock.patch.object(client, 'get_peer_uid',
+                return_value=os.getuid() + 1):
+            with mock.patch.object(sys, 'stderr', stderr):
+                self.assertEqual(self.run_client(['echo', 'a'])[0], 1)
+                with mock.patch.object(client.os, 'execvp') as execvp:
+                    run_client(self.path, ['echo'], fallback=['srvapp'])
+        execvp.assert_called_once_with('srvapp', ['srvapp', 'echo'])
+        self.assertIn('not available', stderr.getvalue())
+
+    def test_invalid_request_is_ignored(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.sendall(b'garbage\n')
+        sock.close()
+        status, stdout, stderr = self.run_client(['echo', 'ok'])
+        self.assertEqual(status, 0)
+
+
+@unittest.skipUnless(is_supported(), 'Unix sockets with SCM_RIGHTS required')
+class TestClientFallback(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'missing.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_server_not_available(self):
+        stderr = io.StringIO()
+        with mock.patch.object(sys, 'stderr', stderr):
+            self.assertEqual(run_client(self.path, ['echo']), 1)
+        self.assertIn('not available', stderr.getvalue())
+
+    def test_fallback(self):
+        with mock.patch.object(sys, 'stderr', io.StringIO()) as stderr:
+            with mock.patch.object(client.os, 'execvp') as execvp:
+                run_client(self.path, ['echo', 'a'], fallback=['srvapp',
+                    '--direct'])
+        execvp.assert_called_once_with('srvapp', ['srvapp', '--direct',
+            'echo', 'a'])
+        self.assertIn('not available', stderr.getvalue())
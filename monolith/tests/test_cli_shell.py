@@ -0,0 +1,137 @@
+import io
+import sys
+import mock
+from monolith.compat import unittest
+from monolith.cli import BaseCommand
+from monolith.cli import CommandError
+from monolith.cli import ExecutionManager
+from monolith.cli import LazyCommand
+from monolith.cli.shell import ShellCommand
+from monolith.cli import arg
+from monolith.cli.shell import Shell
+
+
+class EchoCommand(BaseCommand):
+    args = [
+        arg('--mode', choices=['fast', 'slow']),
+        arg('words', nargs='*'),
+    ]
+
+    def handle(self, namespace):
+        self.stdout.write(u'%s\n' % ' '.join(namespace.words))
+
+
+class FailCommand(BaseCommand):
+
+    def handle(self, namespace):
+        raise CommandError('failed', 3)
+
+
+class InterruptedCommand(BaseCommand):
+
+    def handle(self, namespace):
+        raise KeyboardInterrupt
+
+
+class TestShell(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+        self.manager = ExecutionManager(['prog'], stdout=self.stdout,
+            stderr=self.stderr)
+        self.manager.register('echo', EchoCommand)
+        self.manager.register('fail', FailCommand)
+        self.manager.register('interrupted', InterruptedCommand)
+        self.manager.register('lazy', LazyCommand('monolith.tests.missing.Cmd',
+            help='Never imported'))
+        self.shell_stdout = io.StringIO()
+
+    def run_shell(self, lines):
+        stdin = io.StringIO(u''.join(line + '\n' for line in lines))
+        stderr = io.StringIO()
+        with mock.patch.object(sys, 'stderr', stderr):
+            status = self.manager.shell(stdin=stdin, stdout=self.shell_stdout)
+        return status, stderr.getvalue()
+
+    def test_runs_lines(self):
+        status, stderr = self.run_shell(['echo foo', '', '# comment',
+            'echo "bar baz"'])
+        self.assertEqual(status, 0)
+        self.assertEqual(self.stdout.getvalue(), 'foo\nbar baz\n')
+        self.assertIn('prog> ', self.shell_stdout.getvalue())
+
+    def test_command_error_does_not_leave_shell(self):
+        status, stderr = self.run_shell(['fail', 'echo after'])
+        self.assertEqual(stderr, 'ERROR: failed\n')
+        self.assertEqual(self.stdout.getvalue(), 'after\n')
+        self.assertEqual(status, 0)
+
+    def test_status_of_last_command(self):
+        status, stderr = self.run_shell(['echo foo', 'fail'])
+        self.assertEqual(status, 3)
+
+    def test_parser_error_does_not_leave_shell(self):
+        status, stderr = self.run_shell(['echo --mode bad', 'echo after'])
+        self.assertEqual(self.stdout.getvalue(), 'after\n')
+
+    def test_keyboard_interrupt_stops_command(self):
+        status, stderr = self.run_shell(['interrupted', 'echo after'])
+        self.assertEqual(self.stdout.getvalue(), 'after\n')
+
+    def test_unbalanced_quotes(self):
+        status, stderr = self.run_shell(['echo "foo'])
+        self.assertEqual(status, 2)
+        self.assertIn('prog: No closing quotation', self.stderr.getvalue())
+
+    def test_exit(self):
+        status, stderr = self.run_shell(['exit', 'echo never'])
+        self.assertEqual(self.stdout.getvalue(), '')
+
+    def test_parser_is_reused(self):
+        with mock.patch.object(self.manager, 'get_parser',
+                wraps=self.manager.get_parser) as get_parser:
+            self.run_shell(['echo a', 'echo b', 'echo c'])
+        self.assertEqual(get_parser.call_count, 1)
+
+    def test_shell_command(self):
+        self.manager.register('shell', ShellCommand)
+        with mock.patch.object(ExecutionManager, 'shell',
+                return_value=0) as shell:
+            self.manager.call_command('shell')
+        shell.assert_called_once_with()
+
+    def test_shell_command_exit_status(self):
+        self.manager.register('shell', ShellCommand)
+        with mock.patch.object(ExecutionManager, 'shell', return_value=3):
+            self.assertEqual(self.manager.run_args(['shell']), 3)
+
+
+class TestShellCompletion(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = ExecutionManager(['prog'], stdout=io.StringIO())
+        self.manager.register('echo', EchoCommand)
+        self.manager.register('exit', EchoCommand)
+        self.manager.register('lazy', LazyCommand('monolith.tests.missing.Cmd',
+            help='Never imported'))
+        self.shell = Shell(self.manager, stdin=io.StringIO(),
+            stdout=io.StringIO())
+
+    def test_complete_names(self):
+        self.assertEqual(self.shell.completenames('e'), ['echo', 'exit'])
+        self.assertEqual(self.shell.completenames(''), ['echo', 'exit',
+            'help', 'lazy', 'quit'])
+
+    def test_complete_arguments(self):
+        line = 'echo --mode '
+        self.assertEqual(self.shell.completedefault('', line, len(line),
+            len(line)), ['fast', 'slow'])
+        line = 'echo --m'
+        self.assertEqual(self.shell.completedefault('--m', line, 5, 8),
+            ['--mode'])
+
+    def test_complete_help(self):
+        line = 'help e'
+        self.assertEqual(self.shell.completedefault('e', line, 5, 6),
+            ['echo', 'exit'])
@@ -0,0 +1,73 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from monolith.compat import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+# modules which should not be imported by ``import monolith.cli``
+HEAVY_MODULES = [
+    'unittest',
+    'inspect',
+    'copy',
+    'json',
+    'asyncio',
+    'concurrent.futures',
+    'monolith.cli.completion',
+    'monolith.cli.manifest',
+]
+
+
+def get_import_times(module=None):
+    """
+    Imports ``module`` (or nothing, to see what interpreter startup imports
+    itself, i.e. by ``site``) at new interpreter (with warm bytecode cache)
+    and returns dictionary mapping imported modules to their self import
+    times (in microseconds) as reported by ``-X importtime``.
+    """
+    cache = tempfile.mkdtemp()
+    try:
+        env = dict(os.environ, PYTHONPATH=ROOT, PYTHONPYCACHEPREFIX=cache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        argv = [sys.executable, '-X', 'importtime', '-c',
+            'import %s' % module if module else 'pass']
+        subprocess.check_call(argv, env=env, stderr=subprocess.PIPE)
+        stderr = subprocess.Popen(argv, env=env,
+            stderr=subprocess.PIPE).communicate()[1].decode('utf-8')
+    finally:
+        shutil.rmtree(cache)
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_time)
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 8), '-X importtime and '
+    'PYTHONPYCACHEPREFIX require Python 3.8+')
+class TestImportTime(unittest.TestCase):
+    # self import time of all monolith modules, in milliseconds (can be
+    # changed with MONOLITH_IMPORT_TIME_LIMIT at slow machines)
+    limit = float(os.environ.get('MONOLITH_IMPORT_TIME_LIMIT', 25))
+
+    @classmethod
+    def setUpClass(cls):
+        cls.times = get_import_times('monolith.cli')
+        cls.startup_times = get_import_times()
+
+    def test_heavy_modules_are_not_imported(self):
+        self.assertIn('monolith.cli.base', self.times)
+        for module in HEAVY_MODULES:
+            if module not in self.startup_times:
+                self.assertNotIn(module, self.times)
+
+    def test_import_time(self):
+        total = sum(time for name, time in self.times.items() if
+            name == 'monolith' or name.startswith('monolith.')) / 1000.0
+        self.assertLess(total, self.limit)
@@ -0,0 +1,42 @@
+import os
+import json
+import mock
+import shutil
+import tempfile
+from monolith.compat import unittest
+from monolith.utils.files import get_cache_path
+from monolith.utils.files import get_file_stamp
+from monolith.utils.files import write_json
+
+
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_cache_path(self):
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmpdir}):
+            self.assertEqual(get_cache_path('foo.json'),
+                os.path.join(self.tmpdir, 'monolith', 'foo.json'))
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '',
+                'HOME': self.tmpdir}):
+            self.assertEqual(get_cache_path('foo.json'),
+                os.path.join(self.tmpdir, '.cache', 'monolith', 'foo.json'))
+
+    def test_write_json(self):
+        path = os.path.join(self.tmpdir, 'a', 'b.json')
+        write_json(path, {'foo': [1]})
+        write_json(path, {'foo': [2]})
+        with open(path) as fin:
+            self.assertEqual(json.load(fin), {'foo': [2]})
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['b.json'])
+
+    def test_get_file_stamp(self):
+        path = os.path.join(self.tmpdir, 'foo')
+        self.assertIsNone(get_file_stamp(path))
+        with open(path, 'w') as fout:
+            fout.write('foo')
+        self.assertEqual(get_file_stamp(path), [os.stat(path).st_mtime, 3])
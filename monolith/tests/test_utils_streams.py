@@ -0,0 +1,26 @@
+import io
+from monolith.compat import unittest
+from monolith.utils.streams import iter_records
+
+
+class TestIterRecords(unittest.TestCase):
+
+    def test_lines(self):
+        stream = io.StringIO('foo\nbar\r\n\nbaz')
+        self.assertEqual(list(iter_records(stream)), ['foo', 'bar', 'baz'])
+
+    def test_nul_delimited(self):
+        stream = io.StringIO('foo\0bar baz\0\0with\nnewline\0')
+        self.assertEqual(list(iter_records(stream, '\0')),
+            ['foo', 'bar baz', 'with\nnewline'])
+
+    def test_records_spanning_chunks(self):
+        stream = io.StringIO('first\0second\0third')
+        self.assertEqual(list(iter_records(stream, '\0', chunk_size=4)),
+            ['first', 'second', 'third'])
+
+    def test_is_lazy(self):
+        stream = io.StringIO('foo\0bar\0baz')
+        records = iter_records(stream, '\0', chunk_size=4)
+        self.assertEqual(next(records), 'foo')
+        self.assertEqual(stream.tell(), 4)
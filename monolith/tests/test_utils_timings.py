@@ -0,0 +1,138 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+from monolith.compat import unittest
+from monolith.cli.base import BaseCommand
+from monolith.cli.base import SimpleExecutionManager
+from monolith.utils import timings
+
+
+class Command(BaseCommand):
+
+    def handle(self, namespace):
+        pass
+
+
+class ListCollector(timings.Collector):
+
+    def __init__(self):
+        self.records = []
+
+    def collect(self, record):
+        self.records.append(record)
+
+
+class TestTimings(unittest.TestCase):
+
+    def setUp(self):
+        self.collector = ListCollector()
+        timings.add_collector(self.collector)
+
+    def tearDown(self):
+        timings.remove_collector(self.collector)
+
+    def get_phases(self):
+        return [(record['phase'], record.get('command'), record['depth'])
+            for record in self.collector.records]
+
+    def test_phase(self):
+        with timings.phase('outer', foo='bar'):
+            with timings.phase('inner'):
+                pass
+        self.assertEqual(self.get_phases(), [
+            ('inner', None, 1),
+            ('outer', None, 0),
+        ])
+        record = self.collector.records[1]
+        self.assertEqual(record['foo'], 'bar')
+        self.assertEqual(record['pid'], os.getpid())
+        for key in ('start', 'wall', 'cpu'):
+            self.assertGreaterEqual(record[key], 0)
+
+    def test_phase_is_recorded_on_error(self):
+        with self.assertRaises(ValueError):
+            with timings.phase('failing'):
+                raise ValueError
+        with timings.phase('next'):
+            pass
+        self.assertEqual(self.get_phases(), [
+            ('failing', None, 0),
+            ('next', None, 0),
+        ])
+
+    def test_phase_without_collectors(self):
+        timings.remove_collector(self.collector)
+        try:
+            self.assertFalse(timings.is_enabled())
+            self.assertIs(timings.phase('foo'), timings.null_phase)
+        finally:
+            timings.add_collector(self.collector)
+
+    def test_invocation_lifecycle(self):
+        manager = SimpleExecutionManager('foobar', {
+            'foo': Command,
+            'bar': 'monolith.tests.test_utils_timings.Command',
+        }, lazy=True)
+        manager.lazy_parser = True
+        manager.execute(['foo'])
+        self.assertEqual(self.get_phases(), [
+            ('get_commands_to_register', None, 0),
+            ('post_register', 'foo', 1),
+            ('register', 'foo', 0),
+            ('register', 'bar', 0),
+            ('subparser', 'foo', 1),
+            ('get_parser', None, 0),
+            ('parse_args', None, 0),
+            ('handle', None, 0),
+        ])
+        self.assertEqual(self.collector.records[-1]['handler'],
+            'Command.handle')
+        manager.execute(['bar'])
+        # lazy command is imported once its subparser is needed
+        self.assertEqual(self.get_phases()[8:14], [
+            ('get_parser', None, 0),
+            ('get_class', None, 2),
+            ('post_register', 'bar', 2),
+            ('subparser', 'bar', 1),
+            ('parse_args', None, 0),
+            ('handle', None, 0),
+        ])
+        self.assertEqual(self.collector.records[9]['path'],
+            'monolith.tests.test_utils_timings.Command')
+
+
+class TestJSONLinesCollector(unittest.TestCase):
+
+    def test_stream(self):
+        stream = io.StringIO()
+        timings.JSONLinesCollector(stream=stream).collect({'phase': 'foo'})
+        timings.JSONLinesCollector(stream=stream).collect({'phase': 'bar'})
+        self.assertEqual([json.loads(line)['phase'] for line in
+            stream.getvalue().splitlines()], ['foo', 'bar'])
+
+    def test_path(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'timings.jsonl')
+            timings.JSONLinesCollector(path=path).collect({'phase': 'foo'})
+            timings.JSONLinesCollector(path=path).collect({'phase': 'bar'})
+            with open(path) as fin:
+                self.assertEqual([json.loads(line)['phase'] for line in fin],
+                    ['foo', 'bar'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_get_environment_collector(self):
+        self.assertIsNone(timings.get_environment_collector({}))
+        self.assertIsNone(timings.get_environment_collector(
+            {'MONOLITH_TIMINGS': '0'}))
+        for value in ('1', 'stderr', '-'):
+            collector = timings.get_environment_collector(
+                {'MONOLITH_TIMINGS': value})
+            self.assertIsNone(collector.path)
+            self.assertIsNotNone(collector.stream)
+        collector = timings.get_environment_collector(
+            {'MONOLITH_TIMINGS': '/tmp/timings.jsonl'})
+        self.assertEqual(collector.path, '/tmp/timings.jsonl')
@@ -0,0 +1,43 @@
+"""
+Utilities for cache files kept by :mod:`monolith.cli` (commands manifest,
+result cache, entry point and package scans).
+"""
+import os
+import json
+
+
+def get_cache_path(name):
+    """
+    Returns path of the cache file (or directory) ``name`` at
+    ``$XDG_CACHE_HOME/monolith`` (``~/.cache/monolith`` if the variable is not
+    set).
+    """
+    directory = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(directory, 'monolith', name)
+
+
+def write_json(path, data):
+    """
+    Atomically writes ``data`` as JSON to the file at ``path``, creating its
+    directory if needed.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as fout:
+        json.dump(data, fout)
+    os.rename(tmp_path, path)
+
+
+def get_file_stamp(path):
+    """
+    Returns ``[mtime, size]`` of the file at given ``path`` or ``None`` if it
+    doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
@@ -1,4 +1,6 @@
-import inspect
+from monolith.compat import basestring
+from monolith.utils import timings
+
 
 def import_class(class_path):
     """
@@ -11,14 +13,21 @@ def import_class(class_path):
             hgrepo = import_class('mypackage.subpackage.MyClass')
         except ImportError:
             # hadle error
+
+    Class nested at another object is given as ``module:Outer.MyClass``.
     """
-    splitted = class_path.split('.')
-    mod_path = '.'.join(splitted[:-1])
-    class_name = splitted[-1]
+    if ':' in class_path:
+        mod_path, attr_path = class_path.split(':', 1)
+        names = attr_path.split('.')
+    else:
+        splitted = class_path.split('.')
+        mod_path = '.'.join(splitted[:-1])
+        names = splitted[-1:]
     # import may throw ImportError
-    class_mod = __import__(mod_path, {}, {}, [class_name])
+    cls = __import__(mod_path, {}, {}, [names[0]])
     try:
-        cls = getattr(class_mod, class_name)
+        for name in names:
+            cls = getattr(cls, name)
     except AttributeError:
         raise ImportError("Couldn't import %r" % class_path)
     return cls
@@ -29,8 +38,8 @@ def get_class(cls):
     Returns given class. Can be given as a string - in that case proper class
     would be imported using ``import_class``.
     """
-    if inspect.isclass(cls):
+    if not isinstance(cls, basestring):
         return cls
-    else:
+    with timings.phase('get_class', path=cls):
         return import_class(cls)
 
@@ -0,0 +1,30 @@
+"""
+Utilities for reading streams lazily.
+"""
+
+
+def iter_records(stream, delimiter='\n', chunk_size=64 * 1024):
+    """
+    Yields records read from the given ``stream`` one by one. Records are
+    separated by ``delimiter`` (which is not included at yielded records);
+    empty records are skipped. Only single record (and single chunk of
+    ``chunk_size`` characters) is kept in memory at once.
+    """
+    if delimiter == '\n':
+        for line in stream:
+            record = line.rstrip('\r\n')
+            if record:
+                yield record
+        return
+    remainder = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        records = (remainder + chunk).split(delimiter)
+        remainder = records.pop()
+        for record in records:
+            if record:
+                yield record
+    if remainder:
+        yield remainder
@@ -0,0 +1,175 @@
+"""
+Timing instrumentation of the invocation lifecycle.
+
+Framework code wraps each stage of an invocation (importing ``monolith.cli``,
+``get_commands_to_register``, importing command classes, ``register``,
+``post_register``, building parser and subparsers, ``parse_args`` and
+``handle``) with :func:`phase`. Once a phase ends, a record is passed to every
+registered collector (see :func:`add_collector`). Record is a dictionary
+with following keys:
+
+- ``phase``: Name of the phase.
+- ``start``: Time (seconds since the epoch) phase started at.
+- ``wall``: Wall clock time of the phase, in seconds.
+- ``cpu``: CPU time of the phase (of the whole process), in seconds.
+- ``depth``: Number of phases this one is nested in.
+- ``pid``: Process id.
+- ``prog``: Program name (base name of ``sys.argv[0]``).
+
+and extra fields given to :func:`phase` (i.e. ``command`` or ``path``).
+
+If ``MONOLITH_TIMINGS`` environment variable is set, :class:`JSONLinesCollector`
+is registered at import time. It writes records as JSON lines to standard
+error (if variable is set to ``1``, ``stderr`` or ``-``) or appends them to
+the file at given path. Without collectors phases cost a single function call.
+"""
+import os
+import sys
+import time
+
+
+ENVIRONMENT_VARIABLE = 'MONOLITH_TIMINGS'
+
+wall_clock = getattr(time, 'perf_counter', time.time)
+cpu_clock = getattr(time, 'process_time', None) or time.clock
+
+collectors = []
+depth = [0]
+
+
+class Collector(object):
+    """
+    Base class of timing collectors. Subclasses should override
+    :meth:`collect`.
+    """
+
+    def collect(self, record):
+        """
+        Called with a record (dictionary) of each finished phase. Should be
+        overridden at subclass.
+        """
+        raise NotImplementedError
+
+
+class JSONLinesCollector(Collector):
+    """
+    Writes each record as a single JSON line to the given ``stream`` or, if
+    ``path`` is given instead, appends it to the file at that path (file is
+    opened for each record, so many processes may share it).
+    """
+
+    def __init__(self, stream=None, path=None):
+        self.stream = stream
+        self.path = path
+
+    def collect(self, record):
+        import json
+
+        line = json.dumps(record, sort_keys=True) + '\n'
+        if self.path is None:
+            self.stream.write(line)
+            self.stream.flush()
+        else:
+            with open(self.path, 'a') as fout:
+                fout.write(line)
+
+
+def add_collector(collector):
+    """
+    Registers given ``collector`` (:class:`Collector` instance). Timing
+    records are passed to it from now on.
+    """
+    collectors.append(collector)
+
+
+def remove_collector(collector):
+    """
+    Unregisters given ``collector``.
+    """
+    collectors.remove(collector)
+
+
+def get_environment_collector(environ=None):
+    """
+    Returns :class:`JSONLinesCollector` configured by ``MONOLITH_TIMINGS``
+    variable of ``environ`` (defaults to ``os.environ``) or ``None`` if it is
+    not set (or set to ``0``).
+    """
+    if environ is None:
+        environ = os.environ
+    value = environ.get(ENVIRONMENT_VARIABLE, '')
+    if value in ('', '0'):
+        return None
+    if value in ('1', 'stderr', '-'):
+        return JSONLinesCollector(stream=sys.stderr)
+    return JSONLinesCollector(path=value)
+
+
+def is_enabled():
+    """
+    Returns ``True`` if any collector is registered.
+    """
+    return bool(collectors)
+
+
+class Phase(object):
+    """
+    Context manager measuring a single phase. Use :func:`phase` to create it.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.depth = depth[0]
+        depth[0] += 1
+        self.start = time.time()
+        self.wall = wall_clock()
+        self.cpu = cpu_clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = wall_clock() - self.wall
+        cpu = cpu_clock() - self.cpu
+        depth[0] = self.depth
+        record = {
+            'phase': self.name,
+            'start': self.start,
+            'wall': wall,
+            'cpu': cpu,
+            'depth': self.depth,
+            'pid': os.getpid(),
+            'prog': os.path.basename(sys.argv[0]) if sys.argv else '',
+        }
+        record.update(self.fields)
+        for collector in list(collectors):
+            collector.collect(record)
+
+
+class NullPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+null_phase = NullPhase()
+
+
+def phase(name, **fields):
+    """
+    Returns context manager measuring phase called ``name``. Given ``fields``
+    are added to the record. If no collector is registered, returned context
+    manager does nothing.
+    """
+    if not collectors:
+        return null_phase
+    return Phase(name, fields)
+
+
+environment_collector = get_environment_collector()
+if environment_collector is not None:
+    add_collector(environment_collector)